@@ -0,0 +1,231 @@
+"""Punto de entrada ASGI con las mismas rutas de api.py.
+
+    uvicorn asgi:app --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:app
+
+Con workers sync cada conexión ocupa el proceso entero mientras espera, sea un
+cliente de /eventos o una consulta lenta. Aquí lo que espera corre en el event
+loop del worker:
+
+- ``/eventos``: cada cliente es una corrutina esperando en una
+  ``SuscripcionAsync``; las conexiones inactivas cuestan memoria, no hilos.
+- Los listados de ``LISTADOS`` se ejecutan con un engine async (aiomysql o
+  aiosqlite) y ``AsyncSession``, con los mismos parámetros (fields, sort,
+  after, limit y filtros), cursor, ETag y 304 que en Flask. Con ``expand`` o
+  ``stream``, o si el rango pedido llega a las órdenes archivadas, pasan a Flask.
+- Todo lo demás va a la app Flask por a2wsgi, en un pool de ``ASGI_HILOS`` hilos
+  (10 por defecto, por debajo de pool_size + max_overflow del engine sync).
+
+Los listados nativos pasan por los ``before_request`` y ``after_request`` de la
+app como cualquier petición de Flask: métricas (con la misma ruta), ruteo a la
+réplica, idempotencia y encabezados CORS. Los encabezados de ``/eventos`` pasan
+por los ``after_request``, así llevan los mismos CORS que los de Flask.
+"""
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+from flask import jsonify, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+
+import api
+import comun
+import rutas.sistema
+from modelos import ORDENES_ARCHIVO, Ordenes, OrdenesProductos, db
+from rutas.eventos import _parse_topicos, formato_sse
+from rutas.ordenes import _filtros_ordenes
+from serializacion import filas_a_dicts
+
+DRIVERS_ASYNC = {'mysql': 'mysql+aiomysql', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def url_async(uri):
+    url = make_url(uri)
+    driver = DRIVERS_ASYNC.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f'Sin driver async para {url.get_backend_name()}')
+    return url.set(drivername=driver)
+
+def crear_engine_async(uri):
+    opciones = api.opciones_engine(uri)
+    # aiomysql no acepta los timeouts de lectura y escritura de PyMySQL
+    for argumento in ('read_timeout', 'write_timeout'):
+        opciones.get('connect_args', {}).pop(argumento, None)
+    return create_async_engine(url_async(uri), **opciones)
+
+engines = {'primaria': crear_engine_async(api.app.config['SQLALCHEMY_DATABASE_URI'])}
+if 'replica' in api.app.config.get('SQLALCHEMY_BINDS', {}):
+    engines['replica'] = crear_engine_async(api.app.config['SQLALCHEMY_BINDS']['replica'])
+sesiones = {origen: async_sessionmaker(engine, expire_on_commit=False) for origen, engine in engines.items()}
+
+
+async def versiones(sesion, origen, tablas):
+    """Igual que ``comun.versiones``, compartiendo su memo, pero con la sesión async."""
+    memo = comun._versiones[origen]
+    vencidas = comun._vencidas(memo, tablas)
+    if vencidas:
+        comun._recordar(memo, vencidas, await sesion.execute(comun._consulta_versiones(vencidas)))
+    return [memo[t][:2] for t in tablas]
+
+async def limite_archivo(sesion, origen):
+    """Igual que ``comun.limite_archivo``, compartiendo su memo, pero con la sesión async."""
+    version = (await versiones(sesion, origen, (ORDENES_ARCHIVO.name,)))[0][0]
+    recordado = comun._limites_archivo.get(origen)
+    if recordado is not None and recordado[0] == version:
+        return recordado[1]
+    limite = (await sesion.execute(comun._consulta_limite_archivo())).one() if version else None
+    return comun._recordar_limite(origen, version, limite)
+
+
+# Listados nativos: endpoint de Flask -> (campos, llaves, criterios(**args), modelos del ETag)
+LISTADOS = {
+    'ordenes.manage_ordenes': (comun.CAMPOS_ORDEN, comun.LLAVES_ORDEN,
+                       _filtros_ordenes, (Ordenes,)),
+    'ordenes.get_ordenes_by_cliente': (comun.CAMPOS_ORDEN, comun.LLAVES_ORDEN,
+                               lambda id: [Ordenes.cliente_id == id, *comun._rango_ordenes()],
+                               (Ordenes, OrdenesProductos)),
+    'ordenes.get_ordenes_by_mesa': (comun.CAMPOS_ORDEN, comun.LLAVES_ORDEN,
+                            lambda id: [Ordenes.mesa == str(id), *comun._rango_ordenes()],
+                            (Ordenes, OrdenesProductos)),
+}
+
+async def listado(regla, argumentos):
+    """Respuesta de un listado de ``LISTADOS``, o ``None`` si debe atenderlo Flask."""
+    if request.args.get('expand') or request.args.get('stream'):
+        return None
+    campos, llaves, criterios, modelos = LISTADOS[regla.endpoint]
+    try:
+        nombres = comun._parse_fields(campos)
+        limit = comun._parse_limit()
+        stmt, columnas, conversiones = comun._consulta_campos(campos, nombres, llaves, criterios(**argumentos))
+        # Solo /ordenes filtra por estado; todos los listados, por fecha
+        desde, estados = comun._parse_fecha('desde'), None
+        if regla.endpoint == 'ordenes.manage_ordenes':
+            estados = comun._parse_estados()
+    except comun.ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    # _rutear_lecturas (before_request) decide igual que para la sesión sync
+    origen = 'replica' if db.session.info.get('replica') else 'primaria'
+    async with sesiones[origen]() as sesion:
+        if comun.necesita_archivo(await limite_archivo(sesion, origen), desde, estados):
+            return None
+        etag, modificado = comun.validadores(
+            await versiones(sesion, origen, tuple(m.__tablename__ for m in modelos)))
+        if comun.no_modificado(etag, modificado):
+            respuesta = api.app.response_class(status=304)
+        else:
+            if limit is not None:
+                stmt = stmt.limit(limit + 1)
+            filas, siguiente = comun._cortar_pagina((await sesion.execute(stmt)).all(), columnas, limit)
+            respuesta = jsonify(filas_a_dicts(conversiones, filas))
+            if siguiente:
+                respuesta.headers['X-Next-Cursor'] = siguiente
+    respuesta.set_etag(etag, weak=True)
+    if modificado is not None:
+        respuesta.last_modified = modificado
+    return respuesta
+
+
+class AppASGI:
+    def __init__(self, app, hilos):
+        self.app = app
+        self.wsgi = WSGIMiddleware(app, workers=hilos)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            try:
+                regla, argumentos = self.app.url_map.bind('').match(scope['path'], 'GET', return_rule=True)
+            except HTTPException:
+                regla = None
+            if regla is not None and regla.endpoint == 'eventos.stream_eventos':
+                return await self._eventos(scope, receive, send)
+            # Antes de la primera petición a Flask puede no existir version_tabla
+            if regla is not None and regla.endpoint in LISTADOS and rutas.sistema._esquema_listo:
+                if await self._listado(scope, send, regla, argumentos):
+                    return
+        await self.wsgi(scope, receive, send)
+
+    def _contexto(self, scope):
+        return self.app.test_request_context(
+            scope['path'], query_string=scope['query_string'].decode('latin-1'),
+            headers=[(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope['headers']])
+
+    async def _listado(self, scope, send, regla, argumentos):
+        with self._contexto(scope):
+            try:
+                respuesta = self.app.preprocess_request()
+                if respuesta is None:
+                    respuesta = await listado(regla, argumentos)
+            except Exception as e:
+                self.app.logger.exception('Error en el listado %s', regla.rule)
+                respuesta = jsonify({'error': str(e)}), 500
+            if respuesta is None:
+                return False
+            respuesta = self.app.process_response(self.app.make_response(respuesta))
+        await _enviar(send, respuesta)
+        return True
+
+    async def _eventos(self, scope, receive, send):
+        with self._contexto(scope):
+            try:
+                topicos = _parse_topicos()
+            except comun.ParametroInvalido as e:
+                await _enviar(send, self.app.process_response(
+                    self.app.make_response((jsonify({'error': str(e)}), 400))))
+                return
+            # Solo los encabezados que agregan los after_request (CORS); el cuerpo es un stream
+            agregados = [(k, v) for k, v in self.app.process_response(self.app.response_class()).headers
+                         if k.lower().startswith('access-control-') or k.lower() == 'vary']
+
+        async def desconexion():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        keepalive = self.app.config['EVENTOS_KEEPALIVE']
+        suscripcion = self.app.extensions['pos']['broker'].suscribir(topicos, asincrona=True)
+        cliente = asyncio.ensure_future(desconexion())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': _encabezados([
+                ('Content-Type', 'text/event-stream; charset=utf-8'),
+                ('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no'), *agregados])})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while True:
+                siguiente = asyncio.ensure_future(suscripcion.get(timeout=keepalive))
+                await asyncio.wait((siguiente, cliente), return_when=asyncio.FIRST_COMPLETED)
+                if cliente.done():
+                    siguiente.cancel()
+                    return
+                evento = siguiente.result()
+                mensaje = ': keepalive\n\n' if evento is None else formato_sse(evento)
+                await send({'type': 'http.response.body', 'body': mensaje.encode(), 'more_body': True})
+        finally:
+            cliente.cancel()
+            suscripcion.cerrar()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                for engine in engines.values():
+                    await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def _encabezados(lista):
+    return [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in lista]
+
+async def _enviar(send, respuesta):
+    cuerpo = respuesta.get_data()
+    await send({'type': 'http.response.start', 'status': respuesta.status_code,
+                'headers': _encabezados(respuesta.headers.to_wsgi_list())})
+    await send({'type': 'http.response.body', 'body': cuerpo})
+    return cuerpo
+
+
+app = AppASGI(api.app, api._env_int('ASGI_HILOS', 10))
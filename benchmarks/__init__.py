@@ -0,0 +1,21 @@
+"""Benchmarks de la API: carga de datos (semilla), tráfico (carga) y comparación con una base."""
+import importlib
+import os
+import socket
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importar_api(url):
+    """Importa api.py apuntando a ``url``; la app se crea con esa URI en el primer ``api.app``."""
+    os.environ['DATABASE_URL'] = url
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    return importlib.import_module('api')
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
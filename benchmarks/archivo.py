@@ -0,0 +1,105 @@
+"""Latencia del camino caliente antes y después de archivar las órdenes antiguas.
+
+    python -m benchmarks.archivo --url sqlite:///bench.sqlite [--dias 30] [--peticiones 5000]
+
+Trabaja sobre dos copias de la base SQLite: en una corre ``flask archivar``
+(midiendo cuánto tarda) y sobre cada copia ejecuta benchmarks.carga con la misma
+mezcla y semilla, cada una en su propio proceso. Informa por endpoint p50 y p95
+antes y después, y las filas de las tablas activas y de archivo.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import make_url
+
+from benchmarks import RAIZ
+from benchmarks.carga import _copia_sqlite
+
+TABLAS = ('ordenes', 'ordenes_productos', 'sesion_ordenes')
+
+
+def _entorno(url):
+    return {**os.environ, 'DATABASE_URL': url, 'TAREAS_HILOS': '0',
+            'TAREAS_DB': os.path.join(os.path.dirname(make_url(url).database), 'tareas.sqlite')}
+
+def archivar(url, dias, lote):
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'api', 'archivar', '--dias', str(dias),
+                    '--lote', str(lote)], cwd=RAIZ, env=_entorno(url), check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - inicio
+
+def medir(url, args):
+    salida = os.path.join(os.path.dirname(make_url(url).database), 'carga.json')
+    subprocess.run([sys.executable, '-m', 'benchmarks.carga', '--url', url, '--sin-copia', '--modo', args.modo,
+                    '--peticiones', str(args.peticiones), '--calentamiento', str(args.calentamiento),
+                    '--semilla', str(args.semilla), '--salida', salida],
+                   cwd=RAIZ, env=_entorno(url), check=True, stdout=subprocess.DEVNULL)
+    with open(salida) as archivo:
+        return json.load(archivo)['modos'][args.modo]
+
+def filas(url):
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conexion:
+            existentes = set(engine.dialect.get_table_names(conexion))
+            return {t: conexion.execute(select(func.count()).select_from(text(t))).scalar() if t in existentes else 0
+                    for nombre in TABLAS for t in (nombre, f'{nombre}_archivo')}
+    finally:
+        engine.dispose()
+
+
+def imprimir(resultado):
+    print(f'Archivado en {resultado["archivar_s"]:.1f} s (órdenes de más de {resultado["meta"]["dias"]} días)')
+    print(f'\n  {"tabla":28} {"antes":>10} {"después":>10}')
+    for tabla, antes in resultado['antes']['filas'].items():
+        print(f'  {tabla:28} {antes:10d} {resultado["despues"]["filas"][tabla]:10d}')
+    print(f'\n  {"endpoint":20} {"p50 antes":>10} {"p50 desp.":>10} {"p95 antes":>10} {"p95 desp.":>10} {"err":>5}')
+    antes, despues = resultado['antes']['carga'], resultado['despues']['carga']
+    for nombre, a in antes['endpoints'].items():
+        d = despues['endpoints'].get(nombre, {'p50_ms': 0.0, 'p95_ms': 0.0, 'errores': 0})
+        print(f'  {nombre:20} {a["p50_ms"]:10.2f} {d["p50_ms"]:10.2f} {a["p95_ms"]:10.2f} {d["p95_ms"]:10.2f} '
+              f'{a["errores"] + d["errores"]:5d}')
+    print(f'  {"total":20} {antes["total"]["p50_ms"]:10.2f} {despues["total"]["p50_ms"]:10.2f} '
+          f'{antes["total"]["p95_ms"]:10.2f} {despues["total"]["p95_ms"]:10.2f} '
+          f'{antes["total"]["errores"] + despues["total"]["errores"]:5d}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', required=True, help='Base SQLite cargada con benchmarks.semilla.')
+    parser.add_argument('--dias', type=int, default=30, help='Edad mínima de las órdenes a archivar.')
+    parser.add_argument('--lote', type=int, default=1000)
+    parser.add_argument('--modo', choices=('cliente', 'gunicorn', 'uvicorn'), default='cliente')
+    parser.add_argument('--peticiones', type=int, default=5000)
+    parser.add_argument('--calentamiento', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=7)
+    parser.add_argument('--salida', help='Guarda el resultado en este archivo JSON.')
+    args = parser.parse_args(argv)
+    if make_url(args.url).get_backend_name() != 'sqlite':
+        raise SystemExit('benchmarks.archivo trabaja sobre copias de una base SQLite')
+
+    resultado = {'meta': {k: getattr(args, k) for k in ('dias', 'lote', 'modo', 'peticiones', 'semilla')}}
+    copias = [_copia_sqlite(args.url) for _ in range(2)]
+    try:
+        (url_antes, _), (url_despues, _) = copias
+        resultado['archivar_s'] = archivar(url_despues, args.dias, args.lote)
+        for fase, url in (('antes', url_antes), ('despues', url_despues)):
+            resultado[fase] = {'filas': filas(url), 'carga': medir(url, args)}
+    finally:
+        for _, ruta in copias:
+            shutil.rmtree(os.path.dirname(ruta), ignore_errors=True)
+
+    imprimir(resultado)
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
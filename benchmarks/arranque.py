@@ -0,0 +1,192 @@
+"""Tiempo de arranque: desde importar api hasta el primer 200 en /.
+
+    python -m benchmarks.arranque [--url sqlite:///bench.sqlite] [--repeticiones 5] [--workers 4]
+
+- ``proceso``: en un intérprete nuevo por repetición mide importar api, crear la
+  app y la primera petición a / con el cliente de pruebas (crea las tablas
+  auxiliares si faltan), y el total con el arranque del intérprete.
+- ``gunicorn`` y ``gunicorn --preload``: tiempo desde lanzar el servidor hasta
+  el primer 200 en /, cuánto tarda cada worker desde el fork hasta quedar listo
+  (hook post_worker_init) y cuánto tarda en atender un worker agregado con
+  SIGTTIN, que es lo que cuesta reponer o sumar un worker. La memoria es la PSS
+  de master y workers (las páginas compartidas se reparten entre ellos).
+
+Sin ``--url`` se usa una base SQLite vacía en un temporal: / solo necesita conectar.
+Se informa la mediana de las repeticiones.
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import RAIZ, puerto_libre
+
+# Fases de un proceso nuevo; se ejecuta con python -c para partir de cero
+SCRIPT_PROCESO = '''
+import json, time
+t0 = time.perf_counter()
+import api
+t1 = time.perf_counter()
+app = api.crear_app()
+t2 = time.perf_counter()
+status = app.test_client().get('/').status_code
+t3 = time.perf_counter()
+print(json.dumps({'importar': t1 - t0, 'crear_app': t2 - t1, 'primera_peticion': t3 - t2, 'status': status}))
+'''
+
+# Hooks de gunicorn que anotan, por worker, el tiempo entre el fork y quedar listo
+CONFIG_GUNICORN = '''
+import json, os, time
+
+def post_fork(server, worker):
+    worker.bench_fork = time.monotonic()
+
+def post_worker_init(worker):
+    with open({ruta!r}, 'a') as archivo:
+        archivo.write(json.dumps({{'pid': os.getpid(), 'listo': time.monotonic(),
+                                   'boot': time.monotonic() - worker.bench_fork}}) + '\\n')
+'''
+
+SERVIDORES = {
+    'gunicorn': [],
+    'gunicorn --preload': ['--preload'],
+}
+
+
+def _entorno(url, directorio):
+    return {**os.environ, 'DATABASE_URL': url, 'TAREAS_DB': os.path.join(directorio, 'tareas.sqlite'),
+            'BUSQUEDA_PRECARGAR': '0'}
+
+def medir_proceso(url, directorio):
+    inicio = time.perf_counter()
+    salida = subprocess.run([sys.executable, '-c', SCRIPT_PROCESO], cwd=RAIZ, env=_entorno(url, directorio),
+                            capture_output=True, text=True, check=True)
+    total = time.perf_counter() - inicio
+    fases = json.loads(salida.stdout.strip().splitlines()[-1])
+    if fases.pop('status') != 200:
+        raise SystemExit(f'/ no respondió 200: {salida.stderr[-2000:]}')
+    return {**fases, 'total': total}
+
+
+def _pss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as archivo:
+            for linea in archivo:
+                if linea.startswith('Pss:'):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _hijos(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as archivo:
+            return [int(p) for p in archivo.read().split()]
+    except OSError:
+        return []
+
+def _listos(ruta):
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta) as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+def _esperar(condicion, limite, mensaje):
+    vence = time.monotonic() + limite
+    while not condicion():
+        if time.monotonic() > vence:
+            raise SystemExit(mensaje)
+        time.sleep(0.01)
+
+def medir_servidor(modo, url, directorio, workers):
+    puerto = puerto_libre()
+    listos = os.path.join(directorio, f'listos-{puerto}.jsonl')
+    config = os.path.join(directorio, f'gunicorn-{puerto}.py')
+    with open(config, 'w') as archivo:
+        archivo.write(CONFIG_GUNICORN.format(ruta=listos))
+
+    inicio = time.monotonic()
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', config, '-b', f'127.0.0.1:{puerto}', '-w', str(workers),
+         *SERVIDORES[modo], 'api:app'],
+        cwd=RAIZ, env=_entorno(url, directorio), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        def responde():
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{puerto}/', timeout=2) as respuesta:
+                    return respuesta.status == 200
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                if proceso.poll() is not None:
+                    raise SystemExit(f'{modo} no arrancó')
+                return False
+
+        _esperar(responde, 60, f'{modo}: / no respondió 200')
+        primer_200 = time.monotonic() - inicio
+        _esperar(lambda: len(_listos(listos)) >= workers, 60, f'{modo}: no arrancaron los workers')
+        todos = max(w['listo'] for w in _listos(listos)) - inicio
+        boots = [w['boot'] for w in _listos(listos)]
+        pss = _pss_kb(proceso.pid) + sum(_pss_kb(p) for p in _hijos(proceso.pid))
+
+        # Un worker más: desde la señal hasta que el nuevo worker queda listo
+        senal = time.monotonic()
+        proceso.send_signal(signal.SIGTTIN)
+        _esperar(lambda: len(_listos(listos)) > workers, 60, f'{modo}: SIGTTIN no agregó un worker')
+        agregar = _listos(listos)[-1]['listo'] - senal
+        return {'primer_200': primer_200, 'todos_listos': todos, 'boot_worker': statistics.median(boots),
+                'agregar_worker': agregar, 'pss_mb': pss / 1024}
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+def _mediana(corridas):
+    return {clave: round(statistics.median(c[clave] for c in corridas) * (1 if clave == 'pss_mb' else 1000), 1)
+            for clave in corridas[0]}
+
+def imprimir(resultado):
+    proceso = resultado['proceso']
+    print(f'[proceso] importar {proceso["importar"]} ms, crear_app {proceso["crear_app"]} ms, '
+          f'primera petición {proceso["primera_peticion"]} ms, total {proceso["total"]} ms')
+    print(f'\n  {"servidor":20} {"primer 200":>11} {"todos":>9} {"boot":>9} {"+1 worker":>10} {"PSS MB":>8}')
+    for modo, datos in resultado['servidores'].items():
+        print(f'  {modo:20} {datos["primer_200"]:11.1f} {datos["todos_listos"]:9.1f} '
+              f'{datos["boot_worker"]:9.1f} {datos["agregar_worker"]:10.1f} {datos["pss_mb"]:8.1f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base a usar (por defecto, SQLite vacía en un temporal).')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--salida', help='Guarda el resultado en este archivo JSON.')
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix='daie_arranque_')
+    url = args.url or f'sqlite:///{os.path.join(directorio, "arranque.sqlite")}'
+    try:
+        resultado = {
+            'meta': {'repeticiones': args.repeticiones, 'workers': args.workers},
+            'proceso': _mediana([medir_proceso(url, directorio) for _ in range(args.repeticiones)]),
+            'servidores': {modo: _mediana([medir_servidor(modo, url, directorio, args.workers)
+                                           for _ in range(args.repeticiones)])
+                           for modo in SERVIDORES},
+        }
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    imprimir(resultado)
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
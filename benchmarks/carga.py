@@ -0,0 +1,382 @@
+"""Reproduce una mezcla de tráfico de las terminales y mide cada endpoint.
+
+    python -m benchmarks.carga --url sqlite:///bench.sqlite --modo cliente
+    python -m benchmarks.carga --url sqlite:///bench.sqlite --modo gunicorn --workers 4
+    python -m benchmarks.carga --url sqlite:///bench.sqlite --modo servidores --inactivas 3
+    python -m benchmarks.carga --url ... --guardar-base benchmarks/base.json
+    python -m benchmarks.carga --url ... --base benchmarks/base.json --umbral 0.2
+
+``cliente`` ejecuta las peticiones en proceso con el cliente de pruebas de
+Flask; ``gunicorn`` levanta un gunicorn real (workers sync, ``api:app``) y las
+envía por HTTP con ``--concurrencia`` hilos; ``uvicorn`` hace lo mismo con
+workers de uvicorn sobre ``asgi:app``. ``ambos`` corre cliente y gunicorn;
+``servidores``, gunicorn y uvicorn con la misma mezcla para comparar sync y async.
+Con ``--inactivas N`` se mantienen N clientes de /eventos conectados y sin
+actividad durante la medición, como las pantallas de cocina.
+Por endpoint se informan p50/p95/p99, promedio y errores; por modo, el
+throughput y el RSS pico (en ``cliente``, además, el RSS pico observado al
+servir cada endpoint). El RSS se lee de /proc (Linux).
+
+Las peticiones salen de un generador con semilla fija, y con SQLite se trabaja
+sobre una copia de la base, así cada corrida parte del mismo estado.
+Con ``--base`` se compara contra un resultado guardado y el proceso sale con
+código 1 si el p95 de algún endpoint o el throughput empeoran más que ``--umbral``.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import make_url
+
+from benchmarks import RAIZ, importar_api, puerto_libre
+
+
+# Mezcla de tráfico: (nombre, peso, generador). Cada generador recibe el
+# contexto y devuelve (método, ruta, cuerpo JSON o None).
+def _orden_activa(ctx):
+    return ctx.rng.choice(ctx.activas)
+
+def _agregar_producto(ctx):
+    # Si el producto ya está en la orden se suma a la línea existente
+    return 'POST', '/ordenes_productos', {
+        'orden_id': _orden_activa(ctx), 'producto_id': ctx.rng.randint(1, ctx.max_producto), 'cantidad': 1,
+        'producto_precio': '10.00', 'orden_producto_total': '10.00'}
+
+MEZCLA = [
+    ('ordenes_activas', 25, lambda ctx: ('GET', '/ordenes/activas', None)),
+    ('orden_detalle', 15, lambda ctx: (
+        'GET', f'/ordenes/{_orden_activa(ctx)}?expand=items.producto', None)),
+    ('productos', 10, lambda ctx: ('GET', '/productos', None)),
+    ('categorias', 4, lambda ctx: ('GET', '/categorias', None)),
+    ('mesas', 6, lambda ctx: ('GET', '/mesas', None)),
+    ('ordenes_cliente', 6, lambda ctx: (
+        'GET', f'/ordenes/cliente/{ctx.rng.randint(1, ctx.max_cliente)}?sort=-fecha&limit=50', None)),
+    ('ordenes_mesa', 5, lambda ctx: (
+        'GET', f'/ordenes/mesa/{ctx.rng.randint(1, ctx.max_mesa)}?sort=-fecha&limit=50', None)),
+    ('ordenes_filtradas', 4, lambda ctx: (
+        'GET', '/ordenes?estado=pendiente,en_cocina&sort=fecha&limit=100', None)),
+    ('resumen_sesion', 3, lambda ctx: ('GET', f'/sesiones/{ctx.ultima_sesion}/resumen', None)),
+    ('reporte_ventas', 2, lambda ctx: (
+        'GET', f'/reportes/ventas?desde={ctx.hace_30_dias}&granularidad=dia', None)),
+    ('crear_orden', 6, lambda ctx: ('POST', '/ordenes', {
+        'cliente_id': ctx.rng.randint(1, ctx.max_cliente), 'mesa': str(ctx.rng.randint(1, ctx.max_mesa)),
+        'estado': 'pendiente', 'mesero_id': ctx.rng.randint(1, ctx.max_mesero)})),
+    ('agregar_producto', 10, _agregar_producto),
+    ('actualizar_orden', 4, lambda ctx: (
+        'PUT', f'/ordenes/{_orden_activa(ctx)}', {'estado': ctx.rng.choice(('pendiente', 'en_cocina'))})),
+]
+
+
+class Contexto:
+    """Rangos de ids de la base sembrada y estado del generador de peticiones."""
+
+    def __init__(self, engine, semilla):
+        self.rng = random.Random(semilla)
+        with engine.connect() as conexion:
+            def maximo(tabla):
+                return conexion.execute(text(f'SELECT MAX(id) FROM {tabla}')).scalar() or 1
+            self.max_producto = maximo('productos')
+            self.max_cliente = maximo('cliente')
+            self.max_mesero = maximo('mesero')
+            self.max_mesa = maximo('mesas')
+            self.ultima_sesion = maximo('sesion')
+            ultima = conexion.execute(text('SELECT MAX(fecha) FROM ordenes')).scalar()
+            if not isinstance(ultima, datetime):
+                ultima = datetime.fromisoformat(str(ultima)[:19])  # SQLite la devuelve como texto
+            self.hace_30_dias = (ultima - timedelta(days=30)).date().isoformat()
+            self.activas = [f[0] for f in conexion.execute(text(
+                "SELECT id FROM ordenes WHERE estado IN ('pendiente', 'en_cocina') ORDER BY id"))]
+        if not self.activas:
+            raise SystemExit('La base no tiene órdenes activas; cárgala con benchmarks.semilla')
+
+
+def generar(ctx, cantidad):
+    nombres = [m[0] for m in MEZCLA]
+    pesos = [m[1] for m in MEZCLA]
+    generadores = dict((m[0], m[2]) for m in MEZCLA)
+    return [(nombre, *generadores[nombre](ctx))
+            for nombre in ctx.rng.choices(nombres, weights=pesos, k=cantidad)]
+
+
+# Memoria residente
+def _rss_kb(pid='self', campo='VmRSS:'):
+    # VmRSS es el residente actual; VmHWM, el pico del proceso
+    try:
+        with open(f'/proc/{pid}/status') as archivo:
+            for linea in archivo:
+                if linea.startswith(campo):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _rss_arbol_kb(pid):
+    """RSS de ``pid`` más el de sus hijos directos (los workers de gunicorn)."""
+    total = _rss_kb(pid)
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as archivo:
+                ppid = int(archivo.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            total += _rss_kb(entrada)
+    return total
+
+
+# Ejecutores
+def ejecutar_cliente(api, peticiones, calentamiento):
+    cliente = api.app.test_client()
+    muestras = []
+    inicio = None
+    for i, (nombre, metodo, ruta, cuerpo) in enumerate(peticiones):
+        if i == calentamiento:
+            inicio = time.perf_counter()
+        t0 = time.perf_counter()
+        respuesta = cliente.open(ruta, method=metodo, json=cuerpo)
+        duracion = time.perf_counter() - t0
+        if i >= calentamiento:
+            muestras.append((nombre, duracion, respuesta.status_code, _rss_kb()))
+    return muestras, time.perf_counter() - inicio, _rss_kb(campo='VmHWM:')
+
+
+SERVIDORES = {
+    'gunicorn': ['-w', '{workers}', 'api:app'],
+    'uvicorn': ['-k', 'uvicorn.workers.UvicornWorker', '-w', '{workers}', 'asgi:app'],
+}
+
+def _abrir_inactivas(puerto, cantidad):
+    """Conecta ``cantidad`` clientes a /eventos que no vuelven a leer ni escribir."""
+    conexiones = []
+    for _ in range(cantidad):
+        conexion = socket.create_connection(('127.0.0.1', puerto))
+        conexion.sendall(b'GET /eventos HTTP/1.1\r\nHost: bench\r\n\r\n')
+        conexiones.append(conexion)
+    time.sleep(0.5)  # que el servidor las acepte antes de medir
+    return conexiones
+
+def ejecutar_servidor(modo, url, peticiones, calentamiento, workers, concurrencia, inactivas=0):
+    puerto = puerto_libre()
+    base = f'http://127.0.0.1:{puerto}'
+    argumentos = [a.format(workers=workers) for a in SERVIDORES[modo]]
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{puerto}', *argumentos],
+        cwd=RAIZ, env={**os.environ, 'DATABASE_URL': url},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    conexiones = []
+    try:
+        limite = time.monotonic() + 60
+        while True:
+            try:
+                urllib.request.urlopen(base + '/salud', timeout=2).read()
+                break
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                if proceso.poll() is not None or time.monotonic() > limite:
+                    raise SystemExit(f'{modo} no arrancó')
+                time.sleep(0.2)
+        conexiones = _abrir_inactivas(puerto, inactivas)
+
+        def enviar(peticion):
+            nombre, metodo, ruta, cuerpo = peticion
+            datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+            solicitud = urllib.request.Request(
+                base + ruta, data=datos, method=metodo,
+                headers={'Content-Type': 'application/json'} if datos else {})
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(solicitud, timeout=60) as respuesta:
+                    respuesta.read()
+                    status = respuesta.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, ConnectionError):
+                status = 0
+            return nombre, time.perf_counter() - t0, status, None
+
+        pico = [0]
+        corriendo = threading.Event()
+        corriendo.set()
+
+        def medir_rss():
+            while corriendo.is_set():
+                pico[0] = max(pico[0], _rss_arbol_kb(proceso.pid))
+                time.sleep(0.1)
+
+        with ThreadPoolExecutor(concurrencia) as pool:
+            list(pool.map(enviar, peticiones[:calentamiento]))
+            muestreo = threading.Thread(target=medir_rss, daemon=True)
+            muestreo.start()
+            inicio = time.perf_counter()
+            muestras = list(pool.map(enviar, peticiones[calentamiento:]))
+            duracion = time.perf_counter() - inicio
+        corriendo.clear()
+        muestreo.join()
+        return muestras, duracion, pico[0]
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+# Resultados
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+def _estadisticas(duraciones):
+    ordenados = sorted(duraciones)
+    return {
+        'n': len(ordenados),
+        'p50_ms': round(_percentil(ordenados, 50) * 1000, 3),
+        'p95_ms': round(_percentil(ordenados, 95) * 1000, 3),
+        'p99_ms': round(_percentil(ordenados, 99) * 1000, 3),
+        'promedio_ms': round(sum(ordenados) / len(ordenados) * 1000, 3) if ordenados else 0.0,
+    }
+
+def resumir(muestras, duracion, rss_pico_kb):
+    por_endpoint = {}
+    for nombre, segundos, status, rss in muestras:
+        datos = por_endpoint.setdefault(nombre, {'duraciones': [], 'errores': 0, 'rss': 0})
+        datos['duraciones'].append(segundos)
+        datos['errores'] += status == 0 or status >= 500
+        datos['rss'] = max(datos['rss'], rss or 0)
+    endpoints = {}
+    for nombre, datos in sorted(por_endpoint.items()):
+        endpoints[nombre] = {**_estadisticas(datos['duraciones']), 'errores': datos['errores']}
+        if datos['rss']:
+            endpoints[nombre]['rss_pico_mb'] = round(datos['rss'] / 1024, 1)
+    return {
+        'total': {
+            **_estadisticas([m[1] for m in muestras]),
+            'throughput_rps': round(len(muestras) / duracion, 1) if duracion else 0.0,
+            'rss_pico_mb': round(rss_pico_kb / 1024, 1),
+            'errores': sum(e['errores'] for e in endpoints.values()),
+        },
+        'endpoints': endpoints,
+    }
+
+def comparar(resultado, base, umbral, tolerancia_ms):
+    """Devuelve la lista de regresiones de ``resultado`` respecto de ``base``."""
+    regresiones = []
+    for modo, actual in resultado['modos'].items():
+        previo = base.get('modos', {}).get(modo)
+        if previo is None:
+            continue
+        if actual['total']['throughput_rps'] < previo['total']['throughput_rps'] * (1 - umbral):
+            regresiones.append(f'{modo}: throughput {previo["total"]["throughput_rps"]} -> '
+                               f'{actual["total"]["throughput_rps"]} req/s')
+        for nombre, datos in actual['endpoints'].items():
+            anterior = previo['endpoints'].get(nombre)
+            if anterior is None:
+                continue
+            if (datos['p95_ms'] > anterior['p95_ms'] * (1 + umbral)
+                    and datos['p95_ms'] - anterior['p95_ms'] > tolerancia_ms):
+                regresiones.append(f'{modo}/{nombre}: p95 {anterior["p95_ms"]} -> {datos["p95_ms"]} ms')
+    return regresiones
+
+def imprimir(resultado):
+    for modo, datos in resultado['modos'].items():
+        total = datos['total']
+        print(f'\n[{modo}] {total["n"]} peticiones, {total["throughput_rps"]} req/s, '
+              f'RSS pico {total["rss_pico_mb"]} MB, {total["errores"]} errores')
+        print(f'  {"endpoint":20} {"n":>6} {"p50":>9} {"p95":>9} {"p99":>9} {"err":>5}')
+        for nombre, e in datos['endpoints'].items():
+            print(f'  {nombre:20} {e["n"]:6d} {e["p50_ms"]:9.2f} {e["p95_ms"]:9.2f} '
+                  f'{e["p99_ms"]:9.2f} {e["errores"]:5d}')
+
+
+def _copia_sqlite(url):
+    """Copia la base SQLite de ``url`` a un temporal y devuelve (url de la copia, ruta)."""
+    ruta = make_url(url).database
+    destino = os.path.join(tempfile.mkdtemp(prefix='daie_bench_'), os.path.basename(ruta))
+    shutil.copy(ruta, destino)
+    return f'sqlite:///{destino}', destino
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', required=True, help='Base cargada con benchmarks.semilla.')
+    parser.add_argument('--modo', choices=('cliente', 'gunicorn', 'uvicorn', 'ambos', 'servidores'),
+                        default='cliente')
+    parser.add_argument('--peticiones', type=int, default=5000)
+    parser.add_argument('--calentamiento', type=int, default=200)
+    parser.add_argument('--semilla', type=int, default=7)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--inactivas', type=int, default=0,
+                        help='Clientes de /eventos conectados y sin actividad durante la medición.')
+    parser.add_argument('--salida', help='Guarda el resultado en este archivo JSON.')
+    parser.add_argument('--guardar-base', help='Guarda el resultado como base de comparación.')
+    parser.add_argument('--base', help='Compara contra este resultado guardado.')
+    parser.add_argument('--umbral', type=float, default=0.2, help='Empeoramiento tolerado (0.2 = 20%%).')
+    parser.add_argument('--tolerancia-ms', type=float, default=1.0,
+                        help='Diferencia de p95 por debajo de la cual no se considera regresión.')
+    parser.add_argument('--sin-copia', action='store_true', help='Usa la base SQLite original.')
+    args = parser.parse_args(argv)
+
+    modos = {'ambos': ('cliente', 'gunicorn'), 'servidores': ('gunicorn', 'uvicorn')}.get(args.modo, (args.modo,))
+    resultado = {'meta': {k: getattr(args, k) for k in (
+        'peticiones', 'calentamiento', 'semilla', 'workers', 'concurrencia', 'inactivas')}, 'modos': {}}
+    for modo in modos:
+        url, copia = args.url, None
+        if make_url(url).get_backend_name() == 'sqlite' and not args.sin_copia:
+            url, copia = _copia_sqlite(url)
+        try:
+            engine = create_engine(url)
+            with engine.connect() as conexion:
+                resultado['meta']['ordenes'] = conexion.execute(
+                    select(func.count()).select_from(text('ordenes'))).scalar()
+            peticiones = generar(Contexto(engine, args.semilla), args.calentamiento + args.peticiones)
+            engine.dispose()
+            if modo == 'cliente':
+                api = importar_api(url)
+                muestras, duracion, rss = ejecutar_cliente(api, peticiones, args.calentamiento)
+            elif modo == 'gunicorn' and args.inactivas >= args.workers:
+                # Cada cliente de /eventos retiene un worker sync: no quedaría ninguno libre
+                print(f'gunicorn: {args.inactivas} conexiones inactivas ocupan los {args.workers} workers, se omite')
+                continue
+            else:
+                muestras, duracion, rss = ejecutar_servidor(
+                    modo, url, peticiones, args.calentamiento, args.workers, args.concurrencia,
+                    args.inactivas)
+            resultado['modos'][modo] = resumir(muestras, duracion, rss)
+        finally:
+            if copia:
+                shutil.rmtree(os.path.dirname(copia), ignore_errors=True)
+
+    imprimir(resultado)
+    for destino in (args.salida, args.guardar_base):
+        if destino:
+            with open(destino, 'w') as archivo:
+                json.dump(resultado, archivo, indent=2)
+    if args.base:
+        with open(args.base) as archivo:
+            regresiones = comparar(resultado, json.load(archivo), args.umbral, args.tolerancia_ms)
+        if regresiones:
+            print('\nRegresiones:')
+            for regresion in regresiones:
+                print('  ' + regresion)
+            sys.exit(1)
+        print('\nSin regresiones respecto de la base')
+
+
+if __name__ == '__main__':
+    main()
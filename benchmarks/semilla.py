@@ -0,0 +1,141 @@
+"""Carga una base con volúmenes realistas para los benchmarks.
+
+    python -m benchmarks.semilla --url sqlite:///bench.sqlite
+    python -m benchmarks.semilla --url sqlite:///chica.sqlite --escala 0.01
+
+Con escala 1: 5k productos, 20k clientes, 500k órdenes repartidas en un año
+(una sesión por día) y ~3M líneas en ordenes_productos. Las últimas órdenes
+quedan en los estados activos; el resto, pagadas. Los datos dependen solo de
+``--semilla``, así dos corridas generan la misma base.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import insert
+
+from benchmarks import importar_api
+from modelos import Categoria, Cliente, Mesas, Mesero, Ordenes, OrdenesProductos, Productos, Sesion, SesionOrdenes, db
+
+VOLUMENES = {
+    'categorias': 40,
+    'productos': 5000,
+    'clientes': 20000,
+    'meseros': 50,
+    'mesas': 60,
+    'ordenes': 500000,
+    'items_por_orden': 6,  # promedio; cada orden lleva entre 1 y 11 productos
+    'activas': 200,
+    'dias': 365,
+}
+CHUNK = 10000
+METODOS_PAGO = ('efectivo', 'tarjeta', 'transferencia')
+
+
+def _insertar(conexion, modelo, filas):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= CHUNK:
+            conexion.execute(insert(modelo), lote)
+            lote = []
+    if lote:
+        conexion.execute(insert(modelo), lote)
+
+
+def sembrar(api, escala=1.0, semilla=42, hasta=None):
+    rng = random.Random(semilla)
+    n = {k: max(1, int(v * escala)) if k not in ('items_por_orden', 'dias') else v
+         for k, v in VOLUMENES.items()}
+    hasta = (hasta or datetime.now()).replace(minute=0, second=0, microsecond=0)
+    desde = hasta - timedelta(days=n['dias'])
+    precios = {i: Decimal(rng.randint(100, 5000)) / 100 for i in range(1, n['productos'] + 1)}
+    estados_activos = api.app.config['ESTADOS_ACTIVOS']
+
+    with api.app.app_context():
+        db.create_all()
+        with db.engine.begin() as conexion:
+            _insertar(conexion, Categoria, (
+                {'id': i, 'nombre': f'Categoría {i}'} for i in range(1, n['categorias'] + 1)))
+            _insertar(conexion, Productos, ({
+                'id': i, 'nombre': f'Producto {i}', 'precio_venta': precios[i],
+                'impuesto_venta': rng.choice((Decimal('0'), Decimal('8'), Decimal('19'))),
+                'categoria_id': rng.randint(1, n['categorias']), 'referencia': f'REF{i:06d}',
+            } for i in range(1, n['productos'] + 1)))
+            _insertar(conexion, Cliente, ({
+                'id': i, 'nombre': f'Cliente {i}', 'cedula': str(10000000 + i),
+                'telefono': f'300{i:07d}', 'nro_ordenes': 0,
+            } for i in range(1, n['clientes'] + 1)))
+            _insertar(conexion, Mesero, (
+                {'id': i, 'nombre': f'Mesero {i}'} for i in range(1, n['meseros'] + 1)))
+            _insertar(conexion, Mesas, ({
+                'id': i, 'numero': i, 'capacidad': rng.choice((2, 4, 6)), 'estado': 'libre',
+            } for i in range(1, n['mesas'] + 1)))
+            _insertar(conexion, Sesion, ({
+                'id': d + 1, 'estado': 'cerrada' if d < n['dias'] - 1 else 'abierta',
+                'fecha': desde + timedelta(days=d),
+            } for d in range(n['dias'])))
+
+            # Fechas ordenadas: los ids crecen con la fecha, como en producción
+            segundos = n['dias'] * 86400
+            fechas = sorted(rng.randrange(segundos) for _ in range(n['ordenes']))
+            primera_activa = n['ordenes'] - n['activas']
+            ordenes, items, sesiones = [], [], []
+            for i, segundo in enumerate(fechas, start=1):
+                productos = rng.sample(range(1, n['productos'] + 1),
+                                       rng.randint(1, 2 * n['items_por_orden'] - 1))
+                total = Decimal(0)
+                for producto_id in productos:
+                    cantidad = Decimal(rng.randint(1, 4))
+                    subtotal = precios[producto_id] * cantidad
+                    total += subtotal
+                    items.append({
+                        'orden_id': i, 'producto_id': producto_id,
+                        'producto_precio': precios[producto_id], 'cantidad': cantidad,
+                        'orden_producto_total': subtotal,
+                    })
+                activa = i > primera_activa
+                ordenes.append({
+                    'id': i, 'cliente_id': rng.randint(1, n['clientes']), 'total': total,
+                    'mesa': str(rng.randint(1, n['mesas'])),
+                    'estado': rng.choice(estados_activos) if activa else 'pagada',
+                    'mesero_id': rng.randint(1, n['meseros']),
+                    'metodo_pago': None if activa else rng.choice(METODOS_PAGO),
+                    'fecha': desde + timedelta(seconds=segundo),
+                })
+                sesiones.append({'sesion_id': segundo // 86400 + 1, 'orden_id': i})
+                if len(ordenes) >= CHUNK:
+                    _insertar(conexion, Ordenes, ordenes)
+                    _insertar(conexion, OrdenesProductos, items)
+                    _insertar(conexion, SesionOrdenes, sesiones)
+                    ordenes, items, sesiones = [], [], []
+            _insertar(conexion, Ordenes, ordenes)
+            _insertar(conexion, OrdenesProductos, items)
+            _insertar(conexion, SesionOrdenes, sesiones)
+
+    # Los agregados se reconstruyen con los mismos comandos que en producción
+    runner = api.app.test_cli_runner()
+    for comando in (['recalcular-resumen'], ['recalcular-ventas']):
+        resultado = runner.invoke(args=comando)
+        if resultado.exit_code != 0:
+            raise RuntimeError(f'{" ".join(comando)} falló: {resultado.output}') from resultado.exception
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', required=True, help='URI de la base a cargar (debe estar vacía).')
+    parser.add_argument('--escala', type=float, default=1.0, help='Multiplica los volúmenes.')
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    n = sembrar(importar_api(args.url), args.escala, args.semilla)
+    print(f'{n["ordenes"]} órdenes, {n["productos"]} productos, {n["clientes"]} clientes '
+          f'en {time.perf_counter() - inicio:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Microbenchmark de la serialización de listados: jsonify contra los codificadores compilados.
+
+    python -m benchmarks.serializacion [--filas 10000] [--repeticiones 20]
+
+Serializa un listado sintético de órdenes (Decimal y datetime en cada fila) y
+mide el mejor tiempo de cada camino:
+
+- ``jsonify``: un dict por fila con las conversiones anteriores y el proveedor
+  JSON por defecto de Flask (claves ordenadas, ``default`` por cada Decimal).
+- ``compilado+json`` y ``compilado+orjson``: ``filas_a_dicts`` con los
+  codificadores de ``CAMPOS_ORDEN`` y cada backend de serializacion.py.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+import serializacion
+from benchmarks import importar_api
+from comun import CAMPOS_ORDEN
+
+
+def filas_sinteticas(cantidad, semilla=1):
+    rng = random.Random(semilla)
+    inicio = datetime(2024, 1, 1)
+    return [(
+        i, rng.randint(1, 20000), Decimal(rng.randint(500, 90000)) / 100, str(rng.randint(1, 60)),
+        'pagada', rng.randint(1, 50), 'efectivo', None, Decimal(rng.randint(0, 5000)) / 100,
+        inicio + timedelta(seconds=rng.randrange(365 * 86400)), None, 1,
+    ) for i in range(1, cantidad + 1)]
+
+
+def _mejor(fn, repeticiones):
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    api = importar_api('sqlite://')
+    filas = filas_sinteticas(args.filas)
+    conversiones = [(n, c) for n, (_, c) in CAMPOS_ORDEN.items()]
+    nombres = [n for n, _ in conversiones]
+    proveedor_flask = DefaultJSONProvider(api.app)
+
+    def jsonify_anterior():
+        # Así armaba listar las filas antes de los codificadores compilados
+        datos = [{n: v for n, v in zip(nombres, f)} for f in filas]
+        return proveedor_flask.response(datos).get_data()
+
+    caminos = {'jsonify': jsonify_anterior}
+    backends = {'json': serializacion.BackendJSON()}
+    if serializacion.orjson is not None:
+        backends['orjson'] = serializacion.BackendOrjson()
+    for nombre, backend in backends.items():
+        caminos[f'compilado+{nombre}'] = (
+            lambda backend=backend: backend.dumps_bytes(serializacion.filas_a_dicts(conversiones, filas)))
+
+    with api.app.app_context():
+        tiempos = {nombre: _mejor(fn, args.repeticiones) for nombre, fn in caminos.items()}
+    referencia = tiempos['jsonify']
+    print(f'{args.filas} filas, mejor de {args.repeticiones}')
+    for nombre, segundos in tiempos.items():
+        print(f'  {nombre:18} {segundos * 1000:9.2f} ms  {referencia / segundos:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Índice de búsqueda de texto en memoria para listas cortas (productos).
+
+Cada documento se indexa por sus palabras normalizadas (minúsculas, sin
+tildes ni signos) y por los trigramas de esas palabras:
+
+- Las palabras se guardan también en una lista ordenada, así un término de la
+  consulta encuentra todas las palabras que empiezan con él con ``bisect``.
+- Los trigramas permiten encontrar coincidencias en medio de una palabra o
+  con errores de tipeo cuando los prefijos no alcanzan a llenar el resultado.
+
+``buscar`` exige que cada término sea prefijo de alguna palabra del documento
+(palabra exacta pesa más que prefijo) y completa con los parecidos por
+trigramas, que siempre puntúan por debajo. Los documentos se agregan y quitan
+de a uno, sin reconstruir el índice.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return _NO_ALFANUMERICO.sub(' ', texto.lower()).strip()
+
+def palabras(texto):
+    return normalizar(texto).split()
+
+def trigramas(palabra):
+    relleno = f'  {palabra} '
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class _Documento:
+    __slots__ = ('datos', 'nombre', 'referencia', 'grupo', 'palabras', 'trigramas')
+
+
+class IndiceTexto:
+    """Índice por prefijo de palabra y por trigramas; seguro entre hilos."""
+
+    def __init__(self, similitud_minima=0.45):
+        self.similitud_minima = similitud_minima
+        self._documentos = {}  # id -> _Documento
+        self._por_palabra = {}  # palabra -> set(ids)
+        self._ordenadas = []  # las claves de _por_palabra, ordenadas
+        self._por_trigrama = {}  # trigrama -> set(ids)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._documentos)
+
+    def cargar(self, documentos):
+        """Reemplaza el contenido por ``documentos``: (id, datos, nombre, referencia, grupo)."""
+        with self._lock:
+            self._documentos, self._por_palabra, self._ordenadas, self._por_trigrama = {}, {}, [], {}
+            for documento in documentos:
+                self._ordenadas.extend(self._poner(*documento))
+            self._ordenadas.sort()
+
+    def poner(self, id, datos, nombre, referencia=None, grupo=None):
+        """Agrega o reemplaza un documento; ``datos`` es lo que devuelve ``buscar``."""
+        with self._lock:
+            self._quitar(id)
+            for palabra in self._poner(id, datos, nombre, referencia, grupo):
+                insort(self._ordenadas, palabra)
+
+    def quitar(self, id):
+        with self._lock:
+            self._quitar(id)
+
+    def _poner(self, id, datos, nombre, referencia, grupo):
+        """Indexa el documento y devuelve las palabras que no estaban en el índice."""
+        documento = _Documento()
+        documento.datos, documento.grupo = datos, grupo
+        documento.nombre, documento.referencia = normalizar(nombre), normalizar(referencia)
+        documento.palabras = set(documento.nombre.split()) | set(documento.referencia.split())
+        documento.trigramas = set().union(*(trigramas(p) for p in documento.palabras))
+        self._documentos[id] = documento
+        nuevas = []
+        for palabra in documento.palabras:
+            if palabra not in self._por_palabra:
+                self._por_palabra[palabra] = set()
+                nuevas.append(palabra)
+            self._por_palabra[palabra].add(id)
+        for trigrama in documento.trigramas:
+            self._por_trigrama.setdefault(trigrama, set()).add(id)
+        return nuevas
+
+    def _quitar(self, id):
+        documento = self._documentos.pop(id, None)
+        if documento is None:
+            return
+        for palabra in documento.palabras:
+            ids = self._por_palabra[palabra]
+            ids.discard(id)
+            if not ids:
+                del self._por_palabra[palabra]
+                del self._ordenadas[bisect_left(self._ordenadas, palabra)]
+        for trigrama in documento.trigramas:
+            ids = self._por_trigrama[trigrama]
+            ids.discard(id)
+            if not ids:
+                del self._por_trigrama[trigrama]
+
+    def buscar(self, consulta, limite=10, grupo=None):
+        """Devuelve hasta ``limite`` pares (datos, puntaje), del más relevante al menos."""
+        terminos = palabras(consulta)
+        if not terminos or limite <= 0:
+            return []
+        with self._lock:
+            puntajes = self._por_prefijo(terminos, grupo)
+            if len(puntajes) < limite:
+                for id, similitud in self._por_trigramas(terminos, grupo).items():
+                    puntajes.setdefault(id, similitud)
+            # Empates: primero el nombre más corto (el más parecido a la consulta)
+            mejores = heapq.nsmallest(limite, puntajes.items(), key=lambda p: (
+                -p[1], len(self._documentos[p[0]].nombre), self._documentos[p[0]].nombre, p[0]))
+            return [(self._documentos[id].datos, round(puntaje, 3)) for id, puntaje in mejores]
+
+    def _por_prefijo(self, terminos, grupo):
+        # Cada término vale 2 si es una palabra completa y entre 1 y 2 si es un
+        # prefijo (más cuanto más largo); el documento debe coincidir con todos
+        acumulado = None
+        for termino in terminos:
+            mejor = {}
+            i = bisect_left(self._ordenadas, termino)
+            while i < len(self._ordenadas) and self._ordenadas[i].startswith(termino):
+                palabra = self._ordenadas[i]
+                peso = 2.0 if palabra == termino else 1.0 + len(termino) / len(palabra)
+                for id in self._por_palabra[palabra]:
+                    if mejor.get(id, 0) < peso:
+                        mejor[id] = peso
+                i += 1
+            if acumulado is None:
+                acumulado = mejor
+            else:
+                acumulado = {id: acumulado[id] + peso for id, peso in mejor.items() if id in acumulado}
+            if not acumulado:
+                return {}
+        frase = ' '.join(terminos)
+        puntajes = {}
+        for id, suma in acumulado.items():
+            documento = self._documentos[id]
+            if grupo is not None and documento.grupo != grupo:
+                continue
+            puntaje = suma / len(terminos)
+            if documento.referencia == frase:
+                puntaje += 3  # la referencia exacta (código del producto) va primero
+            elif documento.nombre.startswith(frase):
+                puntaje += 1
+            puntajes[id] = puntaje
+        return puntajes
+
+    def _por_trigramas(self, terminos, grupo):
+        # Proporción de trigramas de la consulta presentes en el documento (0 a 1)
+        buscados = set().union(*(trigramas(t) for t in terminos))
+        conteo = Counter()
+        for trigrama in buscados:
+            conteo.update(self._por_trigrama.get(trigrama, ()))
+        similitudes = {}
+        for id, compartidos in conteo.items():
+            similitud = compartidos / len(buscados)
+            if similitud >= self.similitud_minima and (grupo is None or self._documentos[id].grupo == grupo):
+                similitudes[id] = similitud
+        return similitudes
@@ -0,0 +1,249 @@
+"""Caché de respuestas en proceso con backends intercambiables.
+
+Cada worker de gunicorn tiene su propia caché. La invalidación por etiqueta solo
+alcanza al worker que hizo la escritura; los demás la notan porque la clave que
+arma comun.py incluye la versión de las tablas. Para compartir las entradas entre
+workers basta con implementar ``CacheBackend`` sobre un almacén común.
+"""
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Interfaz mínima que debe cumplir un backend de caché."""
+
+    def get(self, clave):
+        """Devuelve el valor guardado o ``None`` si no existe o ya venció."""
+        raise NotImplementedError
+
+    def set(self, clave, valor, ttl, etiquetas=()):
+        """Guarda ``valor`` durante ``ttl`` segundos asociado a ``etiquetas``."""
+        raise NotImplementedError
+
+    def agregar(self, clave, valor, ttl):
+        """Guarda ``valor`` solo si ``clave`` no existe (o venció); devuelve si lo guardó."""
+        raise NotImplementedError
+
+    def eliminar(self, clave):
+        raise NotImplementedError
+
+    def invalidar(self, etiqueta):
+        """Elimina todas las entradas asociadas a ``etiqueta``."""
+        raise NotImplementedError
+
+    def limpiar(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoriaLRU(CacheBackend):
+    """Backend en memoria con vencimiento por TTL y expulsión LRU por tamaño."""
+
+    def __init__(self, max_entradas=1024):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # clave -> (vence, valor, etiquetas)
+        self._etiquetas = {}  # etiqueta -> set(claves)
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[1]
+
+    def set(self, clave, valor, ttl, etiquetas=()):
+        with self._lock:
+            self._guardar(clave, valor, ttl, etiquetas)
+
+    def agregar(self, clave, valor, ttl):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None and entrada[0] >= time.monotonic():
+                return False
+            self._guardar(clave, valor, ttl, ())
+            return True
+
+    def eliminar(self, clave):
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+
+    def invalidar(self, etiqueta):
+        with self._lock:
+            for clave in list(self._etiquetas.get(etiqueta, ())):
+                self._quitar(clave)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._etiquetas.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+    def _guardar(self, clave, valor, ttl, etiquetas):
+        if clave in self._datos:
+            self._quitar(clave)
+        self._datos[clave] = (time.monotonic() + ttl, valor, tuple(etiquetas))
+        for etiqueta in etiquetas:
+            self._etiquetas.setdefault(etiqueta, set()).add(clave)
+        while len(self._datos) > self.max_entradas:
+            self._quitar(next(iter(self._datos)))
+
+    def _quitar(self, clave):
+        _, _, etiquetas = self._datos.pop(clave)
+        for etiqueta in etiquetas:
+            claves = self._etiquetas.get(etiqueta)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._etiquetas[etiqueta]
+
+
+class SQLiteCompartido(CacheBackend):
+    """Backend sobre un archivo SQLite local, compartido por los workers del host.
+
+    Las claves se guardan como JSON y los valores con pickle. ``agregar`` es un
+    único INSERT ... ON CONFLICT condicionado al vencimiento, así entre dos
+    procesos solo uno reserva la clave. Las entradas vencidas se borran cada
+    ``PURGA_CADA`` escrituras. Con varios hosts hace falta un almacén común a
+    todos (otro backend).
+    """
+
+    PURGA_CADA = 1000
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS {tabla} (
+        clave TEXT PRIMARY KEY,
+        valor BLOB NOT NULL,
+        vence REAL NOT NULL,
+        etiquetas TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS ix_{tabla}_vence ON {tabla} (vence);
+    """
+
+    def __init__(self, ruta=None, tabla='cache'):
+        self.ruta = ruta
+        self.tabla = tabla
+        self._local = threading.local()
+        self._escrituras = 0
+
+    # Conexión por hilo (y por proceso, para sobrevivir al fork), como tareas.Cola
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid() or self._local.ruta != self.ruta:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.executescript(self.ESQUEMA.format(tabla=self.tabla))
+            self._local.conexion, self._local.pid, self._local.ruta = conexion, os.getpid(), self.ruta
+        return conexion
+
+    @staticmethod
+    def _clave(clave):
+        return json.dumps(clave)
+
+    def get(self, clave):
+        fila = self._conexion().execute(
+            f'SELECT valor FROM {self.tabla} WHERE clave = ? AND vence >= ?',
+            (self._clave(clave), time.time())).fetchone()
+        return None if fila is None else pickle.loads(fila[0])
+
+    def set(self, clave, valor, ttl, etiquetas=()):
+        self._conexion().execute(
+            f'INSERT OR REPLACE INTO {self.tabla} (clave, valor, vence, etiquetas) VALUES (?, ?, ?, ?)',
+            (self._clave(clave), pickle.dumps(valor), time.time() + ttl,
+             ''.join(f'|{e}|' for e in etiquetas)))
+        self._purgar()
+
+    def agregar(self, clave, valor, ttl):
+        ahora = time.time()
+        cursor = self._conexion().execute(
+            f'INSERT INTO {self.tabla} (clave, valor, vence) VALUES (?, ?, ?) '
+            f'ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor, vence = excluded.vence, etiquetas = \'\' '
+            f'WHERE {self.tabla}.vence < ?',
+            (self._clave(clave), pickle.dumps(valor), ahora + ttl, ahora))
+        self._purgar()
+        return cursor.rowcount == 1
+
+    def eliminar(self, clave):
+        self._conexion().execute(f'DELETE FROM {self.tabla} WHERE clave = ?', (self._clave(clave),))
+
+    def invalidar(self, etiqueta):
+        self._conexion().execute(f'DELETE FROM {self.tabla} WHERE etiquetas LIKE ?', (f'%|{etiqueta}|%',))
+
+    def limpiar(self):
+        self._conexion().execute(f'DELETE FROM {self.tabla}')
+
+    def __len__(self):
+        return self._conexion().execute(
+            f'SELECT COUNT(*) FROM {self.tabla} WHERE vence >= ?', (time.time(),)).fetchone()[0]
+
+    def _purgar(self):
+        self._escrituras += 1
+        if self._escrituras % self.PURGA_CADA == 0:
+            self._conexion().execute(f'DELETE FROM {self.tabla} WHERE vence < ?', (time.time(),))
+
+
+class Cache:
+    """Fachada sobre un backend que lleva los contadores de aciertos y fallos.
+
+    ``generacion()`` permite descartar una respuesta calculada mientras otra
+    petición invalidaba sus etiquetas, para no guardar datos ya viejos.
+    """
+
+    def __init__(self, backend=None, ttl=30):
+        self.backend = backend if backend is not None else MemoriaLRU()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._generaciones = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        valor = self.backend.get(clave)
+        with self._lock:
+            if valor is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return valor
+
+    def generacion(self, etiquetas):
+        return tuple(self._generaciones.get(e, 0) for e in etiquetas)
+
+    def set(self, clave, valor, etiquetas=(), generacion=None):
+        if generacion is not None and generacion != self.generacion(etiquetas):
+            return
+        self.backend.set(clave, valor, self.ttl, etiquetas)
+
+    def invalidar(self, etiqueta):
+        with self._lock:
+            self._generaciones[etiqueta] = self._generaciones.get(etiqueta, 0) + 1
+        self.backend.invalidar(etiqueta)
+
+    def limpiar(self):
+        self.backend.limpiar()
+
+    def estadisticas(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+            'entradas': len(self.backend),
+            'ttl': self.ttl,
+        }
@@ -0,0 +1,1288 @@
+"""Lo que comparten los blueprints de rutas/.
+
+Servicios de la app (caché, broker, cola, idempotencia), versiones de tabla y
+validadores HTTP, agregados y totales, archivo de órdenes, tareas en segundo
+plano, paginación y parseo de parámetros.
+"""
+import base64
+import binascii
+import functools
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+
+from flask import Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import (Column, Table, and_, bindparam, delete, desc, event, insert, or_, select, type_coerce,
+                        union_all, update)
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, configure_mappers, selectinload
+from sqlalchemy.sql import func
+from sqlalchemy.sql.visitors import replacement_traverse
+from werkzeug.local import LocalProxy
+
+import serializacion
+from modelos import (ARCHIVO, ORDENES_ARCHIVO, SESION_ORDENES_ARCHIVO, Auditoria, Categoria, Cliente, Mesas, Mesero,
+                     Ordenes, OrdenesProductos, Productos, ResumenSesion, Sesion, SesionOrdenes, Valoraciones,
+                     VentaHora, VersionTabla, db)
+from serializacion import compilar, filas_a_dicts
+
+
+# Estado por app: crear_app arma la caché, el broker de eventos, la cola de
+# tareas y el almacén de idempotencia con la configuración de cada app y los
+# guarda en app.extensions['pos']; aquí se usan a través de la app actual.
+def _de_la_app(nombre):
+    return LocalProxy(lambda: current_app.extensions['pos'][nombre])
+
+cache = _de_la_app('cache')
+broker = _de_la_app('broker')
+cola = _de_la_app('cola')
+respuestas_idempotentes = _de_la_app('idempotencia')
+
+
+# Tablas modificadas por transacción: se acumulan en session.info y al confirmar
+# se notifican a los callbacks registrados (invalidación de caché, etc.)
+_al_confirmar = []
+
+def al_confirmar(fn):
+    _al_confirmar.append(fn)
+    return fn
+
+def _marcar_tabla(session, tabla):
+    session.info.setdefault('tablas_modificadas', set()).add(tabla)
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        _marcar_tabla(session, obj.__table__.name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _registrar_execute(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        _marcar_tabla(estado.session, estado.statement.table.name)
+
+@event.listens_for(Session, 'before_commit')
+def _incrementar_versiones(session):
+    # commit() llama a before_commit antes de su propio flush
+    session.flush()
+    tablas = session.info.get('tablas_modificadas', set()) - {VersionTabla.__tablename__}
+    if tablas:
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        session.execute(_sentencia_upsert(
+            session, VersionTabla,
+            [{'tabla': t, 'version': 1, 'modificado': ahora} for t in sorted(tablas)],
+            ('tabla',),
+            lambda nuevos: {'version': VersionTabla.__table__.c.version + 1,
+                            'modificado': nuevos.modificado}))
+
+@event.listens_for(Session, 'after_commit')
+def _notificar_commit(session):
+    tablas = session.info.pop('tablas_modificadas', None)
+    if tablas:
+        for fn in _al_confirmar:
+            fn(tablas)
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_rollback(session):
+    session.info.pop('tablas_modificadas', None)
+
+@al_confirmar
+def _invalidar_cache(tablas):
+    for tabla in tablas:
+        cache.invalidar(tabla)
+        for memo in _versiones.values():
+            memo.pop(tabla, None)
+
+
+# Modelos en memoria (índice de productos, órdenes activas, salón)
+#
+# Cada worker los mantiene al día con sus propias escrituras: un Seguimiento
+# anota en session.info las filas que toca la transacción, en before_commit las
+# relee y al confirmar entrega el resultado al modelo. Lo que no se puede seguir
+# por filas (un UPDATE o DELETE masivo) marca el modelo para recargar.
+_seguimientos = []
+
+class Seguimiento:
+    """Listeners de sesión de un modelo en memoria.
+
+    ``clases`` asocia las clases ORM seguidas con la clave bajo la que se anotan
+    los ids de sus objetos en cada flush; ``ordenes``, si no es None, es la clave
+    para los ids que informa tocar_ordenes. ``execute(seguimiento, estado)`` revisa
+    las sentencias de escritura Core y llama a ``anotar`` o ``recargar``.
+
+    En before_commit ``leer(session, ids, recargar)`` recibe ``{clave: ids}`` y
+    devuelve los argumentos de ``aplicar`` (o None), que se llama al confirmar.
+    Se registra después de _incrementar_versiones: las versiones que lea ``leer``
+    ya incluyen este commit.
+    """
+    def __init__(self, nombre, clases, leer, aplicar, execute=None, ordenes=None):
+        self.nombre = nombre
+        self.clases = clases
+        self.leer = leer
+        self.aplicar = aplicar
+        self.execute = execute
+        self.ordenes = ordenes
+        event.listen(Session, 'after_flush', self._registrar_flush)
+        event.listen(Session, 'do_orm_execute', self._registrar_execute)
+        event.listen(Session, 'before_commit', self._leer_cambios)
+        event.listen(Session, 'after_commit', self._aplicar)
+        event.listen(Session, 'after_rollback', self._descartar)
+        _seguimientos.append(self)
+
+    def _anotaciones(self, session):
+        return session.info.setdefault(self.nombre, {'ids': defaultdict(set), 'recargar': False})
+
+    def anotar(self, session, clave, ids):
+        self._anotaciones(session)['ids'][clave].update(ids)
+
+    def recargar(self, session):
+        self._anotaciones(session)['recargar'] = True
+
+    def _registrar_flush(self, session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            clave = self.clases.get(type(obj))
+            if clave is not None:
+                self.anotar(session, clave, (obj.id,))
+
+    def _registrar_execute(self, estado):
+        if self.execute is not None and (estado.is_insert or estado.is_update or estado.is_delete):
+            self.execute(self, estado)
+
+    def _leer_cambios(self, session):
+        session.flush()
+        anotaciones = session.info.pop(self.nombre, None)
+        if anotaciones is None:
+            return
+        cambios = self.leer(session, anotaciones['ids'], anotaciones['recargar'])
+        if cambios is not None:
+            session.info[self.nombre + '_cambios'] = cambios
+
+    def _aplicar(self, session):
+        cambios = session.info.pop(self.nombre + '_cambios', None)
+        if cambios is not None:
+            self.aplicar(*cambios)
+
+    def _descartar(self, session):
+        session.info.pop(self.nombre, None)
+        session.info.pop(self.nombre + '_cambios', None)
+
+def anotar_ordenes(session, orden_ids):
+    """Anota las órdenes para los modelos en memoria que las siguen (ver tocar_ordenes)."""
+    for seguimiento in _seguimientos:
+        if seguimiento.ordenes is not None:
+            seguimiento.anotar(session, seguimiento.ordenes, orden_ids)
+
+def _version_tabla(session, tabla):
+    return session.execute(select(VersionTabla.version).where(
+        VersionTabla.tabla == tabla)).scalar_one_or_none() or 0
+
+
+# Versiones por tabla: se leen de version_tabla y se recuerdan VERSION_TTL
+# segundos, así las peticiones condicionales casi nunca consultan la base.
+# Primaria y réplica se recuerdan por separado: la réplica puede ir atrasada y
+# sus versiones deben corresponder a los datos que ella misma devuelve.
+_versiones = {'primaria': {}, 'replica': {}}  # origen -> tabla -> (version, modificado, leido)
+
+def versiones(tablas):
+    memo = _versiones['replica' if db.session.info.get('replica') else 'primaria']
+    vencidas = _vencidas(memo, tablas)
+    if vencidas:
+        _recordar(memo, vencidas, db.session.execute(_consulta_versiones(vencidas)))
+    return [memo[t][:2] for t in tablas]
+
+def _vencidas(memo, tablas):
+    ahora = time.monotonic()
+    return [t for t in tablas if t not in memo or ahora - memo[t][2] > current_app.config['VERSION_TTL']]
+
+def _consulta_versiones(tablas):
+    return (select(VersionTabla.tabla, VersionTabla.version, VersionTabla.modificado)
+            .where(VersionTabla.tabla.in_(tablas)))
+
+def _recordar(memo, tablas, filas):
+    ahora = time.monotonic()
+    leidas = dict.fromkeys(tablas, (0, None))
+    leidas.update({v.tabla: (v.version, v.modificado) for v in filas})
+    for tabla, (version, modificado) in leidas.items():
+        memo[tabla] = (version, modificado, ahora)
+
+def validadores(estado):
+    """ETag débil y Last-Modified a partir de las versiones de ``versiones``.
+
+    El ETag lleva el prefijo ``t:`` y el de una fila (``etag_fila``) ``r:``: con
+    los mismos números, uno no puede pasar por el otro en If-None-Match.
+    """
+    etag = 't:' + '.'.join(str(v) for v, _ in estado)
+    fechas = [m for _, m in estado if m is not None]
+    return etag, max(fechas).replace(tzinfo=timezone.utc, microsecond=0) if fechas else None
+
+def no_modificado(etag, modificado):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return (modificado is not None and request.if_modified_since is not None
+            and modificado <= request.if_modified_since)
+
+def condicional(*modelos):
+    """Agrega ETag y Last-Modified a las respuestas GET según la versión de las tablas.
+
+    Si el cliente envía un ``If-None-Match`` (o ``If-Modified-Since``) vigente se
+    responde 304 sin ejecutar la vista. Con ``expand`` se suman las tablas de los
+    modelos expandidos a partir del primero de ``modelos``.
+    Si la vista ya puso un ETag (la versión de la fila, la misma que exige
+    ``If-Match`` en PUT/DELETE) se respeta, con su propio 304.
+    """
+    tablas = tuple(m.__tablename__ for m in modelos)
+
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'GET':
+                return vista(*args, **kwargs)
+
+            consultadas = tablas
+            if request.args.get('expand'):
+                consultadas += tuple(t for t in _tablas_expand(modelos[0]) if t not in tablas)
+            etag, modificado = validadores(versiones(consultadas))
+            if no_modificado(etag, modificado):
+                respuesta = Response(status=304)
+            else:
+                respuesta = current_app.make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+                propio, debil = respuesta.get_etag()
+                if propio and not debil:
+                    if request.if_none_match.contains(propio):
+                        respuesta = Response(status=304)
+                        respuesta.set_etag(propio)
+                    return respuesta
+            respuesta.set_etag(etag, weak=True)
+            if modificado is not None:
+                respuesta.last_modified = modificado
+            return respuesta
+        return envoltura
+    return decorador
+
+
+# Caché de lectura
+def cacheado(*modelos):
+    """Cachea las respuestas GET 200 de la vista, por ruta y parámetros de consulta.
+
+    Las entradas se etiquetan con las tablas de ``modelos`` y se invalidan al
+    confirmarse cualquier escritura sobre ellas; la clave incluye además la
+    versión de esas tablas, así las escrituras de otros workers también se ven.
+    """
+    tablas = tuple(m.__tablename__ for m in modelos)
+
+    def decorador(vista):
+        @functools.wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'GET' or 'stream' in request.args or _capturando():
+                return vista(*args, **kwargs)
+
+            version = '.'.join(str(v) for v, _ in versiones(tablas))
+            clave = version + ':' + request.path + '?' + '&'.join(
+                f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+            guardada = cache.get(clave)
+            if guardada is not None:
+                cuerpo, headers = guardada
+                return Response(cuerpo, 200, headers)
+
+            generacion = cache.generacion(tablas)
+            respuesta = current_app.make_response(vista(*args, **kwargs))
+            if respuesta.status_code == 200 and not respuesta.is_streamed:
+                cache.set(clave, (respuesta.get_data(), list(respuesta.headers)),
+                          tablas, generacion)
+            return respuesta
+        return envoltura
+    return decorador
+
+
+_captura = threading.local()
+
+def _capturando():
+    return getattr(_captura, 'sentencias', None) is not None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _capturar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    if _capturando() and statement.lstrip().upper().startswith('SELECT'):
+        _captura.sentencias.append((conn.engine, statement, parameters))
+
+
+# Agregados de ventas (resumen por sesión y ventas por hora)
+#
+# Cada transacción que toca una orden (la orden, sus productos o su vínculo con
+# una sesión) guarda en before_flush el aporte previo de esa orden a las tablas
+# de agregados; en before_commit se calcula el aporte nuevo y se suma la
+# diferencia, dentro de la misma transacción. Las órdenes anuladas
+# (ESTADOS_ANULADOS) no aportan: al cancelarse una orden su aporte se resta.
+AGREGADOS = {
+    # tabla -> (modelo, columna de grupo)
+    'resumen_sesion': (ResumenSesion, 'sesion_id'),
+    'venta_hora': (VentaHora, 'hora'),
+}
+
+def _aportes(session, orden_ids):
+    """Aporte de las órdenes a los agregados, calculado en Python con tres consultas.
+
+    Devuelve ``{(tabla, grupo, dimension, clave): [ordenes, cantidad, total]}``.
+    """
+    aportes = defaultdict(lambda: [0, 0, 0])
+    if not orden_ids:
+        return aportes
+    sesiones = defaultdict(list)
+    for orden_id, sesion_id in session.execute(
+            select(SesionOrdenes.orden_id, SesionOrdenes.sesion_id)
+            .where(SesionOrdenes.orden_id.in_(orden_ids))):
+        sesiones[orden_id].append(sesion_id)
+    lineas = defaultdict(list)
+    for fila in session.execute(
+            select(OrdenesProductos.orden_id, OrdenesProductos.producto_id, Productos.categoria_id,
+                   OrdenesProductos.cantidad, OrdenesProductos.orden_producto_total)
+            .join(Productos, Productos.id == OrdenesProductos.producto_id)
+            .where(OrdenesProductos.orden_id.in_(orden_ids))):
+        lineas[fila[0]].append(fila[1:])
+
+    anulados = current_app.config['ESTADOS_ANULADOS']
+    for orden_id, fecha, total, metodo_pago, mesero_id in session.execute(
+            select(Ordenes.id, Ordenes.fecha, Ordenes.total, Ordenes.metodo_pago, Ordenes.mesero_id)
+            .where(Ordenes.id.in_(orden_ids), Ordenes.estado.not_in(anulados))):
+        total = total or 0
+        por_linea = defaultdict(lambda: [1, 0, 0])
+        for producto_id, categoria_id, cantidad, linea_total in lineas[orden_id]:
+            for clave in (('producto', str(producto_id)), ('categoria', str(categoria_id))):
+                por_linea[clave][1] += cantidad
+                por_linea[clave][2] += linea_total
+        valores = {
+            ('general', ''): (1, 0, total),
+            ('metodo_pago', metodo_pago or ''): (1, 0, total),
+            ('mesero', str(mesero_id)): (1, 0, total),
+            **por_linea,
+        }
+        grupos = [('resumen_sesion', s) for s in sesiones[orden_id]]
+        grupos.append(('venta_hora', fecha.replace(minute=0, second=0, microsecond=0)))
+        for tabla, grupo in grupos:
+            for (dimension, clave), (ordenes, cantidad, monto) in valores.items():
+                aporte = aportes[(tabla, grupo, dimension, clave)]
+                aporte[0] += ordenes
+                aporte[1] += cantidad
+                aporte[2] += monto
+    return aportes
+
+def tocar_ordenes(session, orden_ids, nuevas=False):
+    """Registra el aporte actual de las órdenes a los agregados antes de modificarlas.
+
+    También las anota para los modelos en memoria (órdenes activas, salón), que
+    las releen al confirmar.
+
+    Las escrituras ORM lo hacen solas (before_flush); las sentencias Core sobre
+    ordenes, ordenes_productos o sesion_ordenes deben llamarla antes de ejecutarse.
+    Con ``nuevas=True`` las órdenes se acaban de insertar y no tienen aporte previo.
+    """
+    orden_ids = {i for i in orden_ids if i is not None}
+    anotar_ordenes(session, orden_ids)
+    tocadas = session.info.setdefault('agregados_ordenes', set())
+    pendientes = orden_ids - tocadas
+    if not pendientes:
+        return
+    tocadas |= pendientes
+    if nuevas:
+        return
+    antes = session.info.setdefault('agregados_antes', defaultdict(lambda: [0, 0, 0]))
+    for clave, valores in _aportes(session, pendientes).items():
+        for i, valor in enumerate(valores):
+            antes[clave][i] += valor
+
+@event.listens_for(Session, 'before_flush')
+def _agregados_antes_del_flush(session, flush_context, instances):
+    ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Ordenes):
+            ids.add(obj.id)
+        elif isinstance(obj, (OrdenesProductos, SesionOrdenes)):
+            ids.add(obj.orden_id)
+    if ids:
+        tocar_ordenes(session, ids)
+
+@event.listens_for(Session, 'after_flush')
+def _agregados_ordenes_nuevas(session, flush_context):
+    nuevas = [obj.id for obj in session.new if isinstance(obj, Ordenes)]
+    if nuevas:
+        tocar_ordenes(session, nuevas, nuevas=True)
+
+# insert=True: corre antes que _incrementar_versiones, así las escrituras sobre
+# resumen_sesion y venta_hora también suben la versión de esas tablas
+@event.listens_for(Session, 'before_commit', insert=True)
+def _actualizar_agregados(session):
+    # Primero el flush: before_flush anota las órdenes que quedaban pendientes
+    session.flush()
+    tocadas = session.info.pop('agregados_ordenes', None)
+    antes = session.info.pop('agregados_antes', {})
+    if not tocadas:
+        return
+    despues = _aportes(session, tocadas)
+
+    deltas = defaultdict(list)
+    for clave in antes.keys() | despues.keys():
+        previo, actual = antes.get(clave, (0, 0, 0)), despues.get(clave, (0, 0, 0))
+        delta = [a - p for a, p in zip(actual, previo)]
+        if any(delta):
+            tabla, grupo, dimension, valor = clave
+            deltas[tabla].append({AGREGADOS[tabla][1]: grupo, 'dimension': dimension, 'clave': valor,
+                                  'ordenes': delta[0], 'cantidad': delta[1], 'total': delta[2]})
+
+    for nombre, filas in deltas.items():
+        modelo, columna = AGREGADOS[nombre]
+        tabla = modelo.__table__
+        session.execute(_sentencia_upsert(
+            session, modelo, filas, (columna, 'dimension', 'clave'),
+            lambda nuevos: {'ordenes': tabla.c.ordenes + nuevos.ordenes,
+                            'cantidad': tabla.c.cantidad + nuevos.cantidad,
+                            'total': tabla.c.total + nuevos.total}))
+        session.execute(delete(modelo).where(
+            tabla.c[columna].in_({f[columna] for f in filas}), tabla.c.ordenes <= 0))
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_agregados(session):
+    session.info.pop('agregados_ordenes', None)
+    session.info.pop('agregados_antes', None)
+
+
+# Total de las órdenes
+#
+# Ordenes.total lo calcula el servidor: la suma de las líneas más su impuesto
+# (impuesto_venta del producto, en porcentaje), redondeada a centavos. Cada
+# cambio de líneas lo recalcula con un UPDATE agregado sobre la orden, sin
+# cargar las filas. Las escrituras ORM lo hacen solas al terminar el flush; las
+# sentencias Core sobre ordenes_productos deben llamar a actualizar_totales.
+ORDENES_CHUNK = 5000
+
+def _total_lineas():
+    """Total con impuesto de un grupo de líneas (unidas a productos)."""
+    return type_coerce(func.round(func.sum(
+        OrdenesProductos.orden_producto_total * (100 + func.coalesce(Productos.impuesto_venta, 0))) / 100, 2),
+        Ordenes.total.type)
+
+def _total_calculado():
+    """Total de la orden, como subconsulta correlacionada con Ordenes."""
+    return func.coalesce(
+        select(_total_lineas()).select_from(OrdenesProductos)
+        .join(Productos, Productos.id == OrdenesProductos.producto_id)
+        .where(OrdenesProductos.orden_id == Ordenes.id).scalar_subquery(), 0)
+
+def actualizar_totales(session, orden_ids, sincronizar='fetch'):
+    """Recalcula el total de las órdenes con un solo UPDATE; devuelve cuántas cambiaron.
+
+    Solo escribe las órdenes cuyo total difiere del calculado, y les sube la versión.
+    """
+    orden_ids = sorted({i for i in orden_ids if i is not None})
+    if not orden_ids:
+        return 0
+    tocar_ordenes(session, orden_ids)
+    calculado = _total_calculado()
+    return session.execute(
+        update(Ordenes).where(Ordenes.id.in_(orden_ids), Ordenes.total.is_distinct_from(calculado))
+        .values(total=calculado, version=Ordenes.version + 1)
+        .execution_options(synchronize_session=sincronizar, orden_ids=tuple(orden_ids))).rowcount
+
+@event.listens_for(Session, 'after_flush')
+def _totales_registrar_flush(session, flush_context):
+    ids = {obj.orden_id for obj in (*session.new, *session.dirty, *session.deleted)
+           if isinstance(obj, OrdenesProductos)}
+    if ids:
+        session.info.setdefault('totales_ordenes', set()).update(ids)
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _totales_actualizar(session, flush_context):
+    # Dentro del flush de commit(): _incrementar_versiones ya ve la tabla ordenes
+    ids = session.info.pop('totales_ordenes', None)
+    if ids:
+        actualizar_totales(session, ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _totales_descartar(session):
+    session.info.pop('totales_ordenes', None)
+
+def revisar_totales(session, desde=0, hasta=None, corregir=True, chunk=ORDENES_CHUNK):
+    """Compara ordenes.total con el calculado por bloques de ``chunk`` órdenes (por id).
+
+    Cada bloque calcula los totales con un GROUP BY sobre sus líneas y, con
+    ``corregir``, reescribe solo las órdenes que difieren y confirma. Genera por
+    bloque ``{'hasta', 'revisadas', 'diferencias', 'corregidas'}``; ``hasta`` es
+    el último id revisado, desde donde se puede retomar. Las órdenes archivadas
+    no se revisan: ya no cambian.
+    """
+    ultimo = desde
+    limite = [Ordenes.id <= hasta] if hasta is not None else []
+    while True:
+        ids = select(Ordenes.id).where(Ordenes.id > ultimo, *limite).order_by(Ordenes.id).limit(chunk).subquery()
+        revisadas, fin = session.execute(select(func.count(), func.max(ids.c.id))).one()
+        if not revisadas:
+            return
+        calculados = (select(OrdenesProductos.orden_id, _total_lineas().label('calculado'))
+                      .join(Productos, Productos.id == OrdenesProductos.producto_id)
+                      .where(OrdenesProductos.orden_id > ultimo, OrdenesProductos.orden_id <= fin)
+                      .group_by(OrdenesProductos.orden_id).subquery())
+        calculado = func.coalesce(calculados.c.calculado, 0)
+        diferencias = session.execute(
+            select(Ordenes.id, Ordenes.total, calculado.label('calculado'))
+            .outerjoin(calculados, calculados.c.orden_id == Ordenes.id)
+            .where(Ordenes.id > ultimo, Ordenes.id <= fin, Ordenes.total.is_distinct_from(calculado))
+            .order_by(Ordenes.id)).all()
+        corregidas = 0
+        if corregir and diferencias:
+            corregidas = actualizar_totales(session, [d.id for d in diferencias], sincronizar=False)
+        session.commit()
+        yield {'hasta': fin, 'revisadas': revisadas, 'diferencias': diferencias, 'corregidas': corregidas}
+        ultimo = fin
+
+
+# Archivo de órdenes
+#
+# archivar_lote mueve a las tablas de ARCHIVO las órdenes cerradas anteriores a
+# un corte cuya sesión (si tienen) también está cerrada. Los listados suman el
+# archivo solo cuando el rango pedido llega hasta él: limite_archivo da la fecha,
+# orden y sesión más recientes archivadas, recordadas por la versión de
+# ordenes_archivo. Los reportes leen venta_hora y resumen_sesion, que siguen
+# contando las órdenes archivadas.
+ARCHIVO_LOTE = 1000
+_limites_archivo = {}  # origen -> (versión de ordenes_archivo, límites)
+
+def _en_archivo(stmt):
+    """La misma sentencia leyendo las tablas de archivo en lugar de las activas."""
+    def reemplazo(elemento):
+        if isinstance(elemento, Table) and elemento in ARCHIVO:
+            return ARCHIVO[elemento][0]
+        tabla = getattr(elemento, 'table', None)
+        if isinstance(elemento, Column) and tabla in ARCHIVO:
+            return ARCHIVO[tabla][0].c[elemento.key]
+        return None
+    return replacement_traverse(stmt, {}, reemplazo)
+
+def _consulta_limite_archivo():
+    return select(func.max(ORDENES_ARCHIVO.c.fecha).label('fecha'), func.max(ORDENES_ARCHIVO.c.id).label('orden_id'),
+                  select(func.max(SESION_ORDENES_ARCHIVO.c.sesion_id)).scalar_subquery().label('sesion_id'))
+
+def _recordar_limite(origen, version, limite):
+    # Con el archivo vacío la versión es 0 y no hace falta consultar
+    if limite is not None and limite.orden_id is None:
+        limite = None
+    _limites_archivo[origen] = (version, limite)
+    return limite
+
+def limite_archivo():
+    """Fecha, orden_id y sesion_id más recientes del archivo, o None si está vacío."""
+    origen = 'replica' if db.session.info.get('replica') else 'primaria'
+    version = versiones((ORDENES_ARCHIVO.name,))[0][0]
+    recordado = _limites_archivo.get(origen)
+    if recordado is not None and recordado[0] == version:
+        return recordado[1]
+    return _recordar_limite(origen, version,
+                            db.session.execute(_consulta_limite_archivo()).one() if version else None)
+
+def necesita_archivo(limite, desde, estados=None):
+    """True si un listado de órdenes desde ``desde`` (None: sin límite) alcanza al archivo.
+
+    Con ``estados`` (filtro del listado) no hace falta si ninguno es archivable.
+    """
+    if estados and not set(estados) & set(current_app.config['ESTADOS_CERRADOS']):
+        return False
+    return limite is not None and (desde is None or desde <= limite.fecha)
+
+def archivar_lote(session, corte, lote=ARCHIVO_LOTE):
+    """Mueve al archivo hasta ``lote`` órdenes archivables anteriores a ``corte``.
+
+    Copia la orden, sus líneas y sus filas de sesion_ordenes, las borra de las
+    tablas activas y confirma: cada lote es una transacción, así que si el
+    proceso se corta basta con volver a llamarla. Los borrados no pasan por
+    tocar_ordenes, así venta_hora y resumen_sesion conservan lo archivado.
+    Devuelve la cantidad de órdenes movidas (0 cuando no queda ninguna).
+    """
+    config = current_app.config
+    sesion_abierta = (select(SesionOrdenes.orden_id)
+                      .join(Sesion, Sesion.id == SesionOrdenes.sesion_id)
+                      .where(SesionOrdenes.orden_id == Ordenes.id,
+                             Sesion.estado.not_in(config['SESIONES_CERRADAS'])))
+    ids = session.scalars(
+        select(Ordenes.id)
+        .where(Ordenes.fecha < corte, Ordenes.estado.in_(config['ESTADOS_CERRADOS']), ~sesion_abierta.exists())
+        .order_by(Ordenes.id).limit(lote).with_for_update()).all()
+    if not ids:
+        return 0
+    for tabla, (archivo, columna) in ARCHIVO.items():
+        session.execute(insert(archivo).from_select(
+            [c.name for c in tabla.columns], select(tabla).where(tabla.c[columna].in_(ids))))
+    for tabla, (_, columna) in reversed(ARCHIVO.items()):
+        session.execute(delete(tabla).where(tabla.c[columna].in_(ids)))
+    session.commit()
+    return len(ids)
+
+FORMATOS_PERIODO = {'hora': '%Y-%m-%d %H:00:00', 'dia': '%Y-%m-%d', 'mes': '%Y-%m'}
+
+def _truncar_fecha(session, columna, granularidad):
+    """Expresión SQL que formatea ``columna`` al inicio de su hora, día o mes."""
+    formato = FORMATOS_PERIODO[granularidad]
+    dialecto = session.get_bind(mapper=Ordenes.__mapper__).dialect.name
+    if dialecto == 'mysql':
+        return func.date_format(columna, formato)
+    if dialecto == 'sqlite':
+        return func.strftime(formato, columna)
+    raise NotImplementedError(f'Truncado de fechas no soportado para {dialecto}')
+
+def _agregar_sql(session, grupo, unir, *criterios):
+    """Recalcula los agregados en SQL (GROUP BY) para las reconstrucciones completas.
+
+    ``grupo`` es la expresión de agrupación y ``unir(stmt)`` agrega los joins que
+    necesita partiendo de ordenes. Como en ``_aportes``, las órdenes anuladas no
+    cuentan. Cada consulta se repite sobre el archivo y se suma. Devuelve el mismo formato que ``_aportes`` sin la tabla:
+    ``{(grupo, dimension, clave): [ordenes, cantidad, total]}``.
+    """
+    agregados = defaultdict(lambda: [0, 0, 0])
+    criterios = (*criterios, Ordenes.estado.not_in(current_app.config['ESTADOS_ANULADOS']))
+    total_orden = func.coalesce(Ordenes.total, 0)
+    por_orden = [
+        ('general', None),
+        ('metodo_pago', func.coalesce(Ordenes.metodo_pago, '')),
+        ('mesero', Ordenes.mesero_id),
+    ]
+    for dimension, clave in por_orden:
+        columnas = [grupo] if clave is None else [grupo, clave]
+        stmt = (unir(select(*columnas, func.count(Ordenes.id), func.sum(total_orden)).select_from(Ordenes))
+                .where(*criterios).group_by(*columnas))
+        for fila in _con_archivo(session, stmt):
+            agregado = agregados[(fila[0], dimension, '' if clave is None else str(fila[1]))]
+            agregado[0] += fila[-2]
+            agregado[2] += fila[-1]
+
+    por_linea = [('producto', OrdenesProductos.producto_id), ('categoria', Productos.categoria_id)]
+    for dimension, clave in por_linea:
+        stmt = (unir(select(grupo, clave, func.count(func.distinct(OrdenesProductos.orden_id)),
+                            func.sum(OrdenesProductos.cantidad),
+                            func.sum(OrdenesProductos.orden_producto_total)).select_from(Ordenes))
+                .join(OrdenesProductos, OrdenesProductos.orden_id == Ordenes.id)
+                .join(Productos, Productos.id == OrdenesProductos.producto_id)
+                .where(*criterios).group_by(grupo, clave))
+        for valor_grupo, valor, ordenes, cantidad, total in _con_archivo(session, stmt):
+            agregado = agregados[(valor_grupo, dimension, str(valor))]
+            agregado[0] += ordenes
+            agregado[1] += cantidad
+            agregado[2] += total
+    return agregados
+
+def _con_archivo(session, stmt):
+    # Órdenes activas y archivadas no se repiten: los agregados se suman
+    yield from session.execute(stmt)
+    yield from session.execute(_en_archivo(stmt))
+
+
+# Eventos de cambio
+TOPICOS = {'ordenes', 'mesas'}
+
+def emitir(topico, **datos):
+    """Publica un evento de cambio; se llama después del commit."""
+    try:
+        broker.publicar(topico, datos)
+    except Exception as e:
+        # La escritura ya se confirmó: un fallo del broker no debe revertirla
+        current_app.logger.warning('No se pudo publicar el evento %s: %s', topico, e)
+
+
+# Tareas en segundo plano (ver tareas.py)
+#
+# nro_ordenes, las valoraciones y la auditoría se encolan al responder y los
+# hilos de la cola los aplican por lotes: los incrementos de un mismo cliente se
+# suman en uno solo y las inserciones van en un único INSERT por lote. Los
+# manejadores se registran aquí y crear_app los pasa a la cola de cada app.
+MANEJADORES = {}  # tipo de tarea -> fn(lote)
+
+def manejador(tipo):
+    def decorador(fn):
+        MANEJADORES[tipo] = fn
+        return fn
+    return decorador
+
+def encolar(tipo, datos, idempotencia=None):
+    """Encola un efecto secundario de una escritura ya confirmada."""
+    try:
+        cola.encolar(tipo, datos, idempotencia)
+    except Exception as e:
+        # Igual que con los eventos: la escritura principal ya está hecha
+        current_app.logger.warning('No se pudo encolar la tarea %s: %s', tipo, e)
+
+def auditar(accion, entidad, entidad_id=None, **datos):
+    encolar('auditoria', {
+        'fecha': datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+        'accion': accion, 'entidad': entidad, 'entidad_id': entidad_id,
+        'datos': datos or None,
+    })
+
+@manejador('nro_ordenes')
+def _sumar_nro_ordenes(lote):
+    deltas = defaultdict(int)
+    for datos in lote:
+        deltas[datos['cliente_id']] += datos.get('delta', 1)
+    db.session.execute(
+        update(Cliente.__table__)
+        .where(Cliente.__table__.c.id == bindparam('b_id'))
+        .values(nro_ordenes=func.coalesce(Cliente.__table__.c.nro_ordenes, 0) + bindparam('b_delta')),
+        [{'b_id': cliente_id, 'b_delta': delta} for cliente_id, delta in deltas.items()])
+    db.session.commit()
+
+@manejador('valoracion')
+def _insertar_valoraciones(lote):
+    db.session.execute(insert(Valoraciones), lote)
+    db.session.commit()
+
+@manejador('auditoria')
+def _insertar_auditoria(lote):
+    db.session.execute(insert(Auditoria), [{
+        **datos,
+        'fecha': datetime.fromisoformat(datos['fecha']),
+        'datos': json.dumps(datos['datos']) if datos.get('datos') is not None else None,
+    } for datos in lote])
+    db.session.commit()
+
+
+# Campos expuestos por los listados: nombre -> (columna, codificador); ver serializacion.py
+CAMPOS_CATEGORIA = compilar({
+    'id': Categoria.id,
+    'nombre': Categoria.nombre,
+})
+
+CAMPOS_PRODUCTO = compilar({
+    'id': Productos.id,
+    'nombre': Productos.nombre,
+    'precio_venta': Productos.precio_venta,
+    'categoria_id': Productos.categoria_id,
+    'referencia': Productos.referencia,
+    'link_imagen': Productos.link_imagen,
+})
+
+CAMPOS_CLIENTE = compilar({
+    'id': Cliente.id,
+    'nombre': Cliente.nombre,
+    'cedula': Cliente.cedula,
+    'telefono': Cliente.telefono,
+    'nro_ordenes': Cliente.nro_ordenes,
+})
+
+CAMPOS_MESERO = compilar({
+    'id': Mesero.id,
+    'nombre': Mesero.nombre,
+})
+
+CAMPOS_MESA = compilar({
+    'id': Mesas.id,
+    'numero': Mesas.numero,
+    'capacidad': Mesas.capacidad,
+    'estado': Mesas.estado,
+    'version': Mesas.version,
+})
+
+CAMPOS_ORDEN = compilar({
+    'id': Ordenes.id,
+    'cliente_id': Ordenes.cliente_id,
+    'total': Ordenes.total,
+    'mesa': Ordenes.mesa,
+    'estado': Ordenes.estado,
+    'mesero_id': Ordenes.mesero_id,
+    'metodo_pago': Ordenes.metodo_pago,
+    'referencia_pago': Ordenes.referencia_pago,
+    'vuelto': Ordenes.vuelto,
+    'fecha': Ordenes.fecha,
+    'nota': Ordenes.nota,
+    'version': Ordenes.version,
+})
+
+LLAVES_ORDEN = {'id': (Ordenes.id,), 'fecha': (Ordenes.fecha, Ordenes.id)}
+
+CAMPOS_PRODUCTO_EN_ORDEN = compilar({
+    'producto_id': OrdenesProductos.producto_id,
+    'cantidad': OrdenesProductos.cantidad,
+    'producto_precio': OrdenesProductos.producto_precio,
+    'producto_total': OrdenesProductos.orden_producto_total,
+})
+
+CAMPOS_ORDEN_PRODUCTO = compilar({
+    'orden_id': OrdenesProductos.orden_id,
+    'producto_id': OrdenesProductos.producto_id,
+    'orden_producto_total': OrdenesProductos.orden_producto_total,
+})
+
+CAMPOS_SESION = compilar({
+    'id': Sesion.id,
+    'estado': Sesion.estado,
+    'fecha': Sesion.fecha,
+})
+
+CAMPOS_SESION_ORDEN = compilar({
+    'orden_id': SesionOrdenes.orden_id,
+    'sesion_id': SesionOrdenes.sesion_id,
+})
+
+CAMPOS_VALORACION = compilar({
+    'id': Valoraciones.id,
+    'descripcion': Valoraciones.descripcion,
+    'calificacion': Valoraciones.calificacion,
+    'cliente_id': Valoraciones.cliente_id,
+})
+
+
+# Paginación
+# La paginación es opcional: con limit los listados devuelven X-Next-Cursor;
+# sin limit devuelven todo, como siempre, y stream=ndjson lo hace sin cargarlo
+# en memoria.
+MAX_LIMIT = 1000
+STREAM_CHUNK = 1000
+
+class ParametroInvalido(ValueError):
+    pass
+
+def _parse_limit(defecto=None):
+    valor = request.args.get('limit')
+    if valor is None:
+        return defecto
+    try:
+        limit = int(valor)
+    except ValueError:
+        raise ParametroInvalido('limit debe ser un entero')
+    if limit < 1 or limit > MAX_LIMIT:
+        raise ParametroInvalido(f'limit debe estar entre 1 y {MAX_LIMIT}')
+    return limit
+
+def _parse_fields(campos):
+    valor = request.args.get('fields')
+    if not valor:
+        return list(campos)
+    nombres = [n.strip() for n in valor.split(',') if n.strip()]
+    desconocidos = [n for n in nombres if n not in campos]
+    if desconocidos:
+        raise ParametroInvalido(f'Campos desconocidos: {", ".join(desconocidos)}')
+    return nombres
+
+def _encode_cursor(valores):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def _decode_cursor(cursor, columnas):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(valores, list) or len(valores) != len(columnas):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if isinstance(c.type, db.DateTime) else v
+                for c, v in zip(columnas, valores)]
+    except (ValueError, TypeError, binascii.Error):
+        raise ParametroInvalido('Cursor inválido')
+
+def _keyset_filter(columnas, valores, descendente=False):
+    # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+    condiciones = []
+    for i, columna in enumerate(columnas):
+        iguales = [c == v for c, v in zip(columnas[:i], valores[:i])]
+        siguiente = columna < valores[i] if descendente else columna > valores[i]
+        condiciones.append(and_(*iguales, siguiente))
+    return or_(*condiciones)
+
+def _stream_ndjson(stmt, conversiones):
+    """Genera una línea JSON por fila usando un cursor del lado del servidor."""
+    with db.engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=STREAM_CHUNK).execute(stmt)
+        for bloque in resultado.partitions():
+            yield ''.join(serializacion.backend.dumps(d) + '\n'
+                          for d in filas_a_dicts(conversiones, bloque))
+
+def listar(campos, llaves, *criterios, stream=None, modelo=None, archivo=False):
+    """Ejecuta un listado, paginado por keyset si se pide ``limit``, y devuelve la respuesta JSON.
+
+    Solo se seleccionan las columnas pedidas en ``fields`` (sin cargar objetos
+    ORM). ``llaves`` asocia cada valor de ``sort`` con las columnas del keyset
+    (``sort=-fecha`` ordena en forma descendente); si hay más filas, el cursor
+    de la siguiente página va en ``X-Next-Cursor``. Sin ``limit`` se devuelven
+    todas las filas desde ``after``.
+
+    Con ``stream=ndjson`` se transmiten todas las filas desde ``after`` como
+    NDJSON, sin paginar ni cargarlas en memoria. Si se indica ``modelo``,
+    ``expand`` carga sus relaciones (ver ``EXPANSIONES``) con objetos ORM.
+    Con ``archivo`` se suman las filas de las tablas de archivo en el mismo orden
+    (ver ``_pagina``); con ``expand`` las archivadas salen sin los campos expandidos.
+    """
+    stream = stream or request.args.get('stream')
+    if stream not in (None, 'ndjson'):
+        raise ParametroInvalido('stream solo admite ndjson')
+    nombres = _parse_fields(campos)
+    limit = _parse_limit()
+
+    if modelo is not None and request.args.get('expand'):
+        if stream:
+            raise ParametroInvalido('expand no se puede combinar con stream')
+        arbol, opciones = _parse_expand(modelo)
+        stmt, columnas = _consulta_keyset(llaves, [modelo], criterios)
+        archivadas, _, conversiones = _consulta_campos(campos, nombres, llaves, criterios)
+        filas, siguiente = _pagina(stmt.options(*opciones), columnas, limit,
+                                   _en_archivo(archivadas) if archivo else None)
+        seleccion = {n: campos[n] for n in nombres}
+        # Las filas archivadas son columnas sueltas, sin objeto ORM que expandir
+        return _respuesta_pagina([
+            _serializar(f[0], seleccion, arbol) if isinstance(f[0], modelo) else filas_a_dicts(conversiones, [f])[0]
+            for f in filas], siguiente)
+
+    stmt, columnas, conversiones = _consulta_campos(campos, nombres, llaves, criterios)
+    if stream:
+        if archivo:
+            stmt = _unir_archivo(stmt, columnas)
+        return Response(stream_with_context(_stream_ndjson(stmt, conversiones)),
+                        mimetype='application/x-ndjson')
+
+    filas, siguiente = _pagina(stmt, columnas, limit, _en_archivo(stmt) if archivo else None)
+    return _respuesta_pagina(filas_a_dicts(conversiones, filas), siguiente)
+
+def _descendente():
+    return request.args.get('sort', 'id').startswith('-')
+
+def _consulta_keyset(llaves, seleccion, criterios):
+    orden = request.args.get('sort', 'id')
+    descendente = _descendente()
+    orden = orden.removeprefix('-')
+    if orden not in llaves:
+        raise ParametroInvalido(f'sort debe ser uno de: {", ".join(llaves)} (con - para descendente)')
+    columnas = llaves[orden]
+    stmt = select(
+        *seleccion,
+        *[c.label(f'_k{i}') for i, c in enumerate(columnas)]
+    ).where(*criterios).order_by(*(desc(c) if descendente else c for c in columnas))
+    after = request.args.get('after')
+    if after:
+        stmt = stmt.where(_keyset_filter(columnas, _decode_cursor(after, columnas), descendente))
+    return stmt, columnas
+
+def _consulta_campos(campos, nombres, llaves, criterios):
+    """Consulta keyset de las columnas ``nombres`` y sus conversiones para filas_a_dicts."""
+    stmt, columnas = _consulta_keyset(llaves, [campos[n][0].label(n) for n in nombres], criterios)
+    return stmt, columnas, [(n, campos[n][1]) for n in nombres]
+
+def _pagina(stmt, columnas, limit, archivo=None):
+    """Página de ``stmt``; ``archivo`` es la consulta equivalente sobre el archivo, si hace falta.
+
+    Las dos consultas traen ``limit + 1`` filas y se intercalan por las columnas
+    ``_k`` del keyset. La del archivo se omite cuando las filas activas ya llenan
+    la página y son todas posteriores a lo archivado (ver ``_antes_del_archivo``).
+    """
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+        archivo = None if archivo is None else archivo.limit(limit + 1)
+    filas = db.session.execute(stmt).all()
+    if archivo is not None and not _antes_del_archivo(filas, columnas, limit):
+        claves = [f'_k{i}' for i in range(len(columnas))]
+        filas = sorted([*filas, *db.session.execute(archivo).all()],
+                       key=lambda f: tuple(f._mapping[k] for k in claves),
+                       reverse=_descendente())
+        if limit is not None:
+            filas = filas[:limit + 1]
+    return _cortar_pagina(filas, columnas, limit)
+
+def _antes_del_archivo(filas, columnas, limit):
+    # En orden descendente por fecha o id, si la fila limit + 1 ya es posterior a
+    # todo el archivo, ninguna archivada entra en la página ni mueve el cursor
+    if limit is None or len(filas) <= limit or not _descendente():
+        return False
+    limite = limite_archivo()
+    ultima = filas[limit]._mapping['_k0']
+    if columnas[0] is Ordenes.fecha:
+        return ultima > limite.fecha
+    if columnas[0] is Ordenes.id:
+        return ultima > limite.orden_id
+    return False
+
+def _unir_archivo(stmt, columnas):
+    """UNION ALL de ``stmt`` y su versión sobre el archivo, con el orden del keyset."""
+    union = union_all(stmt.order_by(None), _en_archivo(stmt).order_by(None)).subquery()
+    claves = [union.c[f'_k{i}'] for i in range(len(columnas))]
+    return select(union).order_by(*(desc(c) if _descendente() else c for c in claves))
+
+def _cortar_pagina(filas, columnas, limit):
+    """Descarta la fila de más pedida con ``limit + 1`` y arma el cursor siguiente."""
+    siguiente = None
+    if limit is not None and len(filas) > limit:
+        filas = filas[:limit]
+        siguiente = _encode_cursor([filas[-1]._mapping[f'_k{i}'] for i in range(len(columnas))])
+    return filas, siguiente
+
+def _respuesta_pagina(datos, siguiente):
+    respuesta = jsonify(datos)
+    if siguiente:
+        respuesta.headers['X-Next-Cursor'] = siguiente
+    return respuesta, 200
+
+
+# Expansión de relaciones (expand=cliente,mesero,items.producto.categoria)
+# modelo -> {nombre: (relación, campos del destino)}
+configure_mappers()  # crea los backref (Ordenes.items) antes de armar el registro
+EXPANSIONES = {
+    Ordenes: {
+        'cliente': (Ordenes.cliente, CAMPOS_CLIENTE),
+        'mesero': (Ordenes.mesero, CAMPOS_MESERO),
+        'mesa_detalle': (Ordenes.mesa_detalle, CAMPOS_MESA),
+        'items': (Ordenes.items, CAMPOS_PRODUCTO_EN_ORDEN),
+    },
+    OrdenesProductos: {'producto': (OrdenesProductos.producto, CAMPOS_PRODUCTO)},
+    Productos: {'categoria': (Productos.categoria, CAMPOS_CATEGORIA)},
+    SesionOrdenes: {'orden': (SesionOrdenes.orden, CAMPOS_ORDEN)},
+}
+
+def _parse_expand(modelo):
+    """Convierte ``expand`` en un árbol de relaciones y sus opciones selectinload.
+
+    Cada nivel de relación se carga con una sola consulta IN, sin importar
+    cuántas filas devuelva el listado.
+    """
+    arbol, opciones = {}, []
+    for ruta in (r.strip() for r in request.args.get('expand', '').split(',')):
+        if not ruta:
+            continue
+        nodo, actual, carga = arbol, modelo, None
+        for nombre in ruta.split('.'):
+            if nombre not in EXPANSIONES.get(actual, {}):
+                raise ParametroInvalido(f'No se puede expandir {ruta}')
+            relacion = EXPANSIONES[actual][nombre][0]
+            carga = selectinload(relacion) if carga is None else carga.selectinload(relacion)
+            nodo = nodo.setdefault(nombre, {})
+            actual = relacion.property.mapper.class_
+        opciones.append(carga)
+    return arbol, opciones
+
+def _tablas_expand(modelo):
+    """Tablas de los modelos que alcanza ``expand`` desde ``modelo``; las rutas inválidas se ignoran."""
+    tablas = []
+    for ruta in (r.strip() for r in request.args.get('expand', '').split(',')):
+        actual = modelo
+        for nombre in filter(None, ruta.split('.')):
+            if nombre not in EXPANSIONES.get(actual, {}):
+                break
+            actual = EXPANSIONES[actual][nombre][0].property.mapper.class_
+            if actual.__tablename__ not in tablas:
+                tablas.append(actual.__tablename__)
+    return tablas
+
+def _serializar(obj, campos, arbol=None):
+    datos = {}
+    for nombre, (columna, conv) in campos.items():
+        valor = getattr(obj, columna.key)
+        datos[nombre] = conv(valor) if conv and valor is not None else valor
+    for nombre, subarbol in (arbol or {}).items():
+        campos_relacion = EXPANSIONES[type(obj)][nombre][1]
+        valor = getattr(obj, nombre)
+        if isinstance(valor, list):
+            datos[nombre] = [_serializar(v, campos_relacion, subarbol) for v in valor]
+        else:
+            datos[nombre] = None if valor is None else _serializar(valor, campos_relacion, subarbol)
+    return datos
+
+
+# Cargas por lotes (upsert)
+LOTE_CHUNK = 500
+
+def _validar_valor(columna, valor):
+    if valor is None:
+        if not columna.nullable:
+            raise ValueError(f'{columna.name} es requerido')
+        return None
+    try:
+        if isinstance(columna.type, db.Numeric):
+            return Decimal(str(valor))
+        if isinstance(columna.type, db.Integer):
+            if isinstance(valor, bool) or int(valor) != valor:
+                raise ValueError
+            return int(valor)
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError(f'{columna.name} inválido')
+    if isinstance(columna.type, db.String):
+        if not isinstance(valor, str):
+            raise ValueError(f'{columna.name} debe ser texto')
+        if columna.type.length and len(valor) > columna.type.length:
+            raise ValueError(f'{columna.name} excede {columna.type.length} caracteres')
+    return valor
+
+def _validar_fila(tabla, item, requeridos, opcionales):
+    if not isinstance(item, dict):
+        raise ValueError('Cada elemento debe ser un objeto')
+    faltantes = [c for c in requeridos if c not in item]
+    if faltantes:
+        raise ValueError(f'Faltan datos requeridos: {", ".join(faltantes)}')
+    return {nombre: _validar_valor(tabla.c[nombre], item[nombre])
+            for nombre in ('id', *requeridos, *opcionales) if nombre in item}
+
+def _sentencia_upsert(session, modelo, filas, llaves, actualizar):
+    """INSERT multi-fila que, si la clave ``llaves`` ya existe, aplica ``actualizar(nuevos)``.
+
+    ``nuevos`` representa la fila propuesta (``VALUES()`` en MySQL, ``excluded``
+    en SQLite). MySQL aplica las asignaciones en el orden del dict y las
+    siguientes ven los valores ya asignados; SQLite ve siempre los anteriores.
+    """
+    tabla = modelo.__table__
+    dialecto = session.get_bind(mapper=modelo.__mapper__).dialect.name
+    if dialecto == 'mysql':
+        stmt = mysql_insert(tabla).values(filas)
+        return stmt.on_duplicate_key_update(list(actualizar(stmt.inserted).items()))
+    if dialecto == 'sqlite':
+        stmt = sqlite_insert(tabla).values(filas)
+        return stmt.on_conflict_do_update(index_elements=[tabla.c[c] for c in llaves],
+                                          set_=actualizar(stmt.excluded))
+    raise NotImplementedError(f'Upsert no soportado para {dialecto}')
+
+def _upsert(modelo, filas):
+    """Un solo INSERT multi-fila que actualiza las filas cuyo id ya existe."""
+    columnas = [c for c in filas[0] if c != 'id']
+    db.session.execute(_sentencia_upsert(
+        db.session, modelo, filas, ('id',), lambda nuevos: {c: nuevos[c] for c in columnas}))
+
+def _insertar(modelo, filas):
+    """INSERT executemany de filas nuevas; devuelve sus ids si el motor lo permite."""
+    tabla = modelo.__table__
+    dialecto = db.session.get_bind(mapper=modelo.__mapper__).dialect
+    if dialecto.insert_executemany_returning_sort_by_parameter_order:
+        stmt = insert(tabla).returning(tabla.c.id, sort_by_parameter_order=True)
+        return db.session.execute(stmt, filas).scalars().all()
+    db.session.execute(insert(tabla), filas)
+    return [None] * len(filas)
+
+def _aplicar_lote(modelo, indices, filas, resultados):
+    # Cada chunk va en un SAVEPOINT; si falla se reintenta fila por fila
+    # para que una fila inválida no descarte a las demás.
+    try:
+        with db.session.begin_nested():
+            if 'id' in filas[0]:
+                ids = [f['id'] for f in filas]
+                existentes = set(db.session.execute(
+                    select(modelo.id).where(modelo.id.in_(ids))).scalars())
+                _upsert(modelo, filas)
+                for i, id_ in zip(indices, ids):
+                    resultados[i] = {'indice': i, 'id': id_,
+                                     'estado': 'actualizado' if id_ in existentes else 'creado'}
+            else:
+                for i, id_ in zip(indices, _insertar(modelo, filas)):
+                    resultados[i] = {'indice': i, 'id': id_, 'estado': 'creado'}
+    except SQLAlchemyError as e:
+        if len(filas) == 1:
+            resultados[indices[0]] = {'indice': indices[0], 'estado': 'error',
+                                      'error': str(getattr(e, 'orig', None) or e)}
+            return
+        for i, fila in zip(indices, filas):
+            _aplicar_lote(modelo, [i], [fila], resultados)
+
+def upsert_lote(modelo, requeridos, opcionales=()):
+    """Crea o actualiza (por ``id``) un arreglo de filas y reporta el resultado de cada una.
+
+    Las filas se agrupan por el conjunto de campos enviados y se escriben con un
+    upsert por chunk de ``LOTE_CHUNK``; todo se confirma en una sola transacción.
+    Los campos opcionales ausentes no se modifican en las filas existentes.
+    """
+    data = request.get_json()
+    if not isinstance(data, list):
+        raise ParametroInvalido('Se esperaba un arreglo de elementos')
+
+    resultados = [None] * len(data)
+    grupos = {}
+    for i, item in enumerate(data):
+        try:
+            fila = _validar_fila(modelo.__table__, item, requeridos, opcionales)
+        except ValueError as e:
+            resultados[i] = {'indice': i, 'estado': 'error', 'error': str(e)}
+            continue
+        indices, filas = grupos.setdefault(tuple(fila), ([], []))
+        indices.append(i)
+        filas.append(fila)
+
+    for indices, filas in grupos.values():
+        for inicio in range(0, len(filas), LOTE_CHUNK):
+            _aplicar_lote(modelo, indices[inicio:inicio + LOTE_CHUNK],
+                          filas[inicio:inicio + LOTE_CHUNK], resultados)
+    db.session.commit()
+
+    conteo = {'creado': 0, 'actualizado': 0, 'error': 0}
+    for r in resultados:
+        conteo[r['estado']] += 1
+    return jsonify({
+        'creados': conteo['creado'],
+        'actualizados': conteo['actualizado'],
+        'errores': conteo['error'],
+        'resultados': resultados
+    }), 200
+
+
+# Concurrencia optimista
+#
+# Mesas y Ordenes llevan una columna version (version_id_col del mapper): cada
+# UPDATE o DELETE del ORM incluye "AND version = <leída>" y la incrementa, así
+# dos escrituras que partieron de la misma lectura no se pisan y la segunda
+# recibe 409. El cliente puede además exigir la versión que leyó con
+# If-Match: "r:3" (el ETag del GET de la fila; se acepta también "3") o con
+# "version" en el cuerpo.
+def etag_fila(obj):
+    return {'ETag': f'"r:{obj.version}"'}
+
+def _version_vigente(obj, data=None):
+    if (request.if_match and not request.if_match.contains(f'r:{obj.version}')
+            and not request.if_match.contains(str(obj.version))):
+        return False
+    if data and data.get('version') is not None and data['version'] != obj.version:
+        return False
+    return True
+
+def _conflicto(modelo, id, mensaje):
+    actual = db.session.get(modelo, id, populate_existing=True)
+    if actual is None:
+        return jsonify({'error': 'Registro no encontrado'}), 404
+    return jsonify({'error': mensaje, 'version': actual.version}), 409
+
+
+def _select_campos(campos):
+    return select(*[columna.label(n) for n, (columna, _) in campos.items()])
+
+
+def _parse_entero(nombre):
+    valor = request.args.get(nombre)
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ParametroInvalido(f'{nombre} debe ser un entero')
+
+def _parse_decimal(nombre):
+    valor = request.args.get(nombre)
+    if valor is None:
+        return None
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ParametroInvalido(f'{nombre} debe ser un número')
+
+def _parse_estados():
+    return [e.strip() for e in request.args.get('estado', '').split(',') if e.strip()]
+
+def _rango_ordenes():
+    """Criterios desde/hasta sobre la fecha de la orden."""
+    desde, hasta = _parse_fecha('desde'), _parse_fecha('hasta', fin=True)
+    criterios = []
+    if desde is not None:
+        criterios.append(Ordenes.fecha >= desde)
+    if hasta is not None:
+        criterios.append(Ordenes.fecha < hasta)
+    return criterios
+
+
+def _parse_fecha(nombre, fin=False):
+    valor = request.args.get(nombre)
+    if not valor:
+        return None
+    try:
+        fecha = datetime.fromisoformat(valor)
+    except ValueError:
+        raise ParametroInvalido(f'{nombre} debe tener formato AAAA-MM-DD o AAAA-MM-DDTHH:MM')
+    if fin and len(valor) == 10:
+        # Una fecha sin hora como límite superior incluye el día completo
+        fecha += timedelta(days=1)
+    return fecha
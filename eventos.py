@@ -0,0 +1,199 @@
+"""Difusión de eventos de cambio (órdenes, mesas) hacia los clientes SSE.
+
+``BrokerMemoria`` reparte los eventos entre los suscriptores del mismo proceso.
+``BrokerSocketLocal`` además los reenvía a los demás workers de la máquina por
+sockets Unix de datagramas, uno por proceso, dentro de un directorio común.
+``suscribir(..., asincrona=True)`` devuelve una suscripción que se espera desde
+un event loop (asgi.py).
+"""
+import asyncio
+import glob
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente, limitada: si se llena se descarta el más viejo."""
+
+    def __init__(self, broker, topicos, max_eventos=256):
+        self.broker = broker
+        self.topicos = frozenset(topicos)
+        self._cola = queue.Queue(max_eventos)
+
+    def entregar(self, evento):
+        while True:
+            try:
+                self._cola.put_nowait(evento)
+                return
+            except queue.Full:
+                try:
+                    self._cola.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Devuelve el siguiente evento o ``None`` si pasa ``timeout`` sin eventos."""
+        try:
+            return self._cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def cerrar(self):
+        self.broker.desuscribir(self)
+
+
+class SuscripcionAsync(Suscripcion):
+    """Suscripción atada a un event loop; el broker entrega desde cualquier hilo."""
+
+    def __init__(self, broker, topicos, max_eventos=256):
+        self.broker = broker
+        self.topicos = frozenset(topicos)
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue(max_eventos)
+
+    def entregar(self, evento):
+        try:
+            self._loop.call_soon_threadsafe(self._poner, evento)
+        except RuntimeError:
+            pass  # el loop ya terminó
+
+    def _poner(self, evento):
+        if self._cola.full():
+            self._cola.get_nowait()
+        self._cola.put_nowait(evento)
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self._cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """Interfaz de un broker de eventos."""
+
+    def publicar(self, topico, datos):
+        raise NotImplementedError
+
+    def suscribir(self, topicos, asincrona=False):
+        """Devuelve una ``Suscripcion`` (o ``SuscripcionAsync``) a los ``topicos`` indicados."""
+        raise NotImplementedError
+
+    def desuscribir(self, suscripcion):
+        raise NotImplementedError
+
+    def cerrar(self):
+        """Libera los recursos del broker en este proceso."""
+
+
+class BrokerMemoria(Broker):
+    """Fan-out en proceso: cada evento se copia a la cola de cada suscriptor."""
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._secuencia = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publicar(self, topico, datos):
+        self._repartir({'id': next(self._secuencia), 'topico': topico, 'datos': datos})
+
+    def suscribir(self, topicos, asincrona=False):
+        suscripcion = (SuscripcionAsync if asincrona else Suscripcion)(self, topicos)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    @property
+    def suscriptores(self):
+        return len(self._suscripciones)
+
+    def _repartir(self, evento):
+        with self._lock:
+            destinos = [s for s in self._suscripciones if evento['topico'] in s.topicos]
+        for suscripcion in destinos:
+            suscripcion.entregar(evento)
+
+
+class BrokerSocketLocal(BrokerMemoria):
+    """Broker entre workers de una misma máquina usando sockets Unix de datagramas.
+
+    Cada proceso abre (al primer uso, para sobrevivir al fork de gunicorn) un
+    socket en ``directorio``; publicar envía el evento a todos los sockets del
+    directorio, incluido el propio, y un hilo lector lo reparte localmente.
+    """
+
+    def __init__(self, directorio):
+        super().__init__()
+        self.directorio = directorio
+        self._pid = None
+        self._sock = None
+        self._lector = None
+        self._ruta = None
+        self._abrir_lock = threading.Lock()
+
+    def publicar(self, topico, datos):
+        self._asegurar_socket()
+        mensaje = json.dumps({'topico': topico, 'datos': datos}, default=str).encode()
+        for ruta in glob.glob(os.path.join(self.directorio, '*.sock')):
+            try:
+                self._sock.sendto(mensaje, ruta)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Socket de un worker que ya terminó
+                try:
+                    os.unlink(ruta)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                pass
+
+    def suscribir(self, topicos, asincrona=False):
+        self._asegurar_socket()
+        return super().suscribir(topicos, asincrona)
+
+    def cerrar(self):
+        if self._sock is not None and self._pid == os.getpid():
+            self._sock.close()
+            self._lector.close()
+            try:
+                os.unlink(self._ruta)
+            except OSError:
+                pass
+        self._sock = None
+        self._pid = None
+
+    def _asegurar_socket(self):
+        if self._pid == os.getpid():
+            return
+        with self._abrir_lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directorio, exist_ok=True)
+            self._ruta = os.path.join(self.directorio, f'{os.getpid()}.sock')
+            if os.path.exists(self._ruta):
+                os.unlink(self._ruta)
+            self._lector = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._lector.bind(self._ruta)
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+            self._pid = os.getpid()
+            threading.Thread(target=self._leer, args=(self._lector,), daemon=True).start()
+
+    def _leer(self, sock):
+        while True:
+            try:
+                mensaje = sock.recv(65536)
+            except OSError:
+                return
+            try:
+                evento = json.loads(mensaje)
+            except ValueError:
+                continue
+            BrokerMemoria.publicar(self, evento['topico'], evento['datos'])
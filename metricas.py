@@ -0,0 +1,254 @@
+"""Métricas en memoria con salida en el formato de texto de Prometheus.
+
+Cada proceso lleva sus propias métricas. Con ``Registro.directorio`` cada uno
+vuelca además su estado en un archivo de ese directorio (un hilo por proceso,
+cada ``intervalo`` segundos; ver ``iniciar``) y ``exportar`` suma los de todos
+los procesos: cualquier
+worker de gunicorn responde /metrics con el total del servidor. Contadores e
+histogramas de workers que ya terminaron se siguen sumando (no retroceden); los
+gauges solo cuentan los procesos vivos. El directorio conviene vaciarlo al
+reiniciar el servidor.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BUCKETS_CONTEO = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = list(zip(nombres, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    texto = ','.join(
+        '{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for n, v in pares)
+    return '{' + texto + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrica:
+    tipo = 'untyped'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas):
+        return tuple(etiquetas[n] for n in self.etiquetas)
+
+    def estado(self):
+        """Valores de este proceso: {tupla de etiquetas: valor}."""
+        raise NotImplementedError
+
+    def sumar(self, total, valor):
+        return total + valor
+
+    def lineas(self, valores=None):
+        raise NotImplementedError
+
+
+class Contador(Metrica):
+    tipo = 'counter'
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores = {}
+
+    def inc(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def estado(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def lineas(self, valores=None):
+        valores = self.estado() if valores is None else valores
+        for clave, valor in valores.items():
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+
+
+class Histograma(Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}  # clave -> [conteos por bucket..., suma, total]
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [0] * (len(self.buckets) + 2)
+            if indice < len(self.buckets):
+                serie[indice] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def estado(self):
+        with self._lock:
+            return {clave: list(serie) for clave, serie in self._series.items()}
+
+    def sumar(self, total, serie):
+        return [a + b for a, b in zip(total, serie)]
+
+    def lineas(self, valores=None):
+        series = self.estado() if valores is None else valores
+        for clave, serie in series.items():
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, serie):
+                acumulado += conteo
+                yield (f'{self.nombre}_bucket'
+                       f'{_etiquetas(self.etiquetas, clave, ("le", _numero(limite)))} {acumulado}')
+            yield f'{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, ("le", "+Inf"))} {serie[-1]}'
+            yield f'{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(serie[-2])}'
+            yield f'{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie[-1]}'
+
+
+class Gauge(Metrica):
+    """Valor leído al exportar: ``funcion`` devuelve {tupla de etiquetas: valor}."""
+    tipo = 'gauge'
+
+    def __init__(self, nombre, ayuda, funcion, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def estado(self):
+        return dict(self.funcion())
+
+    def lineas(self, valores=None):
+        valores = self.estado() if valores is None else valores
+        for clave, valor in valores.items():
+            yield f'{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}'
+
+
+class Registro:
+    def __init__(self, directorio=None, intervalo=1.0):
+        self._metricas = []
+        self.directorio = directorio
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pid = None
+        self._archivo = None
+        self._hilo_pid = None
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def gauge(self, nombre, ayuda, funcion, etiquetas=()):
+        return self._agregar(Gauge(nombre, ayuda, funcion, etiquetas))
+
+    def iniciar(self, directorio=None):
+        """Arranca el hilo que vuelca este proceso cada ``intervalo`` segundos.
+
+        Se puede llamar en cada petición: arranca uno por proceso (también en los
+        workers forkeados, que no heredan el hilo) y sin ``directorio`` no hace nada.
+        ``directorio``, si se indica, reemplaza al del constructor.
+        """
+        if directorio is not None:
+            self.directorio = directorio
+        if self.directorio is None or self._hilo_pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo_pid == os.getpid():
+                return
+            self._hilo_pid = os.getpid()
+        threading.Thread(target=self._volcar_periodicamente, daemon=True).start()
+
+    def volcar(self):
+        """Escribe el estado de este proceso en ``directorio``."""
+        if self.directorio is None:
+            return
+        with self._lock:
+            if self._pid != os.getpid() or os.path.dirname(self._archivo) != self.directorio:
+                # Primer volcado del proceso (o de un worker recién forkeado)
+                self._pid = os.getpid()
+                self._archivo = os.path.join(self.directorio, f'{self._pid}-{uuid.uuid4().hex[:8]}.json')
+            self._escribir()
+
+    def _volcar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self.volcar()
+            except OSError:
+                pass  # directorio borrado o lleno: se reintenta en el próximo intervalo
+
+    def exportar(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus (0.0.4)."""
+        if self.directorio is None:
+            valores = {m.nombre: None for m in self._metricas}
+        else:
+            self.volcar()
+            valores = self._sumar_procesos()
+        salida = []
+        for metrica in self._metricas:
+            salida.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            salida.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            salida.extend(metrica.lineas(valores[metrica.nombre]))
+        return '\n'.join(salida) + '\n'
+
+    def _escribir(self):
+        estado = {m.nombre: [[list(clave), valor] for clave, valor in m.estado().items()]
+                  for m in self._metricas}
+        os.makedirs(self.directorio, exist_ok=True)
+        temporal = f'{self._archivo}.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump(estado, archivo)
+        os.replace(temporal, self._archivo)  # los lectores ven el archivo viejo o el nuevo, nunca a medias
+
+    def _sumar_procesos(self):
+        valores = {m.nombre: {} for m in self._metricas}
+        for ruta in glob.glob(os.path.join(self.directorio, '*.json')):
+            try:
+                with open(ruta) as archivo:
+                    estado = json.load(archivo)
+            except (OSError, ValueError):
+                continue  # borrado entre el glob y el open
+            vivo = None
+            for metrica in self._metricas:
+                if metrica.tipo == 'gauge':
+                    if vivo is None:
+                        vivo = _vivo(int(os.path.basename(ruta).split('-')[0]))
+                    if not vivo:
+                        continue
+                total = valores[metrica.nombre]
+                for clave, valor in estado.get(metrica.nombre, ()):
+                    clave = tuple(clave)
+                    total[clave] = metrica.sumar(total[clave], valor) if clave in total else valor
+        return valores
+
+    def _agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
@@ -0,0 +1,116 @@
+"""Migraciones versionadas del esquema.
+
+Cada migración es una función ``(conexion, metadata)`` registrada con
+``@migracion(version, descripcion)``. Las aplicadas se guardan en la tabla
+``schema_migraciones``; ``aplicar`` ejecuta en orden las pendientes, cada una
+en su propia transacción, así una falla deja registradas las anteriores.
+
+Las migraciones deben poder repetirse sin error sobre una base que ya tenga el
+cambio (por ejemplo, creada con ``create_all``), por eso usan ``checkfirst``.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, insert, select, text
+
+_metadata = MetaData()
+schema_migraciones = Table(
+    'schema_migraciones', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('descripcion', String(200), nullable=False),
+    Column('aplicada', DateTime, nullable=False),  # UTC
+)
+
+MIGRACIONES = []
+
+
+def migracion(version, descripcion):
+    def decorador(fn):
+        if any(v == version for v, _, _ in MIGRACIONES):
+            raise ValueError(f'Migración {version} duplicada')
+        MIGRACIONES.append((version, descripcion, fn))
+        MIGRACIONES.sort(key=lambda m: m[0])
+        return fn
+    return decorador
+
+
+def aplicadas(engine):
+    """Devuelve {version: fecha de aplicación} de las migraciones ya aplicadas."""
+    with engine.begin() as conexion:
+        schema_migraciones.create(conexion, checkfirst=True)
+        return dict(conexion.execute(
+            select(schema_migraciones.c.version, schema_migraciones.c.aplicada)).all())
+
+
+def pendientes(engine):
+    hechas = aplicadas(engine)
+    return [(v, d) for v, d, _ in MIGRACIONES if v not in hechas]
+
+
+def aplicar(engine, metadata, hasta=None):
+    """Aplica las migraciones pendientes hasta ``hasta`` (incluida) y devuelve sus versiones."""
+    hechas = aplicadas(engine)
+    nuevas = []
+    for version, descripcion, fn in MIGRACIONES:
+        if version in hechas or (hasta is not None and version > hasta):
+            continue
+        with engine.begin() as conexion:
+            fn(conexion, metadata)
+            conexion.execute(insert(schema_migraciones).values(
+                version=version, descripcion=descripcion,
+                aplicada=datetime.now(timezone.utc).replace(tzinfo=None)))
+        nuevas.append(version)
+    return nuevas
+
+
+def _crear_indices(conexion, metadata, *nombres):
+    indices = {i.name: i for t in metadata.tables.values() for i in t.indexes}
+    for nombre in nombres:
+        indices[nombre].create(conexion, checkfirst=True)
+
+
+def _agregar_columna(conexion, tabla, nombre, definicion):
+    if nombre not in {c['name'] for c in inspect(conexion).get_columns(tabla)}:
+        conexion.execute(text(f'ALTER TABLE {tabla} ADD COLUMN {nombre} {definicion}'))
+
+
+@migracion(1, 'Tablas auxiliares: version_tabla, resumen_sesion, venta_hora')
+def _tablas_auxiliares(conexion, metadata):
+    metadata.create_all(conexion, checkfirst=True, tables=[
+        metadata.tables['version_tabla'],
+        metadata.tables['resumen_sesion'],
+        metadata.tables['venta_hora'],
+    ])
+
+
+@migracion(2, 'Índices secundarios de órdenes, productos de orden y clientes')
+def _indices_consultas(conexion, metadata):
+    _crear_indices(
+        conexion, metadata,
+        'ix_ordenes_cliente_fecha',
+        'ix_ordenes_mesa_estado',
+        'ix_ordenes_estado_fecha',
+        'ix_ordenes_fecha',
+        'ix_ordenes_productos_producto',
+        'ix_sesion_ordenes_orden',
+        'ix_cliente_cedula',
+    )
+
+
+@migracion(3, 'Tabla de auditoría')
+def _tabla_auditoria(conexion, metadata):
+    metadata.create_all(conexion, checkfirst=True, tables=[metadata.tables['auditoria']])
+
+
+@migracion(4, 'Columna version de mesas y ordenes (concurrencia optimista)')
+def _columnas_version(conexion, metadata):
+    _agregar_columna(conexion, 'mesas', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    _agregar_columna(conexion, 'ordenes', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+@migracion(5, 'Tablas de archivo de órdenes, productos de orden y sesiones')
+def _tablas_archivo(conexion, metadata):
+    metadata.create_all(conexion, checkfirst=True, tables=[
+        metadata.tables['ordenes_archivo'],
+        metadata.tables['ordenes_productos_archivo'],
+        metadata.tables['sesion_ordenes_archivo'],
+    ])
@@ -0,0 +1,188 @@
+"""Modelos de la API, tablas del archivo de órdenes y la sesión que rutea lecturas a la réplica."""
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as SesionFlask
+from sqlalchemy import cast
+from sqlalchemy.orm import foreign
+from sqlalchemy.sql.dml import UpdateBase
+
+
+class SesionRuteada(SesionFlask):
+    """Sesión que envía las lecturas a la réplica si ``info['replica']`` está activo.
+
+    Los flush y las sentencias INSERT/UPDATE/DELETE siempre van a la primaria.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('replica') and not self._flushing
+                and not isinstance(clause, UpdateBase)):
+            return db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={'class_': SesionRuteada})
+
+
+# Models
+class Categoria(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)
+
+class Productos(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)
+    precio_venta = db.Column(db.Numeric(10, 2), nullable=False)
+    impuesto_venta = db.Column(db.Numeric(10, 2))
+    impuesto_compra = db.Column(db.Numeric(10, 2))
+    categoria_id = db.Column(db.Integer, db.ForeignKey('categoria.id'), nullable=False)
+    referencia = db.Column(db.String(100))
+    link_imagen = db.Column(db.String(255))
+    categoria = db.relationship('Categoria', backref=db.backref('productos', lazy=True))
+
+class Cliente(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)
+    cedula = db.Column(db.String(20), nullable=False)
+    telefono = db.Column(db.String(20))
+    nro_ordenes = db.Column(db.Integer, default=0)
+    __table_args__ = (db.Index('ix_cliente_cedula', 'cedula'),)
+
+class Mesero(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(100), nullable=False)
+
+class Mesas(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    estado = db.Column(db.String(20), nullable=False)
+    numero = db.Column(db.Integer, nullable=False)
+    capacidad = db.Column(db.Integer, nullable=False)
+    # Control de concurrencia optimista: cada UPDATE del ORM exige la versión leída
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {'version_id_col': version}
+
+class Ordenes(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
+    total = db.Column(db.Numeric(10, 2), default=0)  # lo mantiene el servidor, ver actualizar_totales
+    mesa = db.Column(db.String(20))
+    estado = db.Column(db.String(20), nullable=False)
+    mesero_id = db.Column(db.Integer, db.ForeignKey('mesero.id'), nullable=False)
+    metodo_pago = db.Column(db.String(20))
+    referencia_pago = db.Column(db.String(100))
+    vuelto = db.Column(db.Numeric(10, 2))
+    fecha = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+    nota = db.Column(db.Text)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    cliente = db.relationship('Cliente')
+    mesero = db.relationship('Mesero')
+    # mesa guarda el id de la mesa como texto
+    mesa_detalle = db.relationship(
+        'Mesas', primaryjoin=lambda: foreign(Ordenes.mesa) == cast(Mesas.id, db.String), viewonly=True)
+    # Índices de los listados por cliente, mesa y estado (ver migraciones.py)
+    __table_args__ = (
+        db.Index('ix_ordenes_cliente_fecha', 'cliente_id', 'fecha'),
+        db.Index('ix_ordenes_mesa_estado', 'mesa', 'estado'),
+        db.Index('ix_ordenes_estado_fecha', 'estado', 'fecha'),
+        db.Index('ix_ordenes_fecha', 'fecha'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+class OrdenesProductos(db.Model):
+    orden_id = db.Column(db.Integer, db.ForeignKey('ordenes.id'), primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), primary_key=True)
+    producto_precio = db.Column(db.Numeric(10, 2), nullable=False)
+    cantidad = db.Column(db.Numeric(10, 2), nullable=False)
+    orden_producto_total = db.Column(db.Numeric(10, 2), nullable=False)
+    orden = db.relationship('Ordenes', backref=db.backref('items', cascade="all, delete-orphan"))
+    producto = db.relationship('Productos')
+    __table_args__ = (db.Index('ix_ordenes_productos_producto', 'producto_id'),)
+
+
+class Sesion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    estado = db.Column(db.String(20), nullable=False)
+    fecha = db.Column(db.DateTime, nullable=False, default=db.func.current_timestamp())
+
+class SesionOrdenes(db.Model):
+    sesion_id = db.Column(db.Integer, db.ForeignKey('sesion.id'), primary_key=True)
+    orden_id = db.Column(db.Integer, db.ForeignKey('ordenes.id'), primary_key=True)
+    sesion = db.relationship('Sesion', backref=db.backref('sesion_ordenes', cascade="all, delete-orphan"))
+    orden = db.relationship('Ordenes', backref=db.backref('sesion_ordenes', cascade="all, delete-orphan"))
+    __table_args__ = (db.Index('ix_sesion_ordenes_orden', 'orden_id'),)
+
+class Valoraciones(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    descripcion = db.Column(db.Text)
+    calificacion = db.Column(db.Integer, nullable=False)  # Escala de 1 a 5, por ejemplo
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
+    cliente = db.relationship('Cliente', backref=db.backref('valoraciones', lazy=True))
+
+class VersionTabla(db.Model):
+    __tablename__ = 'version_tabla'
+    tabla = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    modificado = db.Column(db.DateTime, nullable=False)  # UTC
+
+class ResumenSesion(db.Model):
+    # Agregados de ventas por sesión; dimension: general, metodo_pago, mesero, producto o categoria
+    __tablename__ = 'resumen_sesion'
+    sesion_id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)
+    clave = db.Column(db.String(100), primary_key=True)
+    ordenes = db.Column(db.Integer, nullable=False, default=0)
+    cantidad = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class VentaHora(db.Model):
+    # Mismas dimensiones que ResumenSesion, agrupadas por la hora de Ordenes.fecha
+    __tablename__ = 'venta_hora'
+    hora = db.Column(db.DateTime, primary_key=True)
+    dimension = db.Column(db.String(20), primary_key=True)
+    clave = db.Column(db.String(100), primary_key=True)
+    ordenes = db.Column(db.Integer, nullable=False, default=0)
+    cantidad = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class Auditoria(db.Model):
+    # La escribe la cola de tareas, fuera de la petición
+    __tablename__ = 'auditoria'
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.DateTime, nullable=False)  # UTC
+    accion = db.Column(db.String(30), nullable=False)
+    entidad = db.Column(db.String(30), nullable=False)
+    entidad_id = db.Column(db.Integer)
+    datos = db.Column(db.Text)
+
+
+# Archivo: las órdenes cerradas y antiguas pasan a copias de ordenes,
+# ordenes_productos y sesion_ordenes (ver archivar_lote) y las tablas activas
+# quedan chicas. Las copias no tienen claves foráneas ni autoincremento: los
+# ids son los de origen.
+def _tabla_archivo(modelo, *indices):
+    tabla = modelo.__table__
+    return db.Table(
+        f'{tabla.name}_archivo', db.metadata,
+        *[db.Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable, autoincrement=False)
+          for c in tabla.columns],
+        *indices)
+
+ORDENES_ARCHIVO = _tabla_archivo(
+    Ordenes,
+    db.Index('ix_ordenes_archivo_cliente_fecha', 'cliente_id', 'fecha'),
+    db.Index('ix_ordenes_archivo_mesa_estado', 'mesa', 'estado'),
+    db.Index('ix_ordenes_archivo_estado_fecha', 'estado', 'fecha'),
+    db.Index('ix_ordenes_archivo_fecha', 'fecha'))
+ORDENES_PRODUCTOS_ARCHIVO = _tabla_archivo(
+    OrdenesProductos, db.Index('ix_ordenes_productos_archivo_producto', 'producto_id'))
+SESION_ORDENES_ARCHIVO = _tabla_archivo(
+    SesionOrdenes, db.Index('ix_sesion_ordenes_archivo_orden', 'orden_id'))
+
+# tabla activa -> (tabla de archivo, columna con el id de la orden), padres primero
+ARCHIVO = {
+    Ordenes.__table__: (ORDENES_ARCHIVO, 'id'),
+    OrdenesProductos.__table__: (ORDENES_PRODUCTOS_ARCHIVO, 'orden_id'),
+    SesionOrdenes.__table__: (SESION_ORDENES_ARCHIVO, 'orden_id'),
+}
+
+
+# Tablas de soporte que la API crea por sí misma si no existen
+TABLAS_AUXILIARES = [VersionTabla.__table__, ResumenSesion.__table__, VentaHora.__table__,
+                     Auditoria.__table__, ORDENES_ARCHIVO, ORDENES_PRODUCTOS_ARCHIVO, SESION_ORDENES_ARCHIVO]
@@ -0,0 +1,22 @@
+"""Blueprints de la API, uno por recurso; crear_app (api.py) los registra en este orden.
+
+Lo que comparten (modelos, listados, caché, versiones, agregados...) está en
+modelos.py y comun.py. sistema va primero: sus hooks de antes de cada petición
+(métricas, réplica, idempotencia) corren antes que los de los demás.
+"""
+from rutas.categorias import bp_categorias
+from rutas.clientes import bp_clientes
+from rutas.eventos import bp_eventos
+from rutas.exportacion import bp_exportacion
+from rutas.mesas import bp_mesas
+from rutas.meseros import bp_meseros
+from rutas.ordenes import bp_ordenes
+from rutas.ordenes_productos import bp_ordenes_productos
+from rutas.productos import bp_productos
+from rutas.reportes import bp_reportes
+from rutas.sesiones import bp_sesiones
+from rutas.sistema import bp_sistema
+from rutas.valoraciones import bp_valoraciones
+
+BLUEPRINTS = [bp_sistema, bp_categorias, bp_productos, bp_clientes, bp_meseros, bp_mesas, bp_ordenes,
+              bp_ordenes_productos, bp_sesiones, bp_valoraciones, bp_exportacion, bp_eventos, bp_reportes]
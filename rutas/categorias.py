@@ -0,0 +1,58 @@
+from flask import Blueprint, jsonify, request
+
+from comun import CAMPOS_CATEGORIA, ParametroInvalido, cacheado, condicional, listar, upsert_lote
+from modelos import Categoria, db
+
+
+bp_categorias = Blueprint('categorias', __name__)
+
+
+#Categorias
+@bp_categorias.route('/categorias', methods=['GET', 'POST'])
+@condicional(Categoria)
+@cacheado(Categoria)
+def manage_categorias():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_CATEGORIA, {'id': (Categoria.id,)})
+
+        if request.method == 'POST':
+            data = request.get_json()
+            nueva_categoria = Categoria(nombre=data['nombre'])
+            db.session.add(nueva_categoria)
+            db.session.commit()
+            return jsonify({'message': 'Categoría creada', 'id': nueva_categoria.id}), 201
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_categorias.route('/categorias/<int:id>', methods=['PUT', 'DELETE'])
+def manage_categoria(id):
+    try:
+        categoria = Categoria.query.get_or_404(id)
+
+        if request.method == 'PUT':
+            data = request.get_json()
+            categoria.nombre = data['nombre']
+            db.session.commit()
+            return jsonify({'message': 'Categoría actualizada'}), 200
+
+        if request.method == 'DELETE':
+            db.session.delete(categoria)
+            db.session.commit()
+            return jsonify({'message': 'Categoría eliminada'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp_categorias.route('/categorias/batch', methods=['POST'])
+def batch_categorias():
+    try:
+        return upsert_lote(Categoria, ('nombre',))
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,76 @@
+from flask import Blueprint, jsonify, request
+
+from comun import CAMPOS_CLIENTE, ParametroInvalido, condicional, listar, upsert_lote
+from modelos import Cliente, db
+
+
+bp_clientes = Blueprint('clientes', __name__)
+
+
+#Clientes
+@bp_clientes.route('/clientes', methods=['GET', 'POST'])
+@condicional(Cliente)
+def manage_clientes():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_CLIENTE, {'id': (Cliente.id,)})
+
+        if request.method == 'POST':
+            data = request.get_json()
+            nuevo_cliente = Cliente(
+                nombre=data['nombre'],
+                cedula=data['cedula'],
+                telefono=data['telefono'],
+                nro_ordenes=data.get('nro_ordenes', 0)
+            )
+            db.session.add(nuevo_cliente)
+            db.session.commit()
+            return jsonify({'message': 'Cliente creado', 'id': nuevo_cliente.id}), 201
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_clientes.route('/clientes/<int:id>', methods=['PUT', 'DELETE'])
+def manage_cliente(id):
+    try:
+        cliente = Cliente.query.get_or_404(id)
+
+        if request.method == 'PUT':
+            data = request.get_json()
+            cliente.nombre = data['nombre']
+            cliente.cedula = data['cedula']
+            cliente.telefono = data['telefono']
+            # nro_ordenes lo lleva la cola (_sumar_nro_ordenes): el valor del cliente se ignora
+            db.session.commit()
+            return jsonify({'message': 'Cliente actualizado'}), 200
+
+        if request.method == 'DELETE':
+            db.session.delete(cliente)
+            db.session.commit()
+            return jsonify({'message': 'Cliente eliminado'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+@bp_clientes.route('/clientes/batch', methods=['POST'])
+def batch_clientes():
+    try:
+        return upsert_lote(Cliente, ('nombre', 'cedula', 'telefono'))
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+#Obtener un cliente por su id
+@bp_clientes.route('/clientes/<int:id>', methods=['GET'])
+@condicional(Cliente)
+def get_cliente(id):
+    try:
+        cliente = Cliente.query.get_or_404(id)  
+        return jsonify({'id': cliente.id, 'nombre': cliente.nombre, 'cedula': cliente.cedula, 'telefono': cliente.telefono, 'nro_ordenes': cliente.nro_ordenes}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,44 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+
+import serializacion
+from comun import TOPICOS, ParametroInvalido, broker
+
+
+bp_eventos = Blueprint('eventos', __name__)
+
+
+# Eventos (Server-Sent Events)
+def _parse_topicos():
+    topicos = [t.strip() for t in request.args.get('topicos', ','.join(sorted(TOPICOS))).split(',') if t.strip()]
+    if not topicos or any(t not in TOPICOS for t in topicos):
+        raise ParametroInvalido(f'topicos debe ser una lista de: {", ".join(sorted(TOPICOS))}')
+    return topicos
+
+def formato_sse(evento):
+    datos = serializacion.backend.dumps(evento['datos'])
+    return f"id: {evento['id']}\nevent: {evento['topico']}\ndata: {datos}\n\n"
+
+@bp_eventos.route('/eventos', methods=['GET'])
+def stream_eventos():
+    try:
+        topicos = _parse_topicos()
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    keepalive = current_app.config['EVENTOS_KEEPALIVE']
+    suscripcion = broker.suscribir(topicos)
+
+    def generar():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                evento = suscripcion.get(timeout=keepalive)
+                if evento is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield formato_sse(evento)
+        finally:
+            suscripcion.cerrar()
+
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
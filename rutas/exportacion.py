@@ -0,0 +1,45 @@
+from flask import Blueprint, jsonify
+
+from comun import (CAMPOS_CATEGORIA, CAMPOS_CLIENTE, CAMPOS_MESA, CAMPOS_MESERO, CAMPOS_ORDEN, CAMPOS_ORDEN_PRODUCTO,
+                   CAMPOS_PRODUCTO, CAMPOS_SESION, CAMPOS_SESION_ORDEN, CAMPOS_VALORACION, LLAVES_ORDEN,
+                   ParametroInvalido, limite_archivo, listar)
+from modelos import Categoria, Cliente, Mesas, Mesero, OrdenesProductos, Productos, Sesion, SesionOrdenes, Valoraciones
+
+
+bp_exportacion = Blueprint('exportacion', __name__)
+
+
+# Tablas exportables por /export/<tabla>: nombre -> (campos, llaves)
+EXPORTABLES = {
+    'categorias': (CAMPOS_CATEGORIA, {'id': (Categoria.id,)}),
+    'productos': (CAMPOS_PRODUCTO, {'id': (Productos.id,)}),
+    'clientes': (CAMPOS_CLIENTE, {'id': (Cliente.id,)}),
+    'meseros': (CAMPOS_MESERO, {'id': (Mesero.id,)}),
+    'mesas': (CAMPOS_MESA, {'id': (Mesas.id,)}),
+    'ordenes': (CAMPOS_ORDEN, LLAVES_ORDEN),
+    'ordenes_productos': ({
+        **CAMPOS_ORDEN_PRODUCTO,
+        'producto_precio': (OrdenesProductos.producto_precio, None),
+        'cantidad': (OrdenesProductos.cantidad, None),
+    }, {'id': (OrdenesProductos.orden_id, OrdenesProductos.producto_id)}),
+    'sesiones': (CAMPOS_SESION, {'id': (Sesion.id,), 'fecha': (Sesion.fecha, Sesion.id)}),
+    'sesion_ordenes': (CAMPOS_SESION_ORDEN, {'id': (SesionOrdenes.sesion_id, SesionOrdenes.orden_id)}),
+    'valoraciones': (CAMPOS_VALORACION, {'id': (Valoraciones.id,)}),
+}
+ARCHIVADAS = {'ordenes', 'ordenes_productos', 'sesion_ordenes'}  # exportan también su archivo
+
+
+# Exportación
+@bp_exportacion.route('/export/<tabla>', methods=['GET'])
+def export_tabla(tabla):
+    try:
+        if tabla not in EXPORTABLES:
+            return jsonify({'error': f'Tabla no exportable: {tabla}'}), 404
+        campos, llaves = EXPORTABLES[tabla]
+        return listar(campos, llaves, stream='ndjson',
+                      archivo=tabla in ARCHIVADAS and limite_archivo() is not None)
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,295 @@
+import os
+import threading
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import select, update
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import func
+
+from comun import (CAMPOS_MESA, ParametroInvalido, Seguimiento, _conflicto, _select_campos, _version_vigente, cacheado,
+                   condicional, emitir, etag_fila, listar, versiones)
+from modelos import Mesas, Mesero, Ordenes, OrdenesProductos, VersionTabla, db
+
+
+bp_mesas = Blueprint('mesas', __name__)
+
+
+# Estados de una mesa y a cuáles puede pasar desde cada uno
+TRANSICIONES_MESA = {
+    'libre': {'ocupada', 'reservada'},
+    'reservada': {'libre', 'ocupada'},
+    'ocupada': {'libre'},
+}
+
+def _ordenes_abiertas(mesa_id):
+    return db.session.scalars(select(Ordenes.id).where(
+        Ordenes.mesa == str(mesa_id), Ordenes.estado.in_(current_app.config['ESTADOS_ACTIVOS']))
+        .order_by(Ordenes.id)).all()
+
+def _transicion_mesa(mesa, estado):
+    """Valida el cambio de estado de la mesa; devuelve la respuesta de error o None."""
+    if estado not in TRANSICIONES_MESA:
+        return jsonify({'error': 'Estado de mesa inválido', 'estados': sorted(TRANSICIONES_MESA)}), 400
+    # Una mesa con un estado anterior a esta validación puede pasar a cualquiera
+    permitidos = TRANSICIONES_MESA.get(mesa.estado, set(TRANSICIONES_MESA))
+    if estado != mesa.estado and estado not in permitidos:
+        return jsonify({'error': f'La mesa no puede pasar de {mesa.estado} a {estado}', 'estado': mesa.estado,
+                        'permitidos': sorted(permitidos)}), 409
+    if estado == 'libre' and mesa.estado != 'libre':
+        abiertas = _ordenes_abiertas(mesa.id)
+        if abiertas:
+            return jsonify({'error': 'La mesa tiene órdenes abiertas', 'ordenes': abiertas}), 409
+    return None
+
+#Mesas
+@bp_mesas.route('/mesas', methods=['GET', 'POST'])
+@condicional(Mesas)
+@cacheado(Mesas)
+def manage_mesas():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_MESA, {'id': (Mesas.id,)})
+
+        if request.method == 'POST':
+            data = request.get_json()
+            if data['estado'] not in TRANSICIONES_MESA:
+                return jsonify({'error': 'Estado de mesa inválido', 'estados': sorted(TRANSICIONES_MESA)}), 400
+            nueva_mesa = Mesas(numero=data['numero'], capacidad=data['capacidad'], estado=data['estado'])
+            db.session.add(nueva_mesa)
+            db.session.commit()
+            return jsonify({'message': 'Mesa creada', 'id': nueva_mesa.id}), 201
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+#Obtener mesa por id
+@bp_mesas.route('/mesas/<int:id>', methods=['GET'])
+@condicional(Mesas)
+@cacheado(Mesas)
+def get_mesa(id):
+    try:
+        mesa = Mesas.query.get_or_404(id)   
+        return jsonify({'id': mesa.id, 'numero': mesa.numero, 'capacidad': mesa.capacidad, 'estado': mesa.estado,
+                        'version': mesa.version}), 200, etag_fila(mesa)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+#Actualizar el estado de la mesa
+@bp_mesas.route('/mesas/<int:id>', methods=['PUT'])
+def manage_mesa(id):
+    try:
+        mesa = Mesas.query.get_or_404(id)
+
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Se esperaba un cuerpo JSON'}), 400
+        if not _version_vigente(mesa, data):
+            return jsonify({'error': 'La mesa fue modificada por otra petición', 'version': mesa.version}), 409
+        error = _transicion_mesa(mesa, data['estado'])
+        if error:
+            return error
+        mesa.estado = data['estado']
+        db.session.commit()
+        emitir('mesas', accion='actualizada', id=mesa.id, estado=mesa.estado)
+        return jsonify({'message': 'Mesa actualizada', 'version': mesa.version}), 200, etag_fila(mesa)
+
+    except StaleDataError:
+        db.session.rollback()
+        return _conflicto(Mesas, id, 'La mesa fue modificada por otra petición')
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+#Ocupar una mesa libre o reservada
+@bp_mesas.route('/mesas/<int:id>/ocupar', methods=['POST'])
+def ocupar_mesa(id):
+    # Un solo UPDATE condicional: si dos meseros la piden a la vez, la base deja
+    # pasar a uno y el otro recibe 409, sin SELECT previo ni bloqueos retenidos
+    try:
+        desde = [e for e, permitidos in TRANSICIONES_MESA.items() if 'ocupada' in permitidos]
+        resultado = db.session.execute(
+            update(Mesas).where(Mesas.id == id, Mesas.estado.in_(desde))
+            .values(estado='ocupada', version=Mesas.version + 1)
+            .execution_options(synchronize_session=False, salon_mesas=(id,)))
+        if resultado.rowcount != 1:
+            db.session.rollback()
+            estado = db.session.scalar(select(Mesas.estado).where(Mesas.id == id))
+            if estado is None:
+                return jsonify({'error': 'Mesa no encontrada'}), 404
+            return jsonify({'error': 'La mesa no está libre', 'estado': estado}), 409
+        db.session.commit()
+        emitir('mesas', accion='actualizada', id=id, estado='ocupada')
+        return jsonify({'message': 'Mesa ocupada'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+# Estado del salón
+#
+# Cada worker mantiene en memoria las mesas con sus órdenes activas (mesero,
+# desde cuándo y total con impuestos), así /mesas/estado responde sin
+# recorrer el historial de órdenes. Se arma con la primera petición del proceso
+# y se actualiza al confirmar cada transacción de este worker que toca mesas u
+# órdenes: las mesas se releen por las filas modificadas y las órdenes por los
+# ids que registra tocar_ordenes. Si las versiones de las tablas avanzaron más
+# de lo que explica la transacción (escribió otro worker), hubo un UPDATE o
+# DELETE masivo o cambió un mesero, se reconstruye en la próxima lectura.
+TABLAS_SALON = (Mesas.__tablename__, Ordenes.__tablename__, OrdenesProductos.__tablename__,
+                Mesero.__tablename__)
+
+def _ordenes_salon(session, *criterios):
+    """Órdenes con el nombre del mesero y su total (0 si no tiene)."""
+    filas = session.execute(
+        select(Ordenes.id, Ordenes.mesa, Ordenes.estado, Ordenes.mesero_id, Mesero.nombre.label('mesero'),
+               Ordenes.fecha, func.coalesce(Ordenes.total, 0).label('total'))
+        .outerjoin(Mesero, Mesero.id == Ordenes.mesero_id).where(*criterios))
+    return [{**f._asdict(), 'total': Decimal(str(f.total)).quantize(Decimal('0.01'))} for f in filas]
+
+class Salon:
+    def __init__(self):
+        self.mesas = {}  # id -> fila con los campos de CAMPOS_MESA
+        self.ordenes = {}  # id -> orden activa (ver _ordenes_salon)
+        self.por_mesa = {}  # valor de Ordenes.mesa -> set(ids de órdenes activas)
+        self.versiones = None  # tabla -> versión que refleja lo que hay en memoria
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def estado(self):
+        actuales = dict(zip(TABLAS_SALON, (v for v, _ in versiones(TABLAS_SALON))))
+        with self._lock:
+            # Versiones menores vienen de una réplica atrasada: lo que hay es más nuevo
+            if self.versiones is None or any(actuales[t] > self.versiones[t] for t in TABLAS_SALON):
+                self._recargar(actuales)
+            ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+            return [self._resumen(m, ahora)
+                    for m in sorted(self.mesas.values(), key=lambda m: (m['numero'], m['id']))]
+
+    def _resumen(self, mesa, ahora):
+        ordenes = sorted((self.ordenes[i] for i in self.por_mesa.get(str(mesa['id']), ())),
+                         key=lambda o: (o['fecha'], o['id']))
+        resumen = {**mesa, 'ordenes': [o['id'] for o in ordenes], 'orden_id': None, 'mesero_id': None,
+                   'mesero': None, 'desde': None, 'minutos': None,
+                   'total': sum((o['total'] for o in ordenes), Decimal('0.00'))}
+        if ordenes:
+            # La orden que abrió la mesa es la más antigua; el total suma todas
+            primera = ordenes[0]
+            resumen.update(orden_id=primera['id'], mesero_id=primera['mesero_id'], mesero=primera['mesero'],
+                           desde=primera['fecha'], minutos=max(0, int((ahora - primera['fecha']).total_seconds() // 60)))
+        return resumen
+
+    def aplicar(self, nuevas, modificadas, mesa_ids, mesas, orden_ids, ordenes, recargar):
+        with self._lock:
+            if self.versiones is None or all(nuevas[t] <= self.versiones[t] for t in TABLAS_SALON):
+                return  # sin cargar, o una recarga posterior ya incluye estos cambios
+            esperadas = {t: self.versiones[t] + (t in modificadas) for t in TABLAS_SALON}
+            if recargar or nuevas != esperadas:
+                self.versiones = None
+                return
+            for id in mesa_ids:
+                self.mesas.pop(id, None)
+            self.mesas.update((f['id'], f) for f in mesas)
+            for id in orden_ids:
+                self._quitar_orden(id)
+            estados = current_app.config['ESTADOS_ACTIVOS']
+            for orden in ordenes:
+                if orden['estado'] in estados:
+                    self._poner_orden(orden)
+            self.versiones = nuevas
+
+    def limpiar(self):
+        with self._lock:
+            self.mesas, self.ordenes, self.por_mesa = {}, {}, {}
+            self.versiones = None
+
+    def precargar(self):
+        """Arma el estado en otro hilo la primera vez que este proceso atiende una petición."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._precargar, args=(current_app._get_current_object(),), daemon=True).start()
+
+    def _precargar(self, app):
+        try:
+            with app.app_context():
+                self.estado()
+        except Exception:
+            app.logger.exception('No se pudo precargar el estado del salón')
+
+    def _poner_orden(self, orden):
+        self.ordenes[orden['id']] = orden
+        self.por_mesa.setdefault(orden['mesa'], set()).add(orden['id'])
+
+    def _quitar_orden(self, id):
+        orden = self.ordenes.pop(id, None)
+        if orden is not None:
+            ids = self.por_mesa[orden['mesa']]
+            ids.discard(id)
+            if not ids:
+                del self.por_mesa[orden['mesa']]
+
+    def _recargar(self, actuales):
+        self.mesas = {f.id: f._asdict() for f in db.session.execute(_select_campos(CAMPOS_MESA))}
+        self.ordenes, self.por_mesa = {}, {}
+        for orden in _ordenes_salon(db.session, Ordenes.estado.in_(current_app.config['ESTADOS_ACTIVOS'])):
+            self._poner_orden(orden)
+        self.versiones = actuales
+
+salon = Salon()
+
+@bp_mesas.before_app_request
+def _precargar_salon():
+    if current_app.config['SALON_PRECARGAR']:
+        salon.precargar()
+
+def _salon_execute(seguimiento, estado):
+    # Los INSERT de órdenes y las líneas llegan con sus ids por tocar_ordenes, igual
+    # que los UPDATE con la opción orden_ids; un UPDATE de mesas puede indicar sus
+    # filas con la opción salon_mesas
+    tabla, opciones = estado.statement.table.name, estado.execution_options
+    if tabla == Mesas.__tablename__ and estado.is_update and opciones.get('salon_mesas') is not None:
+        seguimiento.anotar(estado.session, 'mesas', opciones['salon_mesas'])
+    elif tabla in (Mesas.__tablename__, Mesero.__tablename__) or (
+            tabla == Ordenes.__tablename__ and not estado.is_insert and opciones.get('orden_ids') is None):
+        seguimiento.recargar(estado.session)
+
+def _salon_leer(session, ids, recargar):
+    modificadas = session.info.get('tablas_modificadas', set()) & set(TABLAS_SALON)
+    if not modificadas or salon.versiones is None:
+        return None
+    # Un mesero cambiado puede figurar en cualquier orden activa
+    recargar = recargar or bool(ids['meseros'])
+    leidas = dict(session.execute(select(VersionTabla.tabla, VersionTabla.version)
+                                  .where(VersionTabla.tabla.in_(TABLAS_SALON))).all())
+    mesa_ids, orden_ids = ids['mesas'], ids['ordenes']
+    mesas, ordenes = [], []
+    if mesa_ids and not recargar:
+        mesas = [f._asdict() for f in session.execute(
+            _select_campos(CAMPOS_MESA).where(Mesas.id.in_(mesa_ids)))]
+    if orden_ids and not recargar:
+        ordenes = _ordenes_salon(session, Ordenes.id.in_(orden_ids))
+    return ({t: leidas.get(t, 0) for t in TABLAS_SALON}, modificadas,
+            mesa_ids, mesas, orden_ids, ordenes, recargar)
+
+Seguimiento('salon', {Mesas: 'mesas', Mesero: 'meseros'}, _salon_leer, salon.aplicar,
+            execute=_salon_execute, ordenes='ordenes')
+
+#Estado del salón: cada mesa con su orden abierta, mesero, minutos y total
+@bp_mesas.route('/mesas/estado', methods=['GET'])
+def get_estado_salon():
+    # Sin condicional: los minutos cambian aunque no cambien las tablas
+    try:
+        estado = request.args.get('estado')
+        if estado is not None and estado not in TRANSICIONES_MESA:
+            return jsonify({'error': 'Estado de mesa inválido', 'estados': sorted(TRANSICIONES_MESA)}), 400
+        mesas = salon.estado()
+        if estado is not None:
+            mesas = [m for m in mesas if m['estado'] == estado]
+        return jsonify(mesas), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,49 @@
+from flask import Blueprint, jsonify, request
+
+from comun import CAMPOS_MESERO, ParametroInvalido, cacheado, condicional, listar
+from modelos import Mesero, db
+
+
+bp_meseros = Blueprint('meseros', __name__)
+
+
+#Meseros
+@bp_meseros.route('/meseros', methods=['GET', 'POST'])
+@condicional(Mesero)
+@cacheado(Mesero)
+def manage_meseros():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_MESERO, {'id': (Mesero.id,)})
+
+        if request.method == 'POST':
+            data = request.get_json()
+            nuevo_mesero = Mesero(nombre=data['nombre'])
+            db.session.add(nuevo_mesero)
+            db.session.commit()
+            return jsonify({'message': 'Mesero creado', 'id': nuevo_mesero.id}), 201
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_meseros.route('/meseros/<int:id>', methods=['PUT', 'DELETE'])
+def manage_mesero(id):
+    try:
+        mesero = Mesero.query.get_or_404(id)
+
+        if request.method == 'PUT':
+            data = request.get_json()
+            mesero.nombre = data['nombre']
+            db.session.commit()
+            return jsonify({'message': 'Mesero actualizado'}), 200
+
+        if request.method == 'DELETE':
+            db.session.delete(mesero)
+            db.session.commit()
+            return jsonify({'message': 'Mesero eliminado'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
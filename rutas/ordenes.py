@@ -0,0 +1,385 @@
+import threading
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import insert, select
+from sqlalchemy.orm.exc import StaleDataError
+
+from comun import (CAMPOS_ORDEN, LLAVES_ORDEN, ORDENES_CHUNK, ParametroInvalido, Seguimiento, _conflicto, _en_archivo,
+                   _parse_decimal, _parse_entero, _parse_estados, _parse_expand, _parse_fecha, _parse_fields,
+                   _rango_ordenes, _select_campos, _serializar, _version_tabla, _version_vigente, actualizar_totales,
+                   auditar, condicional, emitir, encolar, etag_fila, limite_archivo, listar, necesita_archivo,
+                   revisar_totales, tocar_ordenes, versiones)
+from modelos import Ordenes, OrdenesProductos, Productos, SesionOrdenes, db
+from serializacion import filas_a_dicts
+
+
+bp_ordenes = Blueprint('ordenes', __name__)
+
+
+# Órdenes activas
+#
+# Cada worker guarda en memoria las órdenes cuyo estado está en ESTADOS_ACTIVOS,
+# junto con la versión de la tabla ordenes que reflejan. Las transacciones que
+# tocan órdenes releen esas filas en before_commit y las aplican al confirmar;
+# si la versión no es la siguiente a la conocida (escribió otro worker) o hubo
+# un UPDATE/DELETE masivo, el conjunto se recarga en la próxima lectura.
+class OrdenesActivas:
+    def __init__(self):
+        self.ordenes = {}  # id -> fila con los campos de CAMPOS_ORDEN
+        self.version = None
+        self._lock = threading.Lock()
+
+    def listar(self):
+        version = versiones((Ordenes.__tablename__,))[0][0]
+        with self._lock:
+            # Una versión menor viene de una réplica atrasada: lo que hay es más nuevo
+            if self.version is None or version > self.version:
+                self._recargar(version)
+            return sorted(self.ordenes.values(), key=lambda o: (o['fecha'], o['id']))
+
+    def aplicar(self, version, filas, ids, recargar):
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return  # una recarga posterior ya incluye estos cambios
+            if recargar or self.version is None or version != self.version + 1:
+                self.version = None
+                return
+            for id in ids:
+                self.ordenes.pop(id, None)
+            estados = current_app.config['ESTADOS_ACTIVOS']
+            self.ordenes.update((f['id'], f) for f in filas if f['estado'] in estados)
+            self.version = version
+
+    def limpiar(self):
+        with self._lock:
+            self.ordenes.clear()
+            self.version = None
+
+    def _recargar(self, version):
+        filas = db.session.execute(
+            _select_campos(CAMPOS_ORDEN).where(Ordenes.estado.in_(current_app.config['ESTADOS_ACTIVOS'])))
+        self.ordenes = {f.id: f._asdict() for f in filas}
+        self.version = version
+
+ordenes_activas = OrdenesActivas()
+
+
+def _activas_execute(seguimiento, estado):
+    # Los INSERT llegan con sus ids por tocar_ordenes y actualizar_totales indica
+    # las filas de su UPDATE con la opción orden_ids; lo demás obliga a recargar
+    if estado.statement.table.name != Ordenes.__tablename__ or estado.is_insert:
+        return
+    ids = estado.execution_options.get('orden_ids')
+    if estado.is_update and ids is not None:
+        seguimiento.anotar(estado.session, 'ordenes', ids)
+    else:
+        seguimiento.recargar(estado.session)
+
+def _activas_leer(session, ids, recargar):
+    ids = ids['ordenes']
+    filas = []
+    if ids and not recargar:
+        filas = [f._asdict() for f in session.execute(
+            _select_campos(CAMPOS_ORDEN).where(Ordenes.id.in_(ids)))]
+    return _version_tabla(session, Ordenes.__tablename__), filas, ids, recargar
+
+Seguimiento('activas', {Ordenes: 'ordenes'}, _activas_leer, ordenes_activas.aplicar,
+            execute=_activas_execute, ordenes='ordenes')
+
+
+def _filtros_ordenes():
+    """Criterios de /ordenes: estado (lista separada por comas), mesero_id, mesa,
+    cliente_id, desde/hasta sobre fecha y total_min/total_max."""
+    criterios = []
+    estados = _parse_estados()
+    if estados:
+        criterios.append(Ordenes.estado.in_(estados))
+    for nombre, columna in (('mesero_id', Ordenes.mesero_id), ('cliente_id', Ordenes.cliente_id)):
+        valor = _parse_entero(nombre)
+        if valor is not None:
+            criterios.append(columna == valor)
+    if request.args.get('mesa'):
+        criterios.append(Ordenes.mesa == request.args['mesa'])
+    criterios += _rango_ordenes()
+    total_min, total_max = _parse_decimal('total_min'), _parse_decimal('total_max')
+    if total_min is not None:
+        criterios.append(Ordenes.total >= total_min)
+    if total_max is not None:
+        criterios.append(Ordenes.total <= total_max)
+    return criterios
+
+
+# Ordenes
+@bp_ordenes.route('/ordenes', methods=['GET', 'POST'])
+@condicional(Ordenes)
+def manage_ordenes():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_ORDEN, LLAVES_ORDEN, *_filtros_ordenes(), modelo=Ordenes,
+                          archivo=necesita_archivo(limite_archivo(), _parse_fecha('desde'), _parse_estados()))
+
+        if request.method == 'POST':
+            data = request.get_json()
+            nueva_orden = Ordenes(
+                cliente_id=data['cliente_id'],
+                mesa=data.get('mesa'),
+                estado=data['estado'],
+                mesero_id=data.get('mesero_id')
+            )
+            db.session.add(nueva_orden)
+            db.session.commit()
+            emitir('ordenes', accion='creada', id=nueva_orden.id,
+                   estado=nueva_orden.estado, mesa=nueva_orden.mesa)
+            encolar('nro_ordenes', {'cliente_id': nueva_orden.cliente_id},
+                    idempotencia=f'nro_ordenes:{nueva_orden.id}')
+            auditar('creada', 'ordenes', nueva_orden.id, estado=nueva_orden.estado)
+            return jsonify({'message': 'Orden creada', 'id': nueva_orden.id}), 201
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception('Error al agregar orden')
+        return jsonify({'error': str(e)}), 500
+
+@bp_ordenes.route('/ordenes/<int:id>', methods=['PUT', 'DELETE'])
+def manage_orden(id):
+    try:
+        orden = Ordenes.query.get_or_404(id)
+
+        data = request.get_json(silent=True) if request.method == 'PUT' else None
+        if request.method == 'PUT' and not isinstance(data, dict):
+            return jsonify({'error': 'Se esperaba un cuerpo JSON'}), 400
+        if not _version_vigente(orden, data):
+            return jsonify({'error': 'La orden fue modificada por otra petición', 'version': orden.version}), 409
+
+        if request.method == 'PUT':
+            # El total lo calcula el servidor a partir de las líneas: si el cliente
+            # manda la orden completa, su 'total' se ignora
+            # Actualizar solo las propiedades que se envían en el cuerpo de la solicitud
+            if 'cliente_id' in data:
+                orden.cliente_id = data['cliente_id']
+            if 'mesa' in data:
+                orden.mesa = data['mesa']
+            if 'estado' in data:
+                orden.estado = data['estado']
+            if 'mesero_id' in data:
+                orden.mesero_id = data['mesero_id']
+            if 'metodo_pago' in data:
+                orden.metodo_pago = data['metodo_pago']
+            if 'referencia_pago' in data:
+                orden.referencia_pago = data['referencia_pago']
+            if 'vuelto' in data:
+                orden.vuelto = data['vuelto']
+            if 'nota' in data:
+                orden.nota = data['nota']
+
+            db.session.commit()
+            emitir('ordenes', accion='actualizada', id=orden.id, estado=orden.estado, mesa=orden.mesa)
+            auditar('actualizada', 'ordenes', orden.id, campos=sorted(data))
+            return jsonify({'message': 'Orden actualizada', 'version': orden.version}), 200, etag_fila(orden)
+
+        if request.method == 'DELETE':
+            db.session.delete(orden)
+            db.session.commit()
+            emitir('ordenes', accion='eliminada', id=id)
+            auditar('eliminada', 'ordenes', id)
+            return jsonify({'message': 'Orden eliminada'}), 204
+
+    except StaleDataError:
+        db.session.rollback()
+        return _conflicto(Ordenes, id, 'La orden fue modificada por otra petición')
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+#Recalcular los totales de las órdenes por bloques; se retoma desde 'siguiente'
+RECALCULAR_LIMITE = 50000  # órdenes revisadas por petición
+MUESTRA_DIFERENCIAS = 100
+
+@bp_ordenes.route('/ordenes/recalcular', methods=['POST'])
+def recalcular_totales_ordenes():
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            desde = int(data.get('desde') or 0)
+            hasta = int(data['hasta']) if data.get('hasta') is not None else None
+            limite = int(data.get('limite') or RECALCULAR_LIMITE)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'desde, hasta y limite deben ser enteros'}), 400
+        corregir = bool(data.get('corregir', True))
+
+        resumen = {'revisadas': 0, 'con_diferencia': 0, 'corregidas': 0, 'diferencia_total': Decimal('0.00')}
+        muestra, siguiente = [], None
+        for bloque in revisar_totales(db.session, desde, hasta, corregir, min(limite, ORDENES_CHUNK)):
+            resumen['revisadas'] += bloque['revisadas']
+            resumen['con_diferencia'] += len(bloque['diferencias'])
+            resumen['corregidas'] += bloque['corregidas']
+            for d in bloque['diferencias']:
+                diferencia = d.calculado - (d.total or 0)
+                resumen['diferencia_total'] += diferencia
+                if len(muestra) < MUESTRA_DIFERENCIAS:
+                    muestra.append({'id': d.id, 'total': d.total, 'calculado': d.calculado, 'diferencia': diferencia})
+            if resumen['revisadas'] >= limite:
+                siguiente = bloque['hasta']
+                break
+        return jsonify({**resumen, 'diferencias': muestra, 'siguiente': siguiente}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+#Obtener Ordenes activas (desde memoria)
+@bp_ordenes.route('/ordenes/activas', methods=['GET'])
+@condicional(Ordenes)
+def get_ordenes_activas():
+    try:
+        nombres = _parse_fields(CAMPOS_ORDEN)
+        mesa, mesero_id = request.args.get('mesa'), _parse_entero('mesero_id')
+        return jsonify([
+            {n: o[n] for n in nombres} for o in ordenes_activas.listar()
+            if (mesa is None or o['mesa'] == mesa)
+            and (mesero_id is None or o['mesero_id'] == mesero_id)
+        ]), 200
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+#Obtener Orden por Id
+@bp_ordenes.route('/ordenes/<int:id>', methods=['GET'])
+@condicional(Ordenes, OrdenesProductos)
+def get_orden(id):
+    try:
+        arbol, opciones = _parse_expand(Ordenes)
+        orden = db.session.execute(
+            select(Ordenes).options(*opciones).where(Ordenes.id == id)).scalar_one_or_none()
+        if orden is None:
+            return _get_orden_archivada(id)
+        # Con expand la respuesta depende de otras tablas: queda el ETag de condicional
+        encabezados = {} if arbol else etag_fila(orden)
+        return jsonify(_serializar(orden, CAMPOS_ORDEN, arbol)), 200, encabezados
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            'error': str(e)
+        })
+    
+def _get_orden_archivada(id):
+    limite = limite_archivo()
+    fila = None
+    if limite is not None and id <= limite.orden_id:
+        fila = db.session.execute(_en_archivo(_select_campos(CAMPOS_ORDEN).where(Ordenes.id == id))).first()
+    if fila is None:
+        return jsonify({'error': 'Orden no encontrada'}), 404
+    # Sin los campos de expand: la orden archivada no tiene objeto ORM
+    return jsonify(filas_a_dicts([(n, c) for n, (_, c) in CAMPOS_ORDEN.items()], [fila])[0]), 200
+
+#Obtener Ordenes por Cliente
+@bp_ordenes.route('/ordenes/cliente/<int:id>', methods=['GET'])
+@condicional(Ordenes, OrdenesProductos)
+def get_ordenes_by_cliente(id):
+    try:
+        return listar(CAMPOS_ORDEN, LLAVES_ORDEN, Ordenes.cliente_id == id, *_rango_ordenes(), modelo=Ordenes,
+                      archivo=necesita_archivo(limite_archivo(), _parse_fecha('desde')))
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify([{
+            'error': str(e)
+        }])
+    
+#Obtener Ordenes por Mesa
+@bp_ordenes.route('/ordenes/mesa/<int:id>', methods=['GET'])
+@condicional(Ordenes, OrdenesProductos)
+def get_ordenes_by_mesa(id):
+    try:
+        # mesa es texto: comparar contra un entero impide usar el índice en MySQL
+        return listar(CAMPOS_ORDEN, LLAVES_ORDEN, Ordenes.mesa == str(id), *_rango_ordenes(), modelo=Ordenes,
+                      archivo=necesita_archivo(limite_archivo(), _parse_fecha('desde')))
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify([{
+            'error': str(e)
+        }])
+
+#Crear una orden completa (orden, productos y sesión) en una sola transacción
+@bp_ordenes.route('/ordenes/completa', methods=['POST'])
+def create_orden_completa():
+    try:
+        data = request.get_json()
+        if 'cliente_id' not in data or 'estado' not in data or not data.get('productos'):
+            return jsonify({'error': 'Faltan datos requeridos'}), 400
+
+        # Agrupar cantidades por producto (la clave de ordenes_productos es orden_id + producto_id)
+        cantidades = {}
+        for item in data['productos']:
+            try:
+                cantidad = Decimal(str(item['cantidad']))
+                producto_id = int(item['producto_id'])
+            except (KeyError, TypeError, ValueError, InvalidOperation):
+                return jsonify({'error': 'Producto inválido', 'producto': item}), 400
+            if cantidad <= 0:
+                return jsonify({'error': 'Cantidad inválida', 'producto': item}), 400
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+        precios = dict(db.session.execute(
+            select(Productos.id, Productos.precio_venta).where(Productos.id.in_(cantidades))
+        ).all())
+        faltantes = [p for p in cantidades if p not in precios]
+        if faltantes:
+            return jsonify({'error': 'Productos no encontrados', 'productos': faltantes}), 400
+
+        lineas = [{
+            'producto_id': producto_id,
+            'producto_precio': precios[producto_id],
+            'cantidad': cantidad,
+            'orden_producto_total': (precios[producto_id] * cantidad).quantize(Decimal('0.01'))
+        } for producto_id, cantidad in cantidades.items()]
+
+        orden_id = db.session.execute(insert(Ordenes).values(
+            cliente_id=data['cliente_id'],
+            total=0,
+            mesa=data.get('mesa'),
+            estado=data['estado'],
+            mesero_id=data.get('mesero_id'),
+            metodo_pago=data.get('metodo_pago'),
+            referencia_pago=data.get('referencia_pago'),
+            vuelto=data.get('vuelto'),
+            nota=data.get('nota')
+        )).inserted_primary_key[0]
+        tocar_ordenes(db.session, [orden_id], nuevas=True)
+        for linea in lineas:
+            linea['orden_id'] = orden_id
+        db.session.execute(insert(OrdenesProductos), lineas)
+        actualizar_totales(db.session, [orden_id])
+        total = db.session.scalar(select(Ordenes.total).where(Ordenes.id == orden_id))
+        if data.get('sesion_id') is not None:
+            db.session.execute(insert(SesionOrdenes).values(sesion_id=data['sesion_id'], orden_id=orden_id))
+        db.session.commit()
+        emitir('ordenes', accion='creada', id=orden_id, estado=data['estado'], mesa=data.get('mesa'))
+        encolar('nro_ordenes', {'cliente_id': data['cliente_id']}, idempotencia=f'nro_ordenes:{orden_id}')
+        auditar('creada', 'ordenes', orden_id, estado=data['estado'], productos=len(lineas))
+
+        return jsonify({
+            'message': 'Orden creada',
+            'id': orden_id,
+            'total': str(total),
+            'sesion_id': data.get('sesion_id'),
+            'productos': [{
+                'producto_id': l['producto_id'],
+                'producto_precio': str(l['producto_precio']),
+                'cantidad': str(l['cantidad']),
+                'orden_producto_total': str(l['orden_producto_total'])
+            } for l in lineas]
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,143 @@
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+from sqlalchemy.sql import func
+
+from comun import (CAMPOS_ORDEN_PRODUCTO, CAMPOS_PRODUCTO_EN_ORDEN, ParametroInvalido, _sentencia_upsert,
+                   actualizar_totales, condicional, emitir, limite_archivo, listar, tocar_ordenes)
+from modelos import Ordenes, OrdenesProductos, Productos, db
+
+
+bp_ordenes_productos = Blueprint('ordenes_productos', __name__)
+
+
+#Ordenes Productos
+@bp_ordenes_productos.route('/ordenes_productos', methods=['POST'])
+def add_producto_to_orden():
+    try:
+        data = request.get_json()
+
+        # Validate input data
+        if 'orden_id' not in data or 'producto_id' not in data or 'cantidad' not in data:
+            return jsonify({'error': 'Faltan datos requeridos'}), 400
+
+        try:
+            orden_id, producto_id = int(data['orden_id']), int(data['producto_id'])
+            cantidad = Decimal(str(data['cantidad']))
+        except (TypeError, ValueError, InvalidOperation):
+            return jsonify({'error': 'orden_id, producto_id y cantidad deben ser numéricos'}), 400
+        # Precio y total de la línea los pone el servidor, como en /ordenes/completa:
+        # producto_precio y orden_producto_total del cliente se ignoran
+        precio = db.session.scalar(select(Productos.precio_venta).where(Productos.id == producto_id))
+        if precio is None:
+            return jsonify({'error': 'Producto no encontrado', 'producto_id': producto_id}), 400
+        # Sin FK en SQLite el upsert dejaría una línea huérfana
+        if db.session.scalar(select(Ordenes.id).where(Ordenes.id == orden_id)) is None:
+            return jsonify({'error': 'Orden no encontrada'}), 404
+        total_linea = (precio * cantidad).quantize(Decimal('0.01'))
+
+        # Si el producto ya está en la orden se suma la cantidad en la misma
+        # sentencia, en vez de chocar con la clave primaria (orden_id, producto_id),
+        # y la línea entera queda al precio actual. El total va primero, antes de
+        # que MySQL sume la cantidad (ver _sentencia_upsert)
+        tabla = OrdenesProductos.__table__
+        tocar_ordenes(db.session, [orden_id])
+        db.session.execute(_sentencia_upsert(
+            db.session, OrdenesProductos,
+            [{'orden_id': orden_id, 'producto_id': producto_id, 'producto_precio': precio,
+              'cantidad': cantidad, 'orden_producto_total': total_linea}],
+            ('orden_id', 'producto_id'),
+            lambda nuevos: {
+                'orden_producto_total': func.round((tabla.c.cantidad + nuevos.cantidad) * nuevos.producto_precio, 2),
+                'producto_precio': nuevos.producto_precio,
+                'cantidad': tabla.c.cantidad + nuevos.cantidad}))
+        actualizar_totales(db.session, [orden_id])
+        linea = db.session.execute(
+            select(OrdenesProductos.cantidad, OrdenesProductos.orden_producto_total, Ordenes.total)
+            .join(Ordenes, Ordenes.id == OrdenesProductos.orden_id)
+            .where(OrdenesProductos.orden_id == orden_id, OrdenesProductos.producto_id == producto_id)).one()
+        db.session.commit()
+        emitir('ordenes', accion='producto_agregado', id=orden_id,
+               producto_id=producto_id, cantidad=str(linea.cantidad))
+        return jsonify({'message': 'Producto añadido a la orden', 'cantidad': linea.cantidad,
+                        'orden_producto_total': linea.orden_producto_total, 'total_orden': linea.total}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@bp_ordenes_productos.route('/ordenes_productos/<int:orden_id>/<int:producto_id>', methods=['DELETE'])
+def remove_producto_from_orden(orden_id, producto_id):
+    try:
+        relacion = OrdenesProductos.query.filter_by(
+            orden_id=orden_id, producto_id=producto_id).first_or_404()
+        db.session.delete(relacion)
+        db.session.commit()
+        emitir('ordenes', accion='producto_eliminado', id=orden_id, producto_id=producto_id)
+        return jsonify({'message': 'Producto eliminado de la orden'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Additional route to get all products in an order
+@bp_ordenes_productos.route('/ordenes_productos/<int:orden_id>', methods=['GET'])
+@condicional(OrdenesProductos)
+def get_productos_in_orden(orden_id):
+    try:
+        limite = limite_archivo()
+        return listar(CAMPOS_PRODUCTO_EN_ORDEN, {'id': (OrdenesProductos.producto_id,)},
+                      OrdenesProductos.orden_id == orden_id,
+                      archivo=limite is not None and orden_id <= limite.orden_id)
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Additional route to update a product in an order
+@bp_ordenes_productos.route('/ordenes_productos/<int:orden_id>/<int:producto_id>', methods=['PUT'])
+def update_producto_in_orden(orden_id, producto_id):
+    try:
+        data = request.get_json()
+        if 'cantidad' not in data:
+            return jsonify({'error': 'Cantidad no proporcionada'}), 400
+
+        try:
+            cantidad = Decimal(str(data['cantidad']))
+        except (TypeError, ValueError, InvalidOperation):
+            return jsonify({'error': 'La cantidad debe ser numérica'}), 400
+
+        relacion = OrdenesProductos.query.filter_by(
+            orden_id=orden_id, producto_id=producto_id).first()
+
+        if not relacion:
+            return jsonify({'error': 'Relación no encontrada'}), 404
+
+        # El total de la orden lo actualiza el flush (ver actualizar_totales)
+        relacion.cantidad = cantidad
+        relacion.orden_producto_total = (relacion.producto_precio * cantidad).quantize(Decimal('0.01'))
+
+        db.session.commit()
+        emitir('ordenes', accion='producto_actualizado', id=orden_id,
+               producto_id=producto_id, cantidad=data['cantidad'])
+        return jsonify({'message': 'Producto actualizado en la orden'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al actualizar producto: {str(e)}'}), 500
+
+
+# Additional route to get all
+@bp_ordenes_productos.route('/ordenes_productos', methods=['GET'])
+@condicional(OrdenesProductos)
+def get_all_ordenes_productos():
+    try:
+        return listar(CAMPOS_ORDEN_PRODUCTO,
+                      {'id': (OrdenesProductos.orden_id, OrdenesProductos.producto_id)})
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,178 @@
+import os
+import threading
+
+from flask import Blueprint, current_app, jsonify, request
+
+from busqueda import IndiceTexto
+from comun import (CAMPOS_PRODUCTO, ParametroInvalido, Seguimiento, _parse_entero, _parse_limit, _select_campos,
+                   _version_tabla, cacheado, condicional, listar, upsert_lote, versiones)
+from modelos import Productos, db
+from serializacion import filas_a_dicts
+
+
+bp_productos = Blueprint('productos', __name__)
+
+
+# Búsqueda de productos
+#
+# Cada worker mantiene un IndiceTexto (busqueda.py) sobre nombre y referencia,
+# con la misma regla de versión que las órdenes activas: las escrituras de
+# productos de este worker se aplican al índice al confirmar y si la versión de
+# la tabla avanzó por otro lado se reconstruye en la próxima búsqueda.
+class BusquedaProductos:
+    def __init__(self):
+        self.indice = IndiceTexto()
+        self.version = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def buscar(self, consulta, limite, categoria_id=None):
+        self.sincronizar()
+        return self.indice.buscar(consulta, limite, categoria_id)
+
+    def sincronizar(self):
+        version = versiones((Productos.__tablename__,))[0][0]
+        with self._lock:
+            if self.version is None or version > self.version:
+                filas = db.session.execute(_select_campos(CAMPOS_PRODUCTO))
+                self.indice.cargar(_documentos_producto(filas))
+                self.version = version
+
+    def aplicar(self, version, documentos, ids, recargar):
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            if recargar or self.version is None or version != self.version + 1:
+                self.version = None
+                return
+            for id in ids:
+                self.indice.quitar(id)
+            for documento in documentos:
+                self.indice.poner(*documento)
+            self.version = version
+
+    def precargar(self):
+        """Arma el índice en otro hilo la primera vez que este proceso atiende una petición."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._precargar, args=(current_app._get_current_object(),), daemon=True).start()
+
+    def _precargar(self, app):
+        try:
+            with app.app_context():
+                self.sincronizar()
+        except Exception:
+            app.logger.exception('No se pudo precargar el índice de productos')
+
+busqueda_productos = BusquedaProductos()
+
+def _documentos_producto(filas):
+    filas = list(filas)
+    conversiones = [(n, c) for n, (_, c) in CAMPOS_PRODUCTO.items()]
+    return [(f.id, datos, f.nombre, f.referencia, f.categoria_id)
+            for f, datos in zip(filas, filas_a_dicts(conversiones, filas))]
+
+@bp_productos.before_app_request
+def _precargar_busqueda():
+    if current_app.config['BUSQUEDA_PRECARGAR']:
+        busqueda_productos.precargar()
+
+def _busqueda_execute(seguimiento, estado):
+    if estado.statement.table.name == Productos.__tablename__:
+        seguimiento.recargar(estado.session)
+
+def _busqueda_leer(session, ids, recargar):
+    ids = ids['productos']
+    documentos = []
+    if ids and not recargar:
+        documentos = _documentos_producto(session.execute(
+            _select_campos(CAMPOS_PRODUCTO).where(Productos.id.in_(ids))))
+    return _version_tabla(session, Productos.__tablename__), documentos, ids, recargar
+
+Seguimiento('busqueda', {Productos: 'productos'}, _busqueda_leer, busqueda_productos.aplicar,
+            execute=_busqueda_execute)
+
+#Productos
+@bp_productos.route('/productos', methods=['GET', 'POST'])
+@condicional(Productos)
+@cacheado(Productos)
+def manage_productos():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_PRODUCTO, {'id': (Productos.id,)})
+
+        if request.method == 'POST':
+            data = request.get_json()
+            nuevo_producto = Productos(
+                nombre=data['nombre'],
+                precio_venta=data['precio_venta'],
+                impuesto_venta=data['impuesto_venta'],
+                impuesto_compra=data['impuesto_compra'],
+                categoria_id=data['categoria_id'],
+                referencia=data['referencia'],
+                link_imagen=data.get('link_imagen')
+            )
+            db.session.add(nuevo_producto)
+            db.session.commit()
+            return jsonify({'message': 'Producto creado', 'id': nuevo_producto.id}), 201
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_productos.route('/productos/<int:id>', methods=['PUT', 'DELETE'])
+def manage_producto(id):
+    try:
+        producto = Productos.query.get_or_404(id)
+
+        if request.method == 'PUT':
+            data = request.get_json()
+            producto.nombre = data['nombre']
+            producto.precio_venta = data['precio_venta']
+            producto.impuesto_venta = data['impuesto_venta']
+            producto.impuesto_compra = data['impuesto_compra']
+            producto.categoria_id = data['categoria_id']
+            producto.referencia = data['referencia']
+            producto.link_imagen = data.get('link_imagen')
+            db.session.commit()
+            return jsonify({'message': 'Producto actualizado'}), 200
+
+        if request.method == 'DELETE':
+            db.session.delete(producto)
+            db.session.commit()
+            return jsonify({'message': 'Producto eliminado'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+#Buscar productos por nombre o referencia (sin caché: el índice ya responde en memoria)
+@bp_productos.route('/productos/buscar', methods=['GET'])
+@condicional(Productos)
+def buscar_productos():
+    try:
+        consulta = request.args.get('q', '').strip()
+        if not consulta:
+            raise ParametroInvalido('q es requerido')
+        limite = _parse_limit(current_app.config['BUSQUEDA_LIMITE'])
+        resultados = busqueda_productos.buscar(consulta, limite, _parse_entero('categoria_id'))
+        return jsonify([{**datos, 'puntaje': puntaje} for datos, puntaje in resultados]), 200
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_productos.route('/productos/batch', methods=['POST'])
+def batch_productos():
+    try:
+        return upsert_lote(Productos,
+                           ('nombre', 'precio_venta', 'impuesto_venta', 'impuesto_compra', 'categoria_id', 'referencia'),
+                           ('link_imagen',))
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import desc, select
+from sqlalchemy.sql import func
+
+from comun import FORMATOS_PERIODO, ParametroInvalido, _parse_fecha, _parse_limit, _truncar_fecha, condicional
+from modelos import Mesero, Ordenes, OrdenesProductos, Productos, VentaHora, db
+
+
+bp_reportes = Blueprint('reportes', __name__)
+
+
+# Reportes (sobre la tabla venta_hora)
+def _rango_ventas():
+    desde, hasta = _parse_fecha('desde'), _parse_fecha('hasta', fin=True)
+    criterios = []
+    if desde is not None:
+        criterios.append(VentaHora.hora >= desde.replace(minute=0, second=0, microsecond=0))
+    if hasta is not None:
+        criterios.append(VentaHora.hora < hasta)
+    return criterios
+
+def _ranking(dimension, modelo, campo_id, campos=('ordenes', 'cantidad', 'total')):
+    # cantidad solo tiene sentido en las dimensiones por línea (producto, categoría)
+    limit = _parse_limit(10)
+    orden = request.args.get('orden', 'total')
+    if orden not in campos:
+        raise ParametroInvalido('orden debe ser uno de: ' + ', '.join(campos))
+    sumas = {c: func.sum(getattr(VentaHora, c)).label(c) for c in campos}
+    filas = db.session.execute(
+        select(VentaHora.clave, *sumas.values())
+        .where(VentaHora.dimension == dimension, *_rango_ventas())
+        .group_by(VentaHora.clave).order_by(desc(sumas[orden])).limit(limit)).all()
+    nombres = dict(db.session.execute(
+        select(modelo.id, modelo.nombre).where(modelo.id.in_([int(f.clave) for f in filas]))).all())
+    return [{
+        campo_id: int(f.clave),
+        'nombre': nombres.get(int(f.clave)),
+        **{c: f.ordenes if c == 'ordenes' else str(getattr(f, c)) for c in campos}
+    } for f in filas]
+
+@bp_reportes.route('/reportes/ventas', methods=['GET'])
+@condicional(Ordenes, OrdenesProductos)
+def get_reporte_ventas():
+    try:
+        granularidad = request.args.get('granularidad', 'dia')
+        if granularidad not in FORMATOS_PERIODO:
+            raise ParametroInvalido('granularidad debe ser hora, dia o mes')
+        periodo = _truncar_fecha(db.session, VentaHora.hora, granularidad).label('periodo')
+        filas = db.session.execute(
+            select(periodo, func.sum(VentaHora.ordenes).label('ordenes'), func.sum(VentaHora.total).label('total'))
+            .where(VentaHora.dimension == 'general', *_rango_ventas())
+            .group_by(periodo).order_by(periodo)).all()
+        return jsonify([{
+            'periodo': f.periodo,
+            'ordenes': f.ordenes,
+            'total': str(f.total),
+            'ticket_promedio': str((f.total / f.ordenes).quantize(Decimal('0.01')))
+        } for f in filas]), 200
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_reportes.route('/reportes/top-productos', methods=['GET'])
+@condicional(Ordenes, OrdenesProductos)
+def get_reporte_top_productos():
+    try:
+        return jsonify(_ranking('producto', Productos, 'producto_id')), 200
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_reportes.route('/reportes/meseros', methods=['GET'])
+@condicional(Ordenes, OrdenesProductos)
+def get_reporte_meseros():
+    try:
+        return jsonify(_ranking('mesero', Mesero, 'mesero_id', ('ordenes', 'total'))), 200
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
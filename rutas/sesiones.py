@@ -0,0 +1,163 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+
+from comun import CAMPOS_SESION, CAMPOS_SESION_ORDEN, ParametroInvalido, condicional, limite_archivo, listar
+from modelos import Categoria, Mesero, Ordenes, OrdenesProductos, Productos, ResumenSesion, Sesion, SesionOrdenes, db
+
+
+bp_sesiones = Blueprint('sesiones', __name__)
+
+
+# Sesion
+@bp_sesiones.route('/sesiones', methods=['GET', 'POST'])
+@condicional(Sesion)
+def manage_sesiones():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_SESION, {'id': (Sesion.id,), 'fecha': (Sesion.fecha, Sesion.id)})
+
+        if request.method == 'POST':
+            data = request.get_json()
+            nueva_sesion = Sesion(estado=data['estado'])
+            db.session.add(nueva_sesion)
+            db.session.commit()
+            return jsonify({'message': 'Sesión creada', 'id': nueva_sesion.id}), 201
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_sesiones.route('/sesiones/<int:id>', methods=['PUT', 'DELETE'])
+def manage_sesion(id):
+    try:
+        sesion = Sesion.query.get_or_404(id)
+
+        if request.method == 'PUT':
+            data = request.get_json()
+            sesion.estado = data['estado']
+            db.session.commit()
+            return jsonify({'message': 'Sesión actualizada'}), 200
+
+        if request.method == 'DELETE':
+            db.session.delete(sesion)
+            db.session.commit()
+            return jsonify({'message': 'Sesión eliminada'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+#Sesion por id
+@bp_sesiones.route('/sesiones/<int:id>', methods=['GET'])
+@condicional(Sesion)
+def get_sesion(id):
+    try:
+        sesion = Sesion.query.get_or_404(id)
+        return jsonify({'id': sesion.id, 'estado': sesion.estado, 'fecha': sesion.fecha}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+#Resumen de ventas de una sesión
+@bp_sesiones.route('/sesiones/<int:id>/resumen', methods=['GET'])
+@condicional(Sesion, SesionOrdenes, Ordenes, OrdenesProductos, ResumenSesion, Mesero, Productos, Categoria)
+def get_resumen_sesion(id):
+    try:
+        sesion = db.session.get(Sesion, id)
+        if sesion is None:
+            return jsonify({'error': 'Sesión no encontrada'}), 404
+
+        grupos = defaultdict(dict)
+        for r in db.session.execute(select(ResumenSesion).where(ResumenSesion.sesion_id == id)).scalars():
+            grupos[r.dimension][r.clave] = r
+
+        def nombres(modelo, claves):
+            ids = [int(c) for c in claves]
+            if not ids:
+                return {}
+            return {str(i): n for i, n in db.session.execute(
+                select(modelo.id, modelo.nombre).where(modelo.id.in_(ids)))}
+
+        meseros = nombres(Mesero, grupos['mesero'])
+        productos = nombres(Productos, grupos['producto'])
+        categorias = nombres(Categoria, grupos['categoria'])
+
+        general = grupos['general'].get('')
+        ordenes = general.ordenes if general else 0
+        total = general.total if general else Decimal('0')
+        return jsonify({
+            'sesion_id': sesion.id,
+            'estado': sesion.estado,
+            'ordenes': ordenes,
+            'total': str(total),
+            'ticket_promedio': str((total / ordenes).quantize(Decimal('0.01')) if ordenes else Decimal('0.00')),
+            'por_metodo_pago': [{
+                'metodo_pago': clave or None, 'ordenes': r.ordenes, 'total': str(r.total)
+            } for clave, r in sorted(grupos['metodo_pago'].items())],
+            'por_mesero': [{
+                'mesero_id': int(clave), 'nombre': meseros.get(clave),
+                'ordenes': r.ordenes, 'total': str(r.total)
+            } for clave, r in sorted(grupos['mesero'].items(), key=lambda x: int(x[0]))],
+            'por_producto': [{
+                'producto_id': int(clave), 'nombre': productos.get(clave), 'ordenes': r.ordenes,
+                'cantidad': str(r.cantidad), 'total': str(r.total)
+            } for clave, r in sorted(grupos['producto'].items(), key=lambda x: int(x[0]))],
+            'por_categoria': [{
+                'categoria_id': int(clave), 'nombre': categorias.get(clave), 'ordenes': r.ordenes,
+                'cantidad': str(r.cantidad), 'total': str(r.total)
+            } for clave, r in sorted(grupos['categoria'].items(), key=lambda x: int(x[0]))],
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Sesion Ordenes
+@bp_sesiones.route('/sesion_ordenes', methods=['POST'])
+def add_orden_to_sesion():
+    try:
+        data = request.get_json()
+        nueva_relacion = SesionOrdenes(
+            sesion_id=data['sesion_id'],
+            orden_id=data['orden_id']
+        )
+        db.session.add(nueva_relacion)
+        db.session.commit()
+        return jsonify({'message': 'Orden añadida a la sesión'}), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_sesiones.route('/sesion_ordenes/<int:sesion_id>/<int:orden_id>', methods=['DELETE'])
+def remove_orden_from_sesion(sesion_id, orden_id):
+    try:
+        relacion = SesionOrdenes.query.filter_by(
+            sesion_id=sesion_id, orden_id=orden_id).first_or_404()
+        db.session.delete(relacion)
+        db.session.commit()
+        return jsonify({'message': 'Orden eliminada de la sesión'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    
+#Todas las ordenes de una sesion por el id
+@bp_sesiones.route('/sesion_ordenes/<int:sesion_id>', methods=['GET'])
+@condicional(SesionOrdenes, Ordenes, OrdenesProductos)
+def get_ordenes_by_sesion(sesion_id):
+    try:
+        limite = limite_archivo()
+        return listar(CAMPOS_SESION_ORDEN, {'id': (SesionOrdenes.orden_id,)},
+                      SesionOrdenes.sesion_id == sesion_id, modelo=SesionOrdenes,
+                      archivo=limite is not None and limite.sesion_id is not None
+                      and sesion_id <= limite.sesion_id)
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,491 @@
+import hashlib
+import json
+import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import click
+from flask import Blueprint, Response, current_app, g, has_app_context, has_request_context, jsonify, request
+from sqlalchemy import delete, event, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import func
+
+import migraciones
+from comun import (ARCHIVO_LOTE, _agregar_sql, _captura, _con_archivo, _truncar_fecha, archivar_lote, cache, cola,
+                   respuestas_idempotentes, revisar_totales)
+from metricas import BUCKETS_BYTES, BUCKETS_CONTEO, Registro
+from modelos import TABLAS_AUXILIARES, Ordenes, ResumenSesion, Sesion, SesionOrdenes, VentaHora, db
+
+
+# Además de sus rutas, sistema lleva los hooks comunes a todas las peticiones
+# y los comandos de mantenimiento (sin grupo: flask migrar, flask archivar...)
+bp_sistema = Blueprint('sistema', __name__, cli_group=None)
+
+
+# Métricas
+#
+# Por petición se mide la duración, el tamaño de la respuesta y la cantidad y el
+# tiempo de las sentencias SQL (eventos del engine); del pool, con sus eventos
+# públicos, cuánto espera cada petición hasta su primera conexión (desde que
+# empieza), cuánto tarda en abrir una conexión nueva y cuánto la retiene cada
+# checkout, que es lo que hace esperar a las demás. Las sentencias que tardan más
+# de SQL_LENTA_MS se registran en el log. Todo se expone en /metrics (sumando los
+# workers si hay METRICAS_DIR) y, con SERVER_TIMING, en el header Server-Timing.
+registro = Registro()
+m_duracion = registro.histograma(
+    'http_request_duration_seconds', 'Duración de las peticiones HTTP', ('ruta', 'metodo', 'status'))
+m_tamano = registro.histograma(
+    'http_response_size_bytes', 'Tamaño del cuerpo de las respuestas', ('ruta', 'metodo'), BUCKETS_BYTES)
+m_sql_conteo = registro.histograma(
+    'db_statements_per_request', 'Sentencias SQL por petición', ('ruta',), BUCKETS_CONTEO)
+m_sql_tiempo = registro.histograma(
+    'db_request_sql_seconds', 'Tiempo total en SQL por petición', ('ruta',))
+m_sql_lentas = registro.contador(
+    'db_slow_queries_total', 'Sentencias SQL más lentas que SQL_LENTA_MS', ('ruta',))
+m_idempotentes = registro.contador(
+    'http_idempotent_replays_total', 'POST respondidos desde el almacén de idempotencia', ('ruta',))
+m_espera_pool = registro.histograma(
+    'db_pool_checkout_wait_seconds', 'Tiempo desde el inicio de la petición hasta su primera conexión del pool',
+    ('engine',))
+m_pool_apertura = registro.histograma(
+    'db_pool_connect_seconds', 'Tiempo para abrir una conexión nueva del pool', ('engine',))
+m_pool_uso = registro.histograma(
+    'db_pool_checkout_seconds', 'Tiempo que cada checkout retiene una conexión del pool', ('engine',))
+registro.gauge(
+    'db_pool_checked_out', 'Conexiones del pool en uso',
+    lambda: _en_uso(),
+    ('engine',))
+
+def _ruta_actual():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return 'sin_ruta'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _sql_inicio(conn, cursor, statement, parameters, context, executemany):
+    context._metricas_inicio = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _sql_fin(conn, cursor, statement, parameters, context, executemany):
+    duracion = time.perf_counter() - context._metricas_inicio
+    if has_request_context():
+        g.sql_conteo = g.get('sql_conteo', 0) + 1
+        g.sql_tiempo = g.get('sql_tiempo', 0.0) + duracion
+    if has_app_context() and duracion * 1000 >= current_app.config['SQL_LENTA_MS']:
+        ruta = _ruta_actual()
+        m_sql_lentas.inc(ruta=ruta)
+        current_app.logger.warning('SQL lenta (%.1f ms) en %s: %s',
+                           duracion * 1000, ruta, ' '.join(statement.split())[:1000])
+
+def _medir_pool(nombre, engine):
+    # Eventos públicos del pool: engine.dispose() crea un pool nuevo que se mide aparte
+    pool = engine.pool
+    if pool in _pools_medidos:
+        return
+    _pools_medidos[pool] = nombre
+    if engine not in _engines_medidos:
+        _engines_medidos.add(engine)
+
+        @event.listens_for(engine, 'do_connect')
+        def _abriendo(dialect, registro_conexion, cargs, cparams):
+            registro_conexion.info['_metricas_apertura'] = time.perf_counter()
+
+    @event.listens_for(pool, 'connect')
+    def _abierta(conexion, registro_conexion):
+        inicio = registro_conexion.info.pop('_metricas_apertura', None)
+        if inicio is not None:
+            m_pool_apertura.observar(time.perf_counter() - inicio, engine=nombre)
+
+    @event.listens_for(pool, 'checkout')
+    def _retirada(conexion, registro_conexion, proxy):
+        ahora = registro_conexion.info['_metricas_checkout'] = time.perf_counter()
+        if has_request_context() and 'inicio' in g:
+            medidos = g.setdefault('pool_medidos', set())
+            if nombre not in medidos:
+                medidos.add(nombre)
+                m_espera_pool.observar(ahora - g.inicio, engine=nombre)
+
+    @event.listens_for(pool, 'checkin')
+    def _devuelta(conexion, registro_conexion):
+        inicio = registro_conexion.info.pop('_metricas_checkout', None)
+        if inicio is not None:
+            m_pool_uso.observar(time.perf_counter() - inicio, engine=nombre)
+
+def _en_uso():
+    # Sin contexto de app: el volcado de métricas puede correr en un hilo aparte
+    en_uso = defaultdict(int)
+    for pool, nombre in list(_pools_medidos.items()):
+        if hasattr(pool, 'checkedout'):
+            en_uso[(nombre,)] += pool.checkedout()
+    return en_uso
+
+_pools_medidos = weakref.WeakKeyDictionary()
+_engines_medidos = weakref.WeakSet()
+
+
+@bp_sistema.before_app_request
+def _iniciar_medicion():
+    g.inicio = time.perf_counter()
+    registro.iniciar(current_app.config['METRICAS_DIR'])
+    for nombre, engine in db.engines.items():
+        _medir_pool(nombre or 'primaria', engine)
+
+@bp_sistema.after_app_request
+def _registrar_metricas(respuesta):
+    if 'inicio' not in g:
+        return respuesta
+    duracion = time.perf_counter() - g.inicio
+    ruta, metodo = _ruta_actual(), request.method
+    sql_conteo, sql_tiempo = g.get('sql_conteo', 0), g.get('sql_tiempo', 0.0)
+    m_duracion.observar(duracion, ruta=ruta, metodo=metodo, status=respuesta.status_code)
+    if respuesta.content_length is not None:
+        m_tamano.observar(respuesta.content_length, ruta=ruta, metodo=metodo)
+    m_sql_conteo.observar(sql_conteo, ruta=ruta)
+    m_sql_tiempo.observar(sql_tiempo, ruta=ruta)
+    if current_app.config['SERVER_TIMING']:
+        respuesta.headers['Server-Timing'] = (
+            f'app;dur={duracion * 1000:.1f}, '
+            f'db;dur={sql_tiempo * 1000:.1f};desc="{sql_conteo} consultas"')
+    return respuesta
+
+@bp_sistema.before_app_request
+def _rutear_lecturas():
+    # Los GET leen de la réplica salvo que pidan X-Consistencia: fuerte
+    if ('replica' in current_app.config.get('SQLALCHEMY_BINDS', {})
+            and request.method in ('GET', 'HEAD')
+            and request.headers.get('X-Consistencia') != 'fuerte'):
+        db.session.info['replica'] = True
+
+# Las tablas de TABLAS_AUXILIARES se crean, si faltan, con la primera petición
+_esquema_listo = False
+_esquema_lock = threading.Lock()
+
+@bp_sistema.before_app_request
+def _asegurar_tablas_auxiliares():
+    global _esquema_listo
+    if _esquema_listo:
+        return
+    with _esquema_lock:
+        if not _esquema_listo:
+            db.metadata.create_all(db.engine, tables=TABLAS_AUXILIARES)
+            _esquema_listo = True
+
+
+# Idempotencia de POST
+#
+# Con Idempotency-Key, la primera respuesta de un POST (salvo un 5xx) se guarda
+# por ruta y clave durante IDEMPOTENCIA_TTL; un reintento con la misma clave la
+# recibe sin volver a ejecutar la vista. Mientras la primera sigue en curso el
+# reintento recibe 409 y reutilizar la clave con otro cuerpo da 422. Las claves
+# se guardan en un archivo SQLite que comparten todos los workers del host (el
+# de la cola de tareas), así un reintento que atiende otro worker también las ve.
+@bp_sistema.before_app_request
+def _repetir_idempotente():
+    clave = request.headers.get('Idempotency-Key')
+    if request.method != 'POST' or not clave:
+        return None
+    if len(clave) > 255:
+        return jsonify({'error': 'Idempotency-Key no puede superar 255 caracteres'}), 400
+    clave = (request.path, clave)
+    huella = hashlib.sha256(request.get_data()).hexdigest()
+    if respuestas_idempotentes.agregar(clave, (huella, None), current_app.config['IDEMPOTENCIA_EN_CURSO']):
+        g.idempotencia = clave
+        g.idempotencia_huella = huella
+        return None
+
+    guardada = respuestas_idempotentes.get(clave)
+    if guardada is not None and guardada[0] != huella:
+        return jsonify({'error': 'Idempotency-Key ya usada con otro cuerpo'}), 422
+    if guardada is None or guardada[1] is None:
+        return jsonify({'error': 'La petición original con esta Idempotency-Key sigue en curso'}), 409
+    datos, status, encabezados = guardada[1]
+    m_idempotentes.inc(ruta=_ruta_actual())
+    respuesta = current_app.response_class(datos, status=status, headers=encabezados)
+    respuesta.headers['Idempotent-Replayed'] = 'true'
+    return respuesta
+
+@bp_sistema.after_app_request
+def _guardar_idempotente(respuesta):
+    clave = g.pop('idempotencia', None)
+    if clave is None:
+        return respuesta
+    if respuesta.status_code >= 500 or respuesta.is_streamed:
+        respuestas_idempotentes.eliminar(clave)  # el cliente puede reintentar de verdad
+    else:
+        respuestas_idempotentes.set(clave, (g.idempotencia_huella, (
+            respuesta.get_data(), respuesta.status_code, list(respuesta.headers))),
+            current_app.config['IDEMPOTENCIA_TTL'])
+    return respuesta
+
+@bp_sistema.teardown_app_request
+def _liberar_idempotente(error=None):
+    # Solo queda la reserva si la vista lanzó una excepción sin manejar
+    clave = g.pop('idempotencia', None)
+    if clave is not None:
+        respuestas_idempotentes.eliminar(clave)
+
+
+# Los hilos de la cola de tareas arrancan con la primera petición de cada proceso
+@bp_sistema.before_app_request
+def _iniciar_tareas():
+    cola.iniciar(current_app.config['TAREAS_HILOS'])
+
+
+@bp_sistema.route('/', methods=['GET'])
+def health_check():
+    try:
+        # Realiza una consulta simple para verificar la conexión a la base de datos
+        db.session.execute(text('SELECT 1'))  # Usar text() para la consulta
+        return jsonify({'message': 'API funcionando sin errores'}), 200
+    except Exception as e:
+        return jsonify({'error': 'API no funcionando', 'details': str(e)}), 500
+
+
+# Tareas
+@bp_sistema.route('/tareas/estadisticas', methods=['GET'])
+def get_tareas_estadisticas():
+    try:
+        return jsonify(cola.estadisticas()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Salud
+@bp_sistema.route('/salud', methods=['GET'])
+def get_salud():
+    estado, ok = {}, True
+    for nombre, engine in db.engines.items():
+        nombre = nombre or 'primaria'
+        try:
+            with engine.connect() as conexion:
+                conexion.execute(text('SELECT 1'))
+            estado[nombre] = {'ok': True, 'pool': engine.pool.status()}
+        except SQLAlchemyError as e:
+            ok = False
+            estado[nombre] = {'ok': False, 'error': str(e)}
+    return jsonify(estado), 200 if ok else 503
+
+
+# Métricas en formato Prometheus
+@bp_sistema.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Caché
+@bp_sistema.route('/cache/estadisticas', methods=['GET'])
+def get_cache_estadisticas():
+    return jsonify(cache.estadisticas()), 200
+
+
+# Planes de ejecución
+#
+# planes(ruta) ejecuta la ruta con el cliente de pruebas, captura los SELECT que
+# emite (en cualquier engine: primaria o réplica) y devuelve el EXPLAIN de cada
+# uno en el mismo engine, marcando los que recorren una tabla completa. Sirve
+# para detectar a tiempo un índice que dejó de usarse. /debug/explain solo
+# ejecuta las rutas de RUTAS_EXPLAIN; el comando flask explain acepta otras.
+RUTAS_EXPLAIN = [
+    '/ordenes/cliente/1',
+    '/ordenes/cliente/1?sort=fecha',
+    '/ordenes/mesa/1',
+    '/ordenes?estado=pendiente,en_cocina&sort=fecha',
+    '/sesion_ordenes/1',
+    '/ordenes/1?expand=cliente,items.producto',
+]
+
+
+def _escaneo_completo(dialecto, plan):
+    if dialecto == 'sqlite':
+        return any(f['detail'].startswith('SCAN ') and ' USING ' not in f['detail'] for f in plan)
+    return any(f.get('type') == 'ALL' for f in plan)
+
+def planes(ruta):
+    """Devuelve el código de respuesta de ``ruta`` y el plan de cada SELECT que ejecutó."""
+    _captura.sentencias = []
+    try:
+        respuesta = current_app.test_client().get(ruta)
+    finally:
+        sentencias, _captura.sentencias = _captura.sentencias, None
+
+    nombres = {engine: nombre or 'primaria' for nombre, engine in db.engines.items()}
+    resultado = []
+    for engine, sql, parametros in sentencias:
+        dialecto = engine.dialect.name
+        prefijo = 'EXPLAIN QUERY PLAN ' if dialecto == 'sqlite' else 'EXPLAIN '
+        with engine.connect() as conexion:
+            plan = [dict(f) for f in conexion.exec_driver_sql(prefijo + sql, parametros).mappings()]
+        resultado.append({
+            'engine': nombres.get(engine, str(engine.url)),
+            'sql': sql,
+            'plan': plan,
+            'escaneo_completo': _escaneo_completo(dialecto, plan),
+        })
+    return respuesta.status_code, resultado
+
+@bp_sistema.route('/debug/explain', methods=['GET'])
+def get_explain():
+    if not current_app.config['DEBUG_EXPLAIN']:
+        return jsonify({'error': 'No encontrado'}), 404
+    try:
+        # Solo rutas de la lista: el endpoint no ejecuta peticiones arbitrarias
+        rutas = request.args.getlist('ruta') or RUTAS_EXPLAIN
+        desconocidas = [r for r in rutas if r not in RUTAS_EXPLAIN]
+        if desconocidas:
+            return jsonify({'error': 'Rutas fuera de RUTAS_EXPLAIN', 'rutas': desconocidas}), 400
+        resultado = []
+        for ruta in rutas:
+            status, consultas = planes(ruta)
+            resultado.append({'ruta': ruta, 'status': status, 'consultas': consultas})
+        return jsonify(resultado), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# Comandos de mantenimiento
+SESIONES_CHUNK = 100
+
+@bp_sistema.cli.command('migrar')
+@click.option('--hasta', type=int, help='Última versión a aplicar.')
+def migrar(hasta):
+    """Aplica las migraciones de esquema pendientes."""
+    nuevas = migraciones.aplicar(db.engine, db.metadata, hasta)
+    if nuevas:
+        click.echo('Aplicadas: ' + ', '.join(str(v) for v in nuevas))
+    else:
+        click.echo('El esquema está al día')
+
+@bp_sistema.cli.command('migraciones')
+def listar_migraciones():
+    """Muestra las migraciones aplicadas y pendientes."""
+    hechas = migraciones.aplicadas(db.engine)
+    for version, descripcion, _ in migraciones.MIGRACIONES:
+        estado = hechas[version].isoformat() if version in hechas else 'pendiente'
+        click.echo(f'{version:4d}  {estado:26}  {descripcion}')
+
+@bp_sistema.cli.command('explain')
+@click.argument('rutas', nargs=-1)
+def explain(rutas):
+    """Muestra el plan de las consultas de RUTAS (por defecto, las de RUTAS_EXPLAIN)."""
+    completos = 0
+    for ruta in rutas or RUTAS_EXPLAIN:
+        status, consultas = planes(ruta)
+        click.echo(f'{ruta} -> {status}')
+        for consulta in consultas:
+            marca = 'ESCANEO COMPLETO' if consulta['escaneo_completo'] else 'ok'
+            completos += consulta['escaneo_completo']
+            click.echo(f'  [{marca}] ({consulta["engine"]}) {" ".join(consulta["sql"].split())}')
+            for fila in consulta['plan']:
+                click.echo(f'      {json.dumps(fila, default=str)}')
+    if completos:
+        click.echo(f'{completos} consultas recorren una tabla completa')
+
+@bp_sistema.cli.command('tareas-drenar')
+def tareas_drenar():
+    """Aplica en este proceso todas las tareas disponibles de la cola."""
+    click.echo(f'{cola.drenar()} tareas procesadas')
+    click.echo(json.dumps(cola.estadisticas()))
+
+@bp_sistema.cli.command('recalcular-resumen')
+@click.option('--sesion', type=int, help='Recalcula solo esta sesión.')
+def recalcular_resumen(sesion):
+    """Reconstruye resumen_sesion desde ordenes, ordenes_productos y sesion_ordenes (y su archivo)."""
+    db.metadata.create_all(db.engine, tables=TABLAS_AUXILIARES)
+    if sesion is not None:
+        sesiones = [sesion]
+    else:
+        sesiones = db.session.execute(select(Sesion.id).order_by(Sesion.id)).scalars().all()
+
+    for inicio in range(0, len(sesiones), SESIONES_CHUNK):
+        chunk = sesiones[inicio:inicio + SESIONES_CHUNK]
+        agregados = _agregar_sql(
+            db.session, SesionOrdenes.sesion_id,
+            lambda stmt: stmt.join(SesionOrdenes, SesionOrdenes.orden_id == Ordenes.id),
+            SesionOrdenes.sesion_id.in_(chunk))
+        db.session.execute(delete(ResumenSesion).where(ResumenSesion.sesion_id.in_(chunk)))
+        if agregados:
+            db.session.execute(insert(ResumenSesion), [{
+                'sesion_id': s, 'dimension': d, 'clave': c,
+                'ordenes': v[0], 'cantidad': v[1], 'total': v[2]
+            } for (s, d, c), v in agregados.items()])
+        db.session.commit()
+        click.echo(f'Sesiones recalculadas: {min(inicio + SESIONES_CHUNK, len(sesiones))}/{len(sesiones)}')
+
+@bp_sistema.cli.command('recalcular-totales')
+@click.option('--desde', type=int, default=0, help='Revisa las órdenes con id mayor a este.')
+@click.option('--hasta', type=int, help='Último id a revisar (incluido).')
+@click.option('--solo-reportar', is_flag=True, help='Informa las diferencias sin corregirlas.')
+@click.option('--detalle', is_flag=True, help='Muestra cada orden con diferencia.')
+def recalcular_totales(desde, hasta, solo_reportar, detalle):
+    """Recalcula ordenes.total (líneas más impuesto_venta) por bloques de órdenes."""
+    revisadas = con_diferencia = corregidas = 0
+    diferencia_total = Decimal('0.00')
+    for bloque in revisar_totales(db.session, desde, hasta, corregir=not solo_reportar):
+        revisadas += bloque['revisadas']
+        con_diferencia += len(bloque['diferencias'])
+        corregidas += bloque['corregidas']
+        for d in bloque['diferencias']:
+            diferencia_total += d.calculado - (d.total or 0)
+            if detalle:
+                click.echo(f'  orden {d.id}: {d.total} -> {d.calculado}')
+        click.echo(f'Órdenes revisadas hasta el id {bloque["hasta"]}: {revisadas}, '
+                   f'con diferencia {con_diferencia}, corregidas {corregidas}')
+    click.echo(f'Diferencia total: {diferencia_total}')
+
+DIAS_CHUNK = 31
+
+@bp_sistema.cli.command('recalcular-ventas')
+@click.option('--desde', type=click.DateTime(), help='Primer día a recalcular.')
+@click.option('--hasta', type=click.DateTime(), help='Último día a recalcular (incluido).')
+def recalcular_ventas(desde, hasta):
+    """Reconstruye venta_hora desde ordenes y ordenes_productos (y su archivo), por bloques de días."""
+    db.metadata.create_all(db.engine, tables=TABLAS_AUXILIARES)
+    if desde is None or hasta is None:
+        rango = select(func.min(Ordenes.fecha), func.max(Ordenes.fecha))
+        fechas = [f for fila in _con_archivo(db.session, rango) for f in fila if f is not None]
+        if not fechas:
+            click.echo('No hay órdenes')
+            return
+        desde = desde or min(fechas)
+        hasta = hasta or max(fechas)
+    inicio = desde.replace(hour=0, minute=0, second=0, microsecond=0)
+    fin = hasta.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+    while inicio < fin:
+        corte = min(inicio + timedelta(days=DIAS_CHUNK), fin)
+        agregados = _agregar_sql(
+            db.session, _truncar_fecha(db.session, Ordenes.fecha, 'hora'), lambda stmt: stmt,
+            Ordenes.fecha >= inicio, Ordenes.fecha < corte)
+        db.session.execute(delete(VentaHora).where(VentaHora.hora >= inicio, VentaHora.hora < corte))
+        if agregados:
+            db.session.execute(insert(VentaHora), [{
+                'hora': datetime.fromisoformat(h), 'dimension': d, 'clave': c,
+                'ordenes': v[0], 'cantidad': v[1], 'total': v[2]
+            } for (h, d, c), v in agregados.items()])
+        db.session.commit()
+        click.echo(f'Ventas recalculadas hasta {corte:%Y-%m-%d}')
+        inicio = corte
+
+@bp_sistema.cli.command('archivar')
+@click.option('--dias', type=int, help='Edad mínima de las órdenes a archivar (por defecto ARCHIVO_DIAS).')
+@click.option('--lote', type=int, default=ARCHIVO_LOTE, show_default=True, help='Órdenes por transacción.')
+@click.option('--max-lotes', type=int, help='Se detiene después de tantos lotes; al volver a correrlo retoma.')
+def archivar(dias, lote, max_lotes):
+    """Mueve a las tablas de archivo las órdenes cerradas más antiguas que --dias."""
+    db.metadata.create_all(db.engine, tables=TABLAS_AUXILIARES)
+    dias = current_app.config['ARCHIVO_DIAS'] if dias is None else dias
+    corte = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=dias)
+    archivadas = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        movidas = archivar_lote(db.session, corte, lote)
+        if not movidas:
+            break
+        archivadas += movidas
+        lotes += 1
+        click.echo(f'Lote {lotes}: {archivadas} órdenes archivadas')
+    click.echo(f'Órdenes archivadas: {archivadas} (anteriores a {corte:%Y-%m-%d %H:%M})')
@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, request
+
+from comun import CAMPOS_VALORACION, ParametroInvalido, cola, condicional, listar
+from modelos import Cliente, Valoraciones, db
+
+
+bp_valoraciones = Blueprint('valoraciones', __name__)
+
+
+# Valoraciones
+@bp_valoraciones.route('/valoraciones', methods=['GET', 'POST'])
+@condicional(Valoraciones)
+def manage_valoraciones():
+    try:
+        if request.method == 'GET':
+            return listar(CAMPOS_VALORACION, {'id': (Valoraciones.id,)})
+
+        if request.method == 'POST':
+            # Se valida aquí y se inserta desde la cola de tareas
+            data = request.get_json()
+            try:
+                valoracion = {
+                    'descripcion': data.get('descripcion'),
+                    'calificacion': int(data['calificacion']),
+                    'cliente_id': int(data['cliente_id']),
+                }
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'error': 'calificacion y cliente_id son requeridos y enteros'}), 400
+            if db.session.get(Cliente, valoracion['cliente_id']) is None:
+                return jsonify({'error': 'Cliente no encontrado'}), 400
+            clave = request.headers.get('Idempotency-Key')
+            nueva = cola.encolar('valoracion', valoracion,
+                                 idempotencia=f'valoracion:{clave}' if clave else None)
+            return jsonify({'message': 'Valoración recibida' if nueva else 'Valoración ya recibida'}), 202
+
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp_valoraciones.route('/valoraciones/<int:id>', methods=['PUT', 'DELETE'])
+def manage_valoracion(id):
+    try:
+        valoracion = Valoraciones.query.get_or_404(id)
+
+        if request.method == 'PUT':
+            data = request.get_json()
+            valoracion.descripcion = data.get('descripcion')
+            valoracion.calificacion = data['calificacion']
+            valoracion.cliente_id = data['cliente_id']
+            db.session.commit()
+            return jsonify({'message': 'Valoración actualizada'}), 200
+
+        if request.method == 'DELETE':
+            db.session.delete(valoracion)
+            db.session.commit()
+            return jsonify({'message': 'Valoración eliminada'}), 204
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,107 @@
+"""Serialización JSON de las respuestas.
+
+Los listados declaran sus campos como nombre -> columna; ``compilar`` elige una
+sola vez, al importar, el codificador de cada columna según su tipo:
+
+- Numeric (precios, totales, cantidades): texto con la escala de la columna ("7.00")
+- DateTime y Date: ISO 8601
+- el resto: tal cual
+
+El JSON se genera con orjson si está instalado y si no con el módulo json de la
+biblioteca estándar; ``JSON_BACKEND=json`` fuerza este último.
+``ProveedorJSON`` hace que ``jsonify`` use el mismo backend y las mismas reglas.
+"""
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Date, DateTime, Numeric
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+def codificar_valor(valor):
+    """Codificación de los tipos que JSON no conoce, para valores sin columna."""
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo no serializable: {type(valor).__name__}')
+
+
+class BackendJSON:
+    nombre = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=codificar_valor, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode()
+
+
+class BackendOrjson(BackendJSON):
+    nombre = 'orjson'
+
+    def dumps(self, obj):
+        return self.dumps_bytes(obj).decode()
+
+    def dumps_bytes(self, obj):
+        return orjson.dumps(obj, default=codificar_valor, option=orjson.OPT_NON_STR_KEYS)
+
+
+def elegir_backend(nombre=None):
+    if nombre not in (None, '', 'json', 'orjson'):
+        raise ValueError(f'Backend JSON desconocido: {nombre}')
+    if nombre != 'json' and orjson is not None:
+        return BackendOrjson()
+    if nombre == 'orjson':
+        raise ValueError('orjson no está instalado')
+    return BackendJSON()
+
+backend = elegir_backend(os.environ.get('JSON_BACKEND'))
+
+
+def _isoformat(valor):
+    return valor.isoformat()
+
+def codificador(columna):
+    """Codificador de los valores de ``columna`` (``None`` si se emiten tal cual)."""
+    tipo = columna.type
+    if isinstance(tipo, Numeric):
+        return str if tipo.asdecimal else None
+    if isinstance(tipo, (DateTime, Date)):
+        return _isoformat
+    return None
+
+def compilar(columnas):
+    """Convierte {nombre: columna} en {nombre: (columna, codificador)}."""
+    return {nombre: (columna, codificador(columna)) for nombre, columna in columnas.items()}
+
+def filas_a_dicts(conversiones, filas):
+    """Arma un dict por fila; ``conversiones`` es [(nombre, codificador)] en el orden de la fila."""
+    nombres = [n for n, _ in conversiones]
+    codificadas = [(i, c) for i, (_, c) in enumerate(conversiones) if c is not None]
+    resultado = []
+    for fila in filas:
+        valores = list(fila[:len(nombres)])
+        for i, c in codificadas:
+            if valores[i] is not None:
+                valores[i] = c(valores[i])
+        resultado.append(dict(zip(nombres, valores)))
+    return resultado
+
+
+class ProveedorJSON(DefaultJSONProvider):
+    """Proveedor de Flask que serializa con ``backend`` y ``codificar_valor``."""
+
+    def dumps(self, obj, **kwargs):
+        return backend.dumps(obj)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(backend.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
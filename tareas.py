@@ -0,0 +1,217 @@
+"""Cola de tareas en segundo plano, durable, sobre un archivo SQLite local.
+
+Los efectos secundarios que no necesitan ocurrir dentro de la petición
+(contadores, valoraciones, auditoría) se encolan y un grupo de hilos los aplica
+por lotes: cada lote se agrupa por tipo y el manejador de ese tipo recibe la
+lista de datos, así puede combinarlos en pocas sentencias.
+
+- Durabilidad: la tarea queda en el archivo antes de responder; si el proceso
+  muere con una tarea tomada, vuelve a estar disponible al vencer su plazo.
+- Idempotencia: una ``idempotencia`` repetida no vuelve a encolar la tarea
+  mientras la anterior siga en el archivo (las hechas se retienen un día).
+- Reintentos: si un lote falla se reintenta cada tarea por separado; las que
+  siguen fallando esperan ``espera_base * 2**intentos`` segundos y después de
+  ``max_intentos`` quedan en estado ``fallida``.
+- ``drenar()`` procesa en el hilo actual todo lo disponible (pruebas, CLI).
+
+Varios procesos (workers de gunicorn) pueden compartir el archivo: la toma de
+tareas se hace dentro de ``BEGIN IMMEDIATE``.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    idempotencia TEXT UNIQUE,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    disponible REAL NOT NULL,
+    error TEXT,
+    creada REAL NOT NULL,
+    actualizada REAL
+);
+CREATE INDEX IF NOT EXISTS ix_tareas_estado ON tareas (estado, disponible);
+"""
+
+
+class Cola:
+    def __init__(self, ruta, contexto=None, max_intentos=5, espera_base=1.0,
+                 plazo=60.0, retener_hechas=86400):
+        self.ruta = ruta
+        self.contexto = contexto or nullcontext  # p. ej. app.app_context
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.plazo = plazo
+        self.retener_hechas = retener_hechas
+        self.manejadores = {}
+        self._local = threading.local()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilos = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._lotes = 0
+
+    def manejador(self, tipo):
+        """Registra ``fn(lista_de_datos)`` como manejador de las tareas de ``tipo``."""
+        def decorador(fn):
+            self.manejadores[tipo] = fn
+            return fn
+        return decorador
+
+    # Conexión por hilo (y por proceso, para sobrevivir al fork); crear_app puede cambiar la ruta
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid() or self._local.ruta != self.ruta:
+            directorio = os.path.dirname(self.ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.executescript(ESQUEMA)
+            self._local.conexion, self._local.pid, self._local.ruta = conexion, os.getpid(), self.ruta
+        return conexion
+
+    def encolar(self, tipo, datos, idempotencia=None):
+        """Guarda la tarea; devuelve False si ``idempotencia`` ya estaba encolada."""
+        if tipo not in self.manejadores:
+            raise ValueError(f'Tipo de tarea desconocido: {tipo}')
+        ahora = time.time()
+        cursor = self._conexion().execute(
+            'INSERT OR IGNORE INTO tareas (tipo, datos, idempotencia, disponible, creada) '
+            'VALUES (?, ?, ?, ?, ?)', (tipo, json.dumps(datos), idempotencia, ahora, ahora))
+        self._despertar.set()
+        return cursor.rowcount == 1
+
+    def _tomar(self, limite):
+        conexion = self._conexion()
+        ahora = time.time()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            filas = conexion.execute(
+                "SELECT id, tipo, datos, intentos FROM tareas "
+                "WHERE estado IN ('pendiente', 'tomada') AND disponible <= ? ORDER BY id LIMIT ?",
+                (ahora, limite)).fetchall()
+            if filas:
+                conexion.executemany(
+                    "UPDATE tareas SET estado = 'tomada', disponible = ?, actualizada = ? WHERE id = ?",
+                    [(ahora + self.plazo, ahora, f[0]) for f in filas])
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        return filas
+
+    def _completar(self, ids):
+        ahora = time.time()
+        self._conexion().executemany(
+            "UPDATE tareas SET estado = 'hecha', error = NULL, actualizada = ? WHERE id = ?",
+            [(ahora, i) for i in ids])
+
+    def _fallar(self, tarea, error):
+        id, tipo, _, intentos = tarea
+        intentos += 1
+        ahora = time.time()
+        if intentos >= self.max_intentos:
+            estado, disponible = 'fallida', ahora
+            logger.error('Tarea %s (%s) descartada tras %s intentos: %s', id, tipo, intentos, error)
+        else:
+            estado, disponible = 'pendiente', ahora + self.espera_base * 2 ** intentos
+        self._conexion().execute(
+            'UPDATE tareas SET estado = ?, intentos = ?, disponible = ?, error = ?, actualizada = ? '
+            'WHERE id = ?', (estado, intentos, disponible, str(error)[:1000], ahora, id))
+
+    def _purgar(self):
+        self._conexion().execute(
+            "DELETE FROM tareas WHERE estado = 'hecha' AND actualizada < ?",
+            (time.time() - self.retener_hechas,))
+
+    def procesar_lote(self, limite=500):
+        """Toma hasta ``limite`` tareas disponibles, las aplica y devuelve cuántas tomó."""
+        tareas = self._tomar(limite)
+        por_tipo = {}
+        for tarea in tareas:
+            por_tipo.setdefault(tarea[1], []).append(tarea)
+        for tipo, grupo in por_tipo.items():
+            manejador = self.manejadores.get(tipo)
+            if manejador is None:
+                for tarea in grupo:
+                    self._fallar(tarea, f'Sin manejador para {tipo}')
+                continue
+            try:
+                with self.contexto():
+                    manejador([json.loads(t[2]) for t in grupo])
+                self._completar([t[0] for t in grupo])
+            except Exception as e:
+                if len(grupo) == 1:
+                    self._fallar(grupo[0], e)
+                    continue
+                # Una tarea mala no debe frenar al resto del lote
+                for tarea in grupo:
+                    try:
+                        with self.contexto():
+                            manejador([json.loads(tarea[2])])
+                        self._completar([tarea[0]])
+                    except Exception as e_tarea:
+                        self._fallar(tarea, e_tarea)
+        self._lotes += 1
+        if self._lotes % 100 == 0:
+            self._purgar()
+        return len(tareas)
+
+    def drenar(self, limite=500):
+        """Procesa en este hilo todas las tareas disponibles y devuelve cuántas tomó."""
+        total = 0
+        while True:
+            tomadas = self.procesar_lote(limite)
+            if not tomadas:
+                return total
+            total += tomadas
+
+    def estadisticas(self):
+        filas = self._conexion().execute(
+            'SELECT estado, COUNT(*) FROM tareas GROUP BY estado').fetchall()
+        return {'hilos': len(self._hilos), **{estado: n for estado, n in filas}}
+
+    # Hilos de trabajo
+    def iniciar(self, hilos=1, intervalo=1.0):
+        """Arranca los hilos en este proceso (una vez por pid, para que sobrevivan al fork)."""
+        if hilos <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._detener.clear()
+            self._hilos = [threading.Thread(target=self._trabajar, args=(intervalo,), daemon=True)
+                           for _ in range(hilos)]
+            for hilo in self._hilos:
+                hilo.start()
+            self._pid = os.getpid()
+
+    def detener(self, timeout=5):
+        self._detener.set()
+        self._despertar.set()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+        self._pid = None
+
+    def _trabajar(self, intervalo):
+        while not self._detener.is_set():
+            try:
+                if self.procesar_lote():
+                    continue
+            except Exception:
+                logger.exception('Error procesando la cola de tareas')
+            self._despertar.wait(intervalo)
+            self._despertar.clear()
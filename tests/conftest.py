@@ -0,0 +1,132 @@
+"""App sobre una base SQLite temporal, con un catálogo mínimo y la cola sin hilos."""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api  # noqa: E402
+import comun  # noqa: E402
+import rutas.sistema  # noqa: E402
+from modelos import Categoria, Cliente, Mesas, Mesero, Ordenes, OrdenesProductos, Productos, db  # noqa: E402
+from rutas.mesas import salon  # noqa: E402
+from rutas.ordenes import ordenes_activas  # noqa: E402
+from rutas.productos import busqueda_productos  # noqa: E402
+
+
+def _reiniciar_estado():
+    # Los módulos guardan estado por proceso (versiones, modelos en memoria): cada
+    # prueba arranca con una base nueva y sus versiones vuelven a empezar
+    for memo in comun._versiones.values():
+        memo.clear()
+    comun._limites_archivo.clear()
+    ordenes_activas.limpiar()
+    salon.limpiar()
+    busqueda_productos.version = None
+    rutas.sistema._esquema_listo = False
+
+
+def _sembrar():
+    conexion = db.session
+    conexion.execute(insert(Categoria), [{'id': 1, 'nombre': 'Bebidas'}])
+    conexion.execute(insert(Productos), [
+        {'id': 1, 'nombre': 'Limonada', 'precio_venta': Decimal('10.00'), 'impuesto_venta': Decimal('19'),
+         'categoria_id': 1, 'referencia': 'LIM'},
+        {'id': 2, 'nombre': 'Agua', 'precio_venta': Decimal('5.00'), 'impuesto_venta': Decimal('0'),
+         'categoria_id': 1, 'referencia': 'AGU'},
+    ])
+    conexion.execute(insert(Cliente), [
+        {'id': 1, 'nombre': 'Ana', 'cedula': '100', 'telefono': '3001', 'nro_ordenes': 0},
+        {'id': 2, 'nombre': 'Luis', 'cedula': '200', 'telefono': '3002', 'nro_ordenes': 0},
+    ])
+    conexion.execute(insert(Mesero), [{'id': 1, 'nombre': 'Marta'}])
+    conexion.execute(insert(Mesas), [
+        {'id': 1, 'numero': 1, 'capacidad': 4, 'estado': 'libre'},
+        {'id': 2, 'numero': 2, 'capacidad': 2, 'estado': 'libre'},
+    ])
+    conexion.commit()
+
+
+def _crear_app(tmp_path, **config):
+    app = api.crear_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "pos.sqlite"}',
+        'TAREAS_DB': str(tmp_path / 'tareas.sqlite'),
+        'TAREAS_HILOS': 0,
+        'BUSQUEDA_PRECARGAR': False,
+        'SALON_PRECARGAR': False,
+        'VERSION_TTL': 0,
+        **config,
+    })
+    _reiniciar_estado()
+    with app.app_context():
+        db.create_all(bind_key=None)
+        _sembrar()
+    return app
+
+
+def _cerrar(app):
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # Flask-SQLAlchemy guarda un MetaData por bind en la extensión, compartida entre apps
+    for clave in list(db.metadatas):
+        if clave is not None:
+            del db.metadatas[clave]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = _crear_app(tmp_path)
+    yield app
+    _cerrar(app)
+
+
+@pytest.fixture
+def app_replica(tmp_path):
+    """App con una réplica en otro archivo SQLite, con el esquema pero sin datos."""
+    app = _crear_app(tmp_path, SQLALCHEMY_BINDS={'replica': f'sqlite:///{tmp_path / "replica.sqlite"}'})
+    with app.app_context():
+        db.metadata.create_all(db.engines['replica'])
+    yield app
+    _cerrar(app)
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def crear_orden(cliente):
+    """POST /ordenes/completa con un producto; devuelve el JSON de la respuesta."""
+    def crear(productos=((1, 2),), cliente_id=1, estado='pendiente', **extra):
+        respuesta = cliente.post('/ordenes/completa', json={
+            'cliente_id': cliente_id, 'estado': estado, 'mesero_id': 1, 'mesa': '1', **extra,
+            'productos': [{'producto_id': p, 'cantidad': c} for p, c in productos]})
+        assert respuesta.status_code == 201, respuesta.json
+        return respuesta.json
+    return crear
+
+
+@pytest.fixture
+def ordenes_antiguas(app):
+    """Inserta ``n`` órdenes pagadas de hace 100 días, con una línea cada una."""
+    def insertar(n, cliente_id=1):
+        fecha = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=100)
+        with app.app_context():
+            ids = []
+            for i in range(n):
+                ids.append(db.session.execute(insert(Ordenes).values(
+                    cliente_id=cliente_id, total=Decimal('5.00'), mesa='2', estado='pagada', mesero_id=1,
+                    fecha=fecha + timedelta(minutes=i))).inserted_primary_key[0])
+            db.session.execute(insert(OrdenesProductos), [{
+                'orden_id': id, 'producto_id': 2, 'producto_precio': Decimal('5.00'),
+                'cantidad': Decimal('1'), 'orden_producto_total': Decimal('5.00')} for id in ids])
+            db.session.commit()
+        return ids
+    return insertar
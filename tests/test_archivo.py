@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+import comun
+from modelos import ORDENES_ARCHIVO, ORDENES_PRODUCTOS_ARCHIVO, Ordenes, db
+
+
+@pytest.fixture
+def archivadas(app, ordenes_antiguas, crear_orden):
+    """Tres órdenes archivadas y dos activas; devuelve (ids archivados, ids activos)."""
+    viejas = ordenes_antiguas(3)
+    nuevas = [crear_orden()['id'], crear_orden()['id']]
+    resultado = app.test_cli_runner().invoke(args=['archivar', '--dias', '30'])
+    assert resultado.exit_code == 0, resultado.output
+    assert 'Órdenes archivadas: 3' in resultado.output
+    return viejas, nuevas
+
+
+def test_archivar_mueve_las_ordenes_cerradas(app, archivadas):
+    viejas, nuevas = archivadas
+    with app.app_context():
+        activas = db.session.scalars(select(Ordenes.id)).all()
+        en_archivo = db.session.scalars(select(ORDENES_ARCHIVO.c.id)).all()
+        lineas = db.session.scalars(select(ORDENES_PRODUCTOS_ARCHIVO.c.orden_id)).all()
+    assert sorted(activas) == nuevas
+    assert sorted(en_archivo) == viejas
+    assert sorted(lineas) == viejas
+
+
+def test_listados_suman_el_archivo(cliente, archivadas):
+    viejas, nuevas = archivadas
+    for url in ('/ordenes?limit=10', '/ordenes/cliente/1?limit=10', '/ordenes?sort=-fecha&limit=10'):
+        respuesta = cliente.get(url)
+        assert respuesta.status_code == 200
+        assert sorted(o['id'] for o in respuesta.json) == viejas + nuevas
+
+
+def test_paginacion_cruza_activas_y_archivo(cliente, archivadas):
+    viejas, nuevas = archivadas
+    vistos, url = [], '/ordenes?sort=-id&limit=2'
+    while url:
+        respuesta = cliente.get(url)
+        vistos += [o['id'] for o in respuesta.json]
+        cursor = respuesta.headers.get('X-Next-Cursor')
+        url = cursor and f'/ordenes?sort=-id&limit=2&after={cursor}'
+    assert vistos == sorted(viejas + nuevas, reverse=True)
+
+
+def test_expand_con_archivo(cliente, archivadas):
+    viejas, nuevas = archivadas
+    respuesta = cliente.get('/ordenes/cliente/1?expand=cliente&limit=10')
+    assert respuesta.status_code == 200
+    ordenes = {o['id']: o for o in respuesta.json}
+    assert sorted(ordenes) == viejas + nuevas
+    # Las activas traen la expansión; las archivadas salen con sus campos simples
+    assert all(ordenes[id]['cliente']['nombre'] == 'Ana' for id in nuevas)
+    assert all('cliente' not in ordenes[id] and ordenes[id]['total'] is not None for id in viejas)
+
+
+def test_detalle_de_orden_archivada(cliente, archivadas):
+    viejas, _ = archivadas
+    respuesta = cliente.get(f'/ordenes/{viejas[0]}')
+    assert respuesta.status_code == 200
+    assert respuesta.json['id'] == viejas[0] and respuesta.json['estado'] == 'pagada'
+    assert cliente.get(f'/ordenes/{viejas[0]}?expand=cliente').status_code == 200
+    assert cliente.get('/ordenes/999').status_code == 404
+
+
+def test_necesita_archivo(app, archivadas):
+    with app.test_request_context():
+        limite = comun.limite_archivo()
+        assert limite.orden_id == max(archivadas[0])
+        assert not comun.necesita_archivo(limite, datetime.now())
+        assert comun.necesita_archivo(limite, None)
+        assert comun.necesita_archivo(limite, limite.fecha)
+        assert not comun.necesita_archivo(limite, None, ['pendiente', 'en_cocina'])
+        assert not comun.necesita_archivo(None, None)
+
+
+def test_listados_por_cliente_y_mesa_con_rango(cliente, archivadas, monkeypatch):
+    viejas, nuevas = archivadas
+    assert sorted(o['id'] for o in cliente.get('/ordenes/mesa/2?limit=10').json) == viejas
+
+    consultas = []
+    en_archivo = comun._en_archivo
+    monkeypatch.setattr(comun, '_en_archivo', lambda stmt: consultas.append(stmt) or en_archivo(stmt))
+    hoy = datetime.now(timezone.utc).date().isoformat()
+    assert sorted(o['id'] for o in cliente.get(f'/ordenes/cliente/1?desde={hoy}&limit=10').json) == nuevas
+    assert cliente.get(f'/ordenes/mesa/2?desde={hoy}').json == []
+    assert consultas == []  # desde posterior al archivo: no se lee
+    assert cliente.get(f'/ordenes/mesa/2?hasta={hoy}&limit=10').status_code == 200
+    assert consultas
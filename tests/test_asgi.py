@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+from flask import jsonify
+
+import asgi
+from modelos import db
+from rutas.sistema import m_duracion, m_sql_conteo
+
+
+def _get(app_asgi, url, encabezados=()):
+    """GET por la ruta nativa de AppASGI: (atendida, status, cuerpo)."""
+    ruta, _, consulta = url.partition('?')
+    scope = {'type': 'http', 'method': 'GET', 'path': ruta, 'query_string': consulta.encode(),
+             'headers': [(k.lower().encode(), v.encode()) for k, v in encabezados]}
+    enviados = []
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    regla, argumentos = app_asgi.app.url_map.bind('').match(ruta, 'GET', return_rule=True)
+    atendida = asyncio.run(app_asgi._listado(scope, send, regla, argumentos))
+    if not atendida:
+        return False, None, None
+    cuerpo = b''.join(m.get('body', b'') for m in enviados)
+    return True, enviados[0]['status'], json.loads(cuerpo) if cuerpo else None
+
+
+@pytest.fixture
+def app_asgi(app_replica, monkeypatch):
+    with app_replica.app_context():
+        urls = {nombre or 'primaria': engine.url.render_as_string(hide_password=False)
+                for nombre, engine in db.engines.items()}
+    engines = {origen: asgi.crear_engine_async(url) for origen, url in urls.items()}
+    monkeypatch.setattr(asgi, 'sesiones', {origen: asgi.async_sessionmaker(engine, expire_on_commit=False)
+                                           for origen, engine in engines.items()})
+    app_replica.test_client().get('/clientes')  # crea las tablas auxiliares
+    yield asgi.AppASGI(app_replica, 2)
+    for engine in engines.values():
+        asyncio.run(engine.dispose())
+
+
+def test_listado_nativo_usa_el_ruteo_de_lecturas(app_replica, app_asgi):
+    respuesta = app_replica.test_client().post('/ordenes/completa', json={
+        'cliente_id': 1, 'estado': 'pendiente', 'mesero_id': 1, 'mesa': '1',
+        'productos': [{'producto_id': 1, 'cantidad': 1}]})
+    assert respuesta.status_code == 201
+    # La réplica de la prueba no recibe lo escrito en la primaria
+    assert _get(app_asgi, '/ordenes/cliente/1') == (True, 200, [])
+    atendida, status, ordenes = _get(app_asgi, '/ordenes/cliente/1', [('X-Consistencia', 'fuerte')])
+    assert (atendida, status, [o['id'] for o in ordenes]) == (True, 200, [respuesta.json['id']])
+
+
+def test_listado_nativo_pasa_por_los_hooks(app_replica, app_asgi):
+    ruta = '/ordenes/mesa/<int:id>'
+    conteo = m_duracion.estado().get((ruta, 'GET', 200), [0])[-1]
+    sentencias = m_sql_conteo.estado().get((ruta,), [0, 0])[-2]
+    assert _get(app_asgi, '/ordenes/mesa/1')[:2] == (True, 200)
+    # Una sola observación, la de _registrar_metricas, con las sentencias del engine async
+    assert m_duracion.estado()[(ruta, 'GET', 200)][-1] == conteo + 1
+    assert m_sql_conteo.estado()[(ruta,)][-2] > sentencias
+
+    app_replica.before_request_funcs.setdefault(None, []).append(lambda: (jsonify({'error': 'cerrado'}), 503))
+    assert _get(app_asgi, '/ordenes/mesa/1') == (True, 503, {'error': 'cerrado'})
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from modelos import Productos, db
+
+LIMONADA = {'nombre': 'Limonada', 'precio_venta': '12.50', 'impuesto_venta': 19, 'impuesto_compra': 0,
+            'categoria_id': 1, 'referencia': 'LIM'}
+
+
+def test_crea_actualiza_y_reporta_errores_por_fila(cliente):
+    respuesta = cliente.post('/categorias/batch', json=[
+        {'id': 1, 'nombre': 'Refrescos'}, {'nombre': 'Postres'}, {'nombre': None}, 'no es objeto'])
+    assert respuesta.status_code == 200
+    cuerpo = respuesta.json
+    assert (cuerpo['creados'], cuerpo['actualizados'], cuerpo['errores']) == (1, 1, 2)
+    assert [r['estado'] for r in cuerpo['resultados']] == ['actualizado', 'creado', 'error', 'error']
+    nombres = {c['id']: c['nombre'] for c in cliente.get('/categorias').json}
+    assert nombres[1] == 'Refrescos' and nombres[cuerpo['resultados'][1]['id']] == 'Postres'
+
+
+def test_fila_rechazada_por_la_base_no_descarta_el_chunk(app, cliente):
+    with app.app_context():
+        db.session.execute(text(
+            "CREATE TRIGGER rechazar BEFORE INSERT ON categoria WHEN NEW.nombre = 'malo' "
+            "BEGIN SELECT RAISE(ABORT, 'rechazada'); END"))
+        db.session.commit()
+    cuerpo = cliente.post('/categorias/batch', json=[{'nombre': 'Postres'}, {'nombre': 'malo'}, {'nombre': 'Sopas'}]).json
+    assert [r['estado'] for r in cuerpo['resultados']] == ['creado', 'error', 'creado']
+    assert 'rechazada' in cuerpo['resultados'][1]['error']
+    assert {c['nombre'] for c in cliente.get('/categorias').json} == {'Bebidas', 'Postres', 'Sopas'}
+
+
+def test_opcionales_ausentes_no_se_modifican(app, cliente):
+    with app.app_context():
+        db.session.get(Productos, 1).link_imagen = 'http://img/limonada.png'
+        db.session.commit()
+    cuerpo = cliente.post('/productos/batch', json=[{'id': 1, **LIMONADA}]).json
+    assert cuerpo['actualizados'] == 1
+    with app.app_context():
+        producto = db.session.get(Productos, 1)
+        assert (producto.precio_venta, producto.link_imagen) == (Decimal('12.50'), 'http://img/limonada.png')
+
+
+def test_cuerpo_que_no_es_arreglo(cliente):
+    assert cliente.post('/clientes/batch', json={'nombre': 'Ana'}).status_code == 400
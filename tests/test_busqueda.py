@@ -0,0 +1,59 @@
+from sqlalchemy import update
+
+from busqueda import IndiceTexto
+from modelos import Productos, VersionTabla, db
+
+PRODUCTO = {'nombre': 'Jugo de mora', 'precio_venta': '8.00', 'impuesto_venta': '19', 'impuesto_compra': '0',
+            'categoria_id': 1, 'referencia': 'MOR'}
+
+
+def _nombres(cliente, url):
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 200, respuesta.json
+    return [p['nombre'] for p in respuesta.json]
+
+
+def test_busca_por_prefijo_y_con_errores_de_tipeo(cliente):
+    assert _nombres(cliente, '/productos/buscar?q=lim') == ['Limonada']
+    assert _nombres(cliente, '/productos/buscar?q=LIMONADA')[0] == 'Limonada'
+    assert _nombres(cliente, '/productos/buscar?q=limonda')[0] == 'Limonada'
+    assert _nombres(cliente, '/productos/buscar?q=agu&categoria_id=1') == ['Agua']
+    assert _nombres(cliente, '/productos/buscar?q=agu&categoria_id=2') == []
+    assert cliente.get('/productos/buscar').status_code == 400
+    assert cliente.get('/productos/buscar?q=%20').status_code == 400
+
+
+def test_indice_se_actualiza_sin_reconstruir(cliente, monkeypatch):
+    assert _nombres(cliente, '/productos/buscar?q=lim') == ['Limonada']
+    cargas = []
+    cargar = IndiceTexto.cargar
+    monkeypatch.setattr(IndiceTexto, 'cargar', lambda self, docs: cargas.append(1) or cargar(self, docs))
+
+    assert cliente.post('/productos', json=PRODUCTO).status_code == 201
+    assert _nombres(cliente, '/productos/buscar?q=mora') == ['Jugo de mora']
+    assert cliente.put('/productos/1', json={**PRODUCTO, 'nombre': 'Limonada de coco', 'referencia': 'LIM'}).status_code == 200
+    assert _nombres(cliente, '/productos/buscar?q=coco') == ['Limonada de coco']
+    assert cliente.delete('/productos/2').status_code == 204
+    assert _nombres(cliente, '/productos/buscar?q=agua') == []
+    assert cargas == []
+
+
+def test_escrituras_masivas_y_de_otro_proceso_reconstruyen(app, cliente, monkeypatch):
+    assert _nombres(cliente, '/productos/buscar?q=lim') == ['Limonada']
+    cargas = []
+    cargar = IndiceTexto.cargar
+    monkeypatch.setattr(IndiceTexto, 'cargar', lambda self, docs: cargas.append(1) or cargar(self, docs))
+
+    lote = [{**PRODUCTO, 'id': 2, 'nombre': 'Agua con gas'}]
+    assert cliente.post('/productos/batch', json=lote).status_code == 200
+    assert _nombres(cliente, '/productos/buscar?q=gas') == ['Agua con gas']
+    assert len(cargas) == 1
+
+    # Otro worker escribe por su cuenta: el índice lo nota por la versión de la tabla
+    with app.app_context(), db.engine.begin() as conexion:
+        conexion.execute(update(Productos.__table__).where(Productos.id == 1).values(nombre='Naranjada'))
+        conexion.execute(update(VersionTabla.__table__)
+                         .where(VersionTabla.tabla == Productos.__tablename__)
+                         .values(version=VersionTabla.version + 1))
+    assert _nombres(cliente, '/productos/buscar?q=naranj') == ['Naranjada']
+    assert len(cargas) == 2
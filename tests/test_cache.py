@@ -0,0 +1,73 @@
+from sqlalchemy import update
+
+import api
+from cache import Cache, MemoriaLRU, SQLiteCompartido
+from modelos import Categoria, VersionTabla, db
+
+
+def test_lru_expulsa_la_menos_usada_y_vence_por_ttl():
+    lru = MemoriaLRU(max_entradas=2)
+    lru.set('a', 1, 30)
+    lru.set('b', 2, 30)
+    assert lru.get('a') == 1
+    lru.set('c', 3, 30)
+    assert (lru.get('a'), lru.get('b'), lru.get('c')) == (1, None, 3)
+    lru.set('d', 4, -1)
+    assert lru.get('d') is None
+
+
+def test_invalidar_por_etiqueta(tmp_path):
+    for backend in (MemoriaLRU(), SQLiteCompartido(str(tmp_path / 'cache.sqlite'))):
+        backend.set('productos', 1, 30, ('productos',))
+        backend.set('mixta', 2, 30, ('productos', 'categoria'))
+        backend.set('mesas', 3, 30, ('mesas',))
+        backend.invalidar('productos')
+        assert (backend.get('productos'), backend.get('mixta'), backend.get('mesas')) == (None, None, 3)
+
+
+def test_sqlite_compartido_entre_instancias(tmp_path):
+    ruta = str(tmp_path / 'cache.sqlite')
+    uno, otro = SQLiteCompartido(ruta), SQLiteCompartido(ruta)
+    uno.set('clave', {'x': 1}, 30, ('t',))
+    assert otro.get('clave') == {'x': 1}
+    otro.invalidar('t')
+    assert uno.get('clave') is None
+
+
+def test_no_guarda_lo_calculado_antes_de_una_invalidacion():
+    cache = Cache(MemoriaLRU())
+    generacion = cache.generacion(('productos',))
+    cache.invalidar('productos')  # otra petición escribió mientras se calculaba
+    cache.set('clave', 'viejo', ('productos',), generacion)
+    assert cache.get('clave') is None
+
+
+def test_escritura_invalida_el_listado(app, cliente):
+    cache = app.extensions['pos']['cache']
+    assert len(cliente.get('/categorias').json) == 1
+    hits = cache.hits
+    assert len(cliente.get('/categorias').json) == 1
+    assert cache.hits == hits + 1
+
+    assert cliente.post('/categorias', json={'nombre': 'Postres'}).status_code == 201
+    assert len(cliente.get('/categorias').json) == 2
+
+
+def test_escritura_de_otro_worker_cambia_la_clave(app, cliente):
+    assert cliente.get('/categorias').json[0]['nombre'] == 'Bebidas'
+    # Otro worker: cambia la fila y la versión de la tabla sin pasar por esta sesión ni su caché
+    with app.app_context(), db.engine.begin() as conexion:
+        conexion.execute(update(Categoria.__table__).where(Categoria.id == 1).values(nombre='Jugos'))
+        conexion.execute(update(VersionTabla.__table__).where(VersionTabla.tabla == 'categoria')
+                         .values(version=VersionTabla.__table__.c.version + 1))
+    assert cliente.get('/categorias').json[0]['nombre'] == 'Jugos'
+
+
+def test_cada_app_tiene_su_cache(app, cliente, tmp_path):
+    assert len(cliente.get('/categorias').json) == 1
+    otra = api.crear_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "otra.sqlite"}',
+                          'TAREAS_DB': str(tmp_path / 'otra_tareas.sqlite'), 'TAREAS_HILOS': 0})
+    assert otra.extensions['pos']['cache'] is not app.extensions['pos']['cache']
+    hits = app.extensions['pos']['cache'].hits
+    assert len(cliente.get('/categorias').json) == 1
+    assert app.extensions['pos']['cache'].hits == hits + 1
@@ -0,0 +1,88 @@
+from sqlalchemy import delete
+
+import comun
+from modelos import VersionTabla, db
+
+CLIENTE_ANA = {'nombre': 'Ana María', 'cedula': '100', 'telefono': '3001'}
+
+
+def test_listado_responde_304_hasta_que_cambia_la_tabla(cliente):
+    primera = cliente.get('/clientes')
+    etag = primera.headers['ETag']
+    assert etag.startswith('W/')
+    assert cliente.get('/clientes', headers={'If-None-Match': etag}).status_code == 304
+
+    assert cliente.put('/clientes/1', json=CLIENTE_ANA).status_code == 200
+    segunda = cliente.get('/clientes', headers={'If-None-Match': etag})
+    assert segunda.status_code == 200
+    assert segunda.headers['ETag'] != etag
+
+
+def test_expand_invalida_con_las_tablas_expandidas(cliente, crear_orden):
+    crear_orden()
+    url = '/ordenes?expand=cliente'
+    etag = cliente.get(url).headers['ETag']
+    assert cliente.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # Cambia solo el cliente: la orden no, pero la respuesta expandida sí
+    assert cliente.put('/clientes/1', json=CLIENTE_ANA).status_code == 200
+    respuesta = cliente.get(url, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.json[0]['cliente']['nombre'] == 'Ana María'
+
+
+def test_etag_de_la_orden_sirve_para_if_match(cliente, crear_orden):
+    id = crear_orden()['id']
+    respuesta = cliente.get(f'/ordenes/{id}')
+    etag = respuesta.headers['ETag']
+    assert not etag.startswith('W/')
+    assert etag == f'"r:{respuesta.json["version"]}"'
+    assert cliente.get(f'/ordenes/{id}', headers={'If-None-Match': etag}).status_code == 304
+
+    actualizada = cliente.put(f'/ordenes/{id}', json={'nota': 'sin hielo'}, headers={'If-Match': etag})
+    assert actualizada.status_code == 200
+    assert actualizada.headers['ETag'] != etag
+
+    # Con la versión vieja la escritura se rechaza
+    conflicto = cliente.put(f'/ordenes/{id}', json={'nota': 'con hielo'}, headers={'If-Match': etag})
+    assert conflicto.status_code == 409
+    assert cliente.get(f'/ordenes/{id}').json['nota'] == 'sin hielo'
+
+
+def test_etag_de_la_mesa_sirve_para_if_match(cliente):
+    etag = cliente.get('/mesas/1').headers['ETag']
+    assert not etag.startswith('W/')
+    respuesta = cliente.put('/mesas/1', json={'estado': 'ocupada'}, headers={'If-Match': etag})
+    assert respuesta.status_code == 200
+    assert cliente.put('/mesas/1', json={'estado': 'libre'}, headers={'If-Match': etag}).status_code == 409
+
+
+def test_etag_de_fila_no_coincide_con_el_de_la_tabla(app, cliente):
+    # Base migrada: filas en versión 1 y version_tabla vacía, así la tabla
+    # llega a la versión 1 con la primera escritura
+    with app.app_context():
+        db.session.execute(delete(VersionTabla))
+        db.session.commit()
+    comun._versiones['primaria'].clear()
+    etag = cliente.get('/mesas/1').headers['ETag']
+    assert cliente.put('/mesas/1', json={'estado': 'ocupada'}).status_code == 200
+    respuesta = cliente.get('/mesas/1', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.json['estado'] == 'ocupada'
+
+
+def test_if_match_acepta_la_version_sin_prefijo(cliente):
+    assert cliente.put('/mesas/1', json={'estado': 'ocupada'}, headers={'If-Match': '"1"'}).status_code == 200
+
+
+def test_orden_con_expand_usa_el_etag_de_las_tablas(cliente, crear_orden):
+    id = crear_orden()['id']
+    assert cliente.get(f'/ordenes/{id}?expand=cliente').headers['ETag'].startswith('W/')
+
+
+def test_put_sin_json_responde_400(cliente, crear_orden):
+    id = crear_orden()['id']
+    for url in (f'/ordenes/{id}', '/mesas/1'):
+        respuesta = cliente.put(url, data='estado=pagada', content_type='application/x-www-form-urlencoded')
+        assert respuesta.status_code == 400, url
+        assert cliente.put(url, data='no es json', content_type='application/json').status_code == 400
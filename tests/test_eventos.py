@@ -0,0 +1,73 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+
+from eventos import BrokerMemoria, BrokerSocketLocal
+
+
+def test_broker_reparte_por_topico():
+    broker = BrokerMemoria()
+    ordenes, mesas = broker.suscribir(['ordenes']), broker.suscribir(['mesas', 'ordenes'])
+    broker.publicar('mesas', {'id': 1})
+    broker.publicar('ordenes', {'id': 2})
+    assert ordenes.get(0)['datos'] == {'id': 2}
+    assert [mesas.get(0)['topico'], mesas.get(0)['topico']] == ['mesas', 'ordenes']
+    ordenes.cerrar()
+    assert broker.suscriptores == 1
+
+
+def test_suscripcion_llena_descarta_el_mas_viejo():
+    broker = BrokerMemoria()
+    suscripcion = broker.suscribir(['ordenes'])
+    for i in range(300):
+        broker.publicar('ordenes', {'n': i})
+    assert suscripcion.get(0)['datos'] == {'n': 300 - 256}
+    assert suscripcion.get(0.01) is not None
+
+
+def test_suscripcion_asincrona_recibe_desde_otro_hilo():
+    async def escuchar():
+        broker = BrokerMemoria()
+        suscripcion = broker.suscribir(['mesas'], asincrona=True)
+        threading.Thread(target=broker.publicar, args=('mesas', {'id': 3})).start()
+        return await suscripcion.get(timeout=1), await suscripcion.get(timeout=0.01)
+    evento, nada = asyncio.run(escuchar())
+    assert (evento['datos'], nada) == ({'id': 3}, None)
+
+
+def test_broker_socket_entrega_y_limpia_sockets_muertos(tmp_path):
+    # Socket de un worker que terminó sin borrar su archivo
+    muerto = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    muerto.bind(str(tmp_path / '999999.sock'))
+    muerto.close()
+
+    broker = BrokerSocketLocal(str(tmp_path))
+    try:
+        suscripcion = broker.suscribir(['ordenes'])
+        broker.publicar('ordenes', {'id': 7})
+        assert suscripcion.get(timeout=2)['datos'] == {'id': 7}
+        assert os.listdir(tmp_path) == [f'{os.getpid()}.sock']
+    finally:
+        broker.cerrar()
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_sse_de_ordenes(app, cliente, crear_orden):
+    app.config['EVENTOS_KEEPALIVE'] = 0.05
+    respuesta = cliente.get('/eventos?topicos=ordenes', buffered=False)
+    assert respuesta.mimetype == 'text/event-stream'
+    orden = crear_orden()
+    partes = iter(respuesta.response)
+    assert next(partes) == b'retry: 3000\n\n'
+    evento = next(partes).decode()
+    assert 'event: ordenes' in evento
+    datos = json.loads(evento.split('data: ', 1)[1])
+    assert (datos['accion'], datos['id']) == ('creada', orden['id'])
+    assert next(partes) == b': keepalive\n\n'
+    respuesta.close()
+
+
+def test_topicos_invalidos(cliente):
+    assert cliente.get('/eventos?topicos=ordenes,otros').status_code == 400
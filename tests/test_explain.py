@@ -0,0 +1,25 @@
+import pytest
+
+
+@pytest.fixture
+def app_explain(app_replica):
+    app_replica.config['DEBUG_EXPLAIN'] = True
+    return app_replica
+
+
+def test_explain_captura_en_la_replica(app_explain):
+    respuesta = app_explain.test_client().get('/debug/explain?ruta=/ordenes/cliente/1')
+    assert respuesta.status_code == 200
+    consultas = respuesta.json[0]['consultas']
+    assert consultas and {c['engine'] for c in consultas} == {'replica'}
+    assert all(c['plan'] for c in consultas)
+
+
+def test_explain_solo_rutas_de_la_lista(app_explain):
+    respuesta = app_explain.test_client().get('/debug/explain?ruta=/clientes')
+    assert respuesta.status_code == 400
+    assert respuesta.json['rutas'] == ['/clientes']
+
+
+def test_explain_deshabilitado(cliente):
+    assert cliente.get('/debug/explain').status_code == 404
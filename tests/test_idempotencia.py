@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from sqlalchemy import update
+
+import rutas.categorias
+from modelos import Cliente, OrdenesProductos, Productos, db
+
+
+def test_reenviar_una_linea_suma_la_cantidad(cliente, crear_orden):
+    id = crear_orden(productos=[(2, 1)])['id']
+    respuesta = cliente.post('/ordenes_productos', json={'orden_id': id, 'producto_id': 2, 'cantidad': 2})
+    assert respuesta.status_code == 201
+    assert (Decimal(respuesta.json['cantidad']), Decimal(respuesta.json['orden_producto_total'])) == (3, 15)
+    assert Decimal(respuesta.json['total_orden']) == Decimal('15.00')
+
+
+def test_la_linea_sumada_queda_al_precio_actual(app, cliente, crear_orden):
+    id = crear_orden(productos=[(2, 1)])['id']
+    with app.app_context():
+        db.session.execute(update(Productos).where(Productos.id == 2).values(precio_venta=6))
+        db.session.commit()
+    respuesta = cliente.post('/ordenes_productos', json={'orden_id': id, 'producto_id': 2, 'cantidad': 1})
+    assert Decimal(respuesta.json['orden_producto_total']) == Decimal('12.00')
+    linea = cliente.get(f'/ordenes_productos/{id}').json[0]
+    assert (Decimal(linea['producto_precio']), Decimal(linea['cantidad'])) == (6, 2)
+
+
+def test_linea_de_una_orden_inexistente(app, cliente):
+    respuesta = cliente.post('/ordenes_productos', json={'orden_id': 999, 'producto_id': 2, 'cantidad': 1})
+    assert respuesta.status_code == 404
+    with app.app_context():
+        assert db.session.query(OrdenesProductos).filter_by(orden_id=999).count() == 0
+
+
+def test_idempotency_key_repite_la_respuesta(app, cliente):
+    nuevo = {'nombre': 'Eva', 'cedula': '300', 'telefono': '3003'}
+    encabezados = {'Idempotency-Key': 'alta-eva'}
+    primera = cliente.post('/clientes', json=nuevo, headers=encabezados)
+    repetida = cliente.post('/clientes', json=nuevo, headers=encabezados)
+    assert primera.status_code == repetida.status_code == 201
+    assert repetida.headers['Idempotent-Replayed'] == 'true'
+    assert repetida.json == primera.json
+    assert cliente.post('/clientes', json={**nuevo, 'nombre': 'Otra'}, headers=encabezados).status_code == 422
+    with app.app_context():
+        assert db.session.query(Cliente).filter_by(cedula='300').count() == 1
+
+
+def test_reintento_de_una_linea_no_la_suma_dos_veces(cliente, crear_orden):
+    id = crear_orden(productos=[(2, 1)])['id']
+    linea = {'orden_id': id, 'producto_id': 2, 'cantidad': 1}
+    for _ in range(2):
+        respuesta = cliente.post('/ordenes_productos', json=linea, headers={'Idempotency-Key': 'linea-1'})
+        assert respuesta.status_code == 201
+    assert respuesta.headers['Idempotent-Replayed'] == 'true'
+    assert Decimal(cliente.get(f'/ordenes_productos/{id}').json[0]['cantidad']) == 2
+
+
+def test_misma_clave_en_otra_ruta_es_otra_peticion(cliente):
+    encabezados = {'Idempotency-Key': 'compartida'}
+    assert cliente.post('/categorias', json={'nombre': 'Postres'}, headers=encabezados).status_code == 201
+    otra = cliente.post('/meseros', json={'nombre': 'Raúl'}, headers=encabezados)
+    assert otra.status_code == 201 and 'Idempotent-Replayed' not in otra.headers
+
+
+def test_error_del_servidor_no_se_guarda(cliente, monkeypatch):
+    encabezados = {'Idempotency-Key': 'falla'}
+    monkeypatch.setattr(rutas.categorias, 'Categoria', None)
+    assert cliente.post('/categorias', json={'nombre': 'X'}, headers=encabezados).status_code == 500
+    monkeypatch.undo()
+    respuesta = cliente.post('/categorias', json={'nombre': 'X'}, headers=encabezados)
+    assert respuesta.status_code == 201 and 'Idempotent-Replayed' not in respuesta.headers
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+import rutas.sistema
+from metricas import Registro
+
+
+def _series(texto, nombre):
+    return [linea for linea in texto.splitlines() if linea.startswith(nombre)]
+
+
+def test_exportar_suma_los_procesos(tmp_path):
+    uno, otro = Registro(str(tmp_path)), Registro(str(tmp_path))
+    for registro, n in ((uno, 2), (otro, 3)):
+        registro.contador('pedidos_total', 'Pedidos', ('ruta',)).inc(n, ruta='/x')
+    otro.volcar()
+    # El segundo registro escribe con el mismo pid: se simula otro worker con otro archivo
+    assert _series(uno.exportar(), 'pedidos_total') == ['pedidos_total{ruta="/x"} 5']
+
+
+def test_el_hilo_vuelca_sin_peticiones(tmp_path):
+    registro = Registro(str(tmp_path), intervalo=0.05)
+    contador = registro.contador('eventos_total', 'Eventos')
+    registro.iniciar()
+    registro.iniciar()  # uno por proceso
+    contador.inc()
+    limite = time.monotonic() + 2
+    while not list(tmp_path.glob('*.json')) and time.monotonic() < limite:
+        time.sleep(0.01)
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+
+@pytest.fixture
+def metricas(app):
+    # Las métricas son del proceso: se comparan antes y después
+    def valor(nombre, **etiquetas):
+        texto = rutas.sistema.registro.exportar()
+        filtro = ','.join(f'{k}="{v}"' for k, v in etiquetas.items())
+        for linea in _series(texto, nombre):
+            if filtro in linea:
+                return float(linea.rsplit(' ', 1)[1])
+        return 0.0
+    return valor
+
+
+def test_peticiones_miden_duracion_sql_y_espera_del_pool(cliente, metricas):
+    antes = (metricas('http_request_duration_seconds_count', ruta='/clientes'),
+             metricas('db_pool_checkout_wait_seconds_count', engine='primaria'))
+    assert cliente.get('/clientes').status_code == 200
+    assert metricas('http_request_duration_seconds_count', ruta='/clientes') == antes[0] + 1
+    assert metricas('db_pool_checkout_wait_seconds_count', engine='primaria') == antes[1] + 1
+    assert metricas('db_statements_per_request_count', ruta='/clientes') >= 1
+
+
+def test_server_timing(app, cliente):
+    app.config['SERVER_TIMING'] = True
+    encabezado = cliente.get('/clientes').headers['Server-Timing']
+    assert encabezado.startswith('app;dur=') and 'consultas' in encabezado
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from sqlalchemy import insert, update
+
+from modelos import Categoria, Ordenes, db
+from rutas.ordenes import OrdenesActivas, ordenes_activas
+
+
+def test_total_con_impuesto_al_crear_y_agregar_lineas(cliente, crear_orden):
+    # 2 x 10.00 con 19 % de impuesto
+    orden = crear_orden(productos=[(1, 2)])
+    assert orden['total'] == '23.80'
+
+    respuesta = cliente.post('/ordenes_productos', json={
+        'orden_id': orden['id'], 'producto_id': 2, 'cantidad': 3, 'producto_precio': '1.00',
+        'orden_producto_total': '1.00'})  # precio y total de la línea los pone el servidor
+    assert respuesta.status_code == 201
+    assert Decimal(respuesta.json['orden_producto_total']) == Decimal('15.00')
+    assert Decimal(respuesta.json['total_orden']) == Decimal('38.80')
+
+    assert cliente.delete(f'/ordenes_productos/{orden["id"]}/1').status_code == 204
+    assert Decimal(cliente.get(f'/ordenes/{orden["id"]}').json['total']) == Decimal('15.00')
+
+
+def test_put_ignora_el_total_del_cliente(cliente, crear_orden):
+    id = crear_orden()['id']
+    orden = cliente.get(f'/ordenes/{id}').json
+    respuesta = cliente.put(f'/ordenes/{id}', json={**orden, 'total': '1.00', 'nota': 'para llevar'})
+    assert respuesta.status_code == 200
+    orden = cliente.get(f'/ordenes/{id}').json
+    assert (orden['total'], orden['nota']) == ('23.80', 'para llevar')
+
+
+def test_precio_de_la_linea_sale_del_producto(cliente, crear_orden):
+    id = crear_orden()['id']
+    respuesta = cliente.post('/ordenes_productos', json={'orden_id': id, 'producto_id': 2, 'cantidad': 2})
+    assert respuesta.status_code == 201
+    assert Decimal(respuesta.json['orden_producto_total']) == Decimal('10.00')
+    assert cliente.post('/ordenes_productos', json={
+        'orden_id': id, 'producto_id': 99, 'cantidad': 1}).status_code == 400
+
+
+def test_recalcular_informa_y_corrige_diferencias(app, cliente, crear_orden):
+    ids = [crear_orden()['id'] for _ in range(3)]
+    with app.app_context():
+        db.session.execute(update(Ordenes.__table__).where(Ordenes.id == ids[1]).values(total=1))
+        db.session.commit()
+
+    reporte = cliente.post('/ordenes/recalcular', json={'corregir': False}).json
+    assert (reporte['revisadas'], reporte['con_diferencia'], reporte['corregidas']) == (3, 1, 0)
+    assert reporte['diferencias'][0]['id'] == ids[1]
+    assert Decimal(reporte['diferencia_total']) == Decimal('22.80')
+
+    reporte = cliente.post('/ordenes/recalcular', json={}).json
+    assert (reporte['con_diferencia'], reporte['corregidas']) == (1, 1)
+    assert cliente.get(f'/ordenes/{ids[1]}').json['total'] == '23.80'
+    assert cliente.post('/ordenes/recalcular', json={}).json['con_diferencia'] == 0
+
+
+def test_recalcular_retoma_por_bloques(cliente, crear_orden):
+    ids = [crear_orden()['id'] for _ in range(3)]
+    primera = cliente.post('/ordenes/recalcular', json={'limite': 2}).json
+    assert (primera['revisadas'], primera['siguiente']) == (2, ids[1])
+    segunda = cliente.post('/ordenes/recalcular', json={'desde': primera['siguiente']}).json
+    assert (segunda['revisadas'], segunda['siguiente']) == (1, None)
+
+
+def test_paginacion_solo_con_limit(app, cliente):
+    with app.app_context():
+        db.session.execute(insert(Categoria), [{'nombre': f'Categoría {i}'} for i in range(15)])
+        db.session.commit()
+    todo = cliente.get('/categorias')
+    assert len(todo.json) == 16 and 'X-Next-Cursor' not in todo.headers
+
+    pagina = cliente.get('/categorias?limit=10')
+    assert len(pagina.json) == 10
+    siguiente = cliente.get(f'/categorias?limit=10&after={pagina.headers["X-Next-Cursor"]}')
+    assert len(siguiente.json) == 6 and 'X-Next-Cursor' not in siguiente.headers
+    assert len(cliente.get('/categorias?stream=ndjson').data.splitlines()) == 16
+
+
+def test_ordenes_activas_sin_recargar(app, cliente, crear_orden, monkeypatch):
+    crear_orden()
+    assert len(cliente.get('/ordenes/activas').json) == 1
+    recargas = []
+    recargar = OrdenesActivas._recargar
+    monkeypatch.setattr(OrdenesActivas, '_recargar',
+                        lambda self, version: recargas.append(version) or recargar(self, version))
+
+    # El INSERT Core de /ordenes/completa y el cambio de estado se aplican por id
+    nueva = crear_orden(productos=[(2, 1)])
+    assert cliente.put(f'/ordenes/{nueva["id"]}', json={'estado': 'en_cocina'}).status_code == 200
+    activas = {o['id']: o for o in cliente.get('/ordenes/activas').json}
+    assert recargas == []
+    assert activas[nueva['id']]['estado'] == 'en_cocina'
+    assert activas[nueva['id']]['total'] == '5.00'
+
+
+def test_ordenes_activas_recargan_tras_un_update_masivo(app, cliente, crear_orden):
+    id = crear_orden()['id']
+    assert [o['id'] for o in cliente.get('/ordenes/activas').json] == [id]
+    with app.app_context():
+        db.session.execute(update(Ordenes).values(estado='pagada'))
+        db.session.commit()
+    assert cliente.get('/ordenes/activas').json == []
+    assert ordenes_activas.version is not None
@@ -0,0 +1,49 @@
+from sqlalchemy import func, select
+
+import api
+import comun
+from modelos import Cliente, db
+
+LUIS = {'nombre': 'Luis Pérez', 'cedula': '200', 'telefono': '3002'}
+FUERTE = {'X-Consistencia': 'fuerte'}
+
+
+def test_get_lee_de_la_replica_salvo_consistencia_fuerte(app_replica):
+    cliente = app_replica.test_client()
+    # La réplica de la prueba tiene el esquema pero no los datos sembrados
+    assert cliente.get('/clientes').json == []
+    assert [c['id'] for c in cliente.get('/clientes', headers=FUERTE).json] == [1, 2]
+
+
+def test_escrituras_van_a_la_primaria(app_replica):
+    cliente = app_replica.test_client()
+    assert cliente.put('/clientes/2', json=LUIS).status_code == 200
+    assert cliente.get('/clientes/2', headers=FUERTE).json['nombre'] == 'Luis Pérez'
+    with app_replica.app_context(), db.engines['replica'].connect() as conexion:
+        assert conexion.execute(select(func.count()).select_from(Cliente)).scalar() == 0
+
+
+def test_versiones_por_origen(app_replica):
+    cliente = app_replica.test_client()
+    cliente.get('/clientes')
+    cliente.get('/clientes', headers=FUERTE)
+    # La réplica no tiene filas en version_tabla: sus versiones no se mezclan con las de la primaria
+    assert comun._versiones['replica']['cliente'][0] == 0
+    assert comun._versiones['primaria']['cliente'][0] > 0
+
+
+def test_salud_revisa_cada_engine(app_replica):
+    respuesta = app_replica.test_client().get('/salud')
+    assert respuesta.status_code == 200
+    assert set(respuesta.json) == {'primaria', 'replica'}
+    assert all(e['ok'] for e in respuesta.json.values())
+
+
+def test_opciones_del_pool(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_READ_TIMEOUT', '20')
+    opciones = api.opciones_engine('mysql+pymysql://u@db/pos')
+    assert (opciones['pool_size'], opciones['pool_pre_ping']) == (3, True)
+    assert opciones['connect_args'] == {'connect_timeout': 10, 'read_timeout': 20}
+    # SQLite no usa QueuePool: solo pre_ping, recycle y el timeout del driver
+    assert 'pool_size' not in api.opciones_engine('sqlite:///pos.sqlite')
@@ -0,0 +1,49 @@
+import pytest
+
+
+@pytest.fixture
+def recalcular(app):
+    def correr():
+        resultado = app.test_cli_runner().invoke(args=['recalcular-ventas'])
+        assert resultado.exit_code == 0, resultado.output
+    return correr
+
+
+def test_ventas_por_hora_con_deltas(cliente, crear_orden):
+    a = crear_orden(productos=[(1, 2)])['id']  # 23.80
+    crear_orden(productos=[(2, 1)])  # 5.00
+    assert cliente.get('/reportes/ventas?granularidad=hora').json[0]['total'] == '28.80'
+
+    assert cliente.post('/ordenes_productos', json={'orden_id': a, 'producto_id': 2, 'cantidad': 2}).status_code == 201
+    ventas = cliente.get('/reportes/ventas?granularidad=hora').json
+    assert len(ventas) == 1
+    assert (ventas[0]['ordenes'], ventas[0]['total'], ventas[0]['ticket_promedio']) == (2, '38.80', '19.40')
+
+
+def test_canceladas_no_cuentan(cliente, crear_orden, recalcular):
+    a = crear_orden(productos=[(1, 2)])['id']
+    crear_orden(productos=[(2, 1)])
+    crear_orden(productos=[(2, 4)], estado='cancelada')
+    assert cliente.put(f'/ordenes/{a}', json={'estado': 'cancelada'}).status_code == 200
+
+    def reportes():
+        return (cliente.get('/reportes/ventas').json,
+                cliente.get('/reportes/top-productos').json,
+                cliente.get('/reportes/meseros').json)
+    ventas, productos, meseros = reportes()
+    assert [(v['ordenes'], v['total']) for v in ventas] == [(1, '5.00')]
+    assert [(p['producto_id'], p['cantidad']) for p in productos] == [(2, '1.00')]
+    assert meseros == [{'mesero_id': 1, 'nombre': 'Marta', 'ordenes': 1, 'total': '5.00'}]
+
+    # Volver a pendiente devuelve su aporte; la reconstrucción coincide con los deltas
+    assert cliente.put(f'/ordenes/{a}', json={'estado': 'pendiente'}).status_code == 200
+    antes = reportes()
+    assert antes[0][0]['total'] == '28.80'
+    recalcular()
+    assert reportes() == antes
+
+
+def test_meseros_no_ordena_por_cantidad(cliente, crear_orden):
+    crear_orden()
+    assert cliente.get('/reportes/meseros?orden=cantidad').status_code == 400
+    assert cliente.get('/reportes/top-productos?orden=cantidad').status_code == 200
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from modelos import VersionTabla, db
+
+
+def _sesion_con(cliente, ordenes):
+    sesion = cliente.post('/sesiones', json={'estado': 'abierta'}).json['id']
+    for orden in ordenes:
+        assert cliente.post('/sesion_ordenes', json={'sesion_id': sesion, 'orden_id': orden}).status_code == 201
+    return sesion
+
+
+def _recalculado(app, sesion):
+    resultado = app.test_cli_runner().invoke(args=['recalcular-resumen', '--sesion', str(sesion)])
+    assert resultado.exit_code == 0, resultado.output
+
+
+def test_resumen_incremental(cliente, crear_orden):
+    a = crear_orden(productos=[(1, 2)], metodo_pago='efectivo')['id']  # 23.80
+    b = crear_orden(productos=[(2, 3)], metodo_pago='tarjeta')['id']  # 15.00
+    sesion = _sesion_con(cliente, [a, b])
+
+    resumen = cliente.get(f'/sesiones/{sesion}/resumen').json
+    assert (resumen['ordenes'], resumen['total']) == (2, '38.80')
+    assert [(m['metodo_pago'], m['total']) for m in resumen['por_metodo_pago']] == [
+        ('efectivo', '23.80'), ('tarjeta', '15.00')]
+    assert [(p['producto_id'], Decimal(p['cantidad'])) for p in resumen['por_producto']] == [
+        (1, Decimal('2')), (2, Decimal('3'))]
+
+    # Una línea más en una orden ya sumada: solo entra la diferencia
+    assert cliente.post('/ordenes_productos', json={'orden_id': b, 'producto_id': 2, 'cantidad': 1}).status_code == 201
+    resumen = cliente.get(f'/sesiones/{sesion}/resumen').json
+    assert (resumen['ordenes'], resumen['total']) == (2, '43.80')
+    assert Decimal(resumen['por_producto'][1]['cantidad']) == Decimal('4')
+
+
+def test_orden_cancelada_sale_del_resumen(app, cliente, crear_orden):
+    a = crear_orden(productos=[(1, 2)])['id']
+    b = crear_orden(productos=[(2, 1)])['id']
+    anulada = crear_orden(productos=[(2, 2)], estado='cancelada')['id']
+    sesion = _sesion_con(cliente, [a, b, anulada])
+    assert cliente.get(f'/sesiones/{sesion}/resumen').json['ordenes'] == 2
+
+    assert cliente.put(f'/ordenes/{a}', json={'estado': 'cancelada'}).status_code == 200
+    resumen = cliente.get(f'/sesiones/{sesion}/resumen').json
+    assert (resumen['ordenes'], resumen['total']) == (1, '5.00')
+    assert [p['producto_id'] for p in resumen['por_producto']] == [2]
+
+    # La reconstrucción completa llega a lo mismo que los deltas
+    _recalculado(app, sesion)
+    assert cliente.get(f'/sesiones/{sesion}/resumen').json == resumen
+
+
+def test_quitar_la_orden_de_la_sesion_resta_su_aporte(cliente, crear_orden):
+    a, b = crear_orden()['id'], crear_orden()['id']
+    sesion = _sesion_con(cliente, [a, b])
+    assert cliente.delete(f'/sesion_ordenes/{sesion}/{a}').status_code == 204
+    resumen = cliente.get(f'/sesiones/{sesion}/resumen').json
+    assert (resumen['ordenes'], resumen['total']) == (1, '23.80')
+
+
+def test_agregados_suben_su_version(app, crear_orden):
+    crear_orden()
+    with app.app_context():
+        versiones = dict(db.session.execute(select(VersionTabla.tabla, VersionTabla.version)).all())
+    assert versiones.get('venta_hora') and versiones.get('ordenes')
+
+
+def test_resumen_cambia_con_el_nombre_del_mesero(cliente, crear_orden):
+    sesion = _sesion_con(cliente, [crear_orden()['id']])
+    url = f'/sesiones/{sesion}/resumen'
+    etag = cliente.get(url).headers['ETag']
+    assert cliente.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert cliente.put('/meseros/1', json={'nombre': 'Marta Ruiz'}).status_code == 200
+    respuesta = cliente.get(url, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.json['por_mesero'][0]['nombre'] == 'Marta Ruiz'
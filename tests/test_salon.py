@@ -0,0 +1,68 @@
+from decimal import Decimal
+
+from rutas.mesas import Salon
+
+
+def _mesa(cliente, id):
+    return next(m for m in cliente.get('/mesas/estado').json if m['id'] == id)
+
+
+def test_transiciones_de_la_mesa(cliente, crear_orden):
+    assert cliente.put('/mesas/1', json={'estado': 'rota'}).status_code == 400
+    assert cliente.put('/mesas/1', json={'estado': 'ocupada'}).status_code == 200
+    respuesta = cliente.put('/mesas/1', json={'estado': 'reservada'})
+    assert respuesta.status_code == 409
+    assert respuesta.json['permitidos'] == ['libre']
+
+    # Con una orden abierta la mesa no se libera
+    id = crear_orden()['id']
+    respuesta = cliente.put('/mesas/1', json={'estado': 'libre'})
+    assert respuesta.status_code == 409 and respuesta.json['ordenes'] == [id]
+    assert cliente.put(f'/ordenes/{id}', json={'estado': 'pagada'}).status_code == 200
+    assert cliente.put('/mesas/1', json={'estado': 'libre'}).status_code == 200
+
+
+def test_ocupar_mesa(cliente):
+    assert cliente.post('/mesas/2/ocupar').status_code == 200
+    respuesta = cliente.post('/mesas/2/ocupar')
+    assert respuesta.status_code == 409 and respuesta.json['estado'] == 'ocupada'
+    assert cliente.post('/mesas/99/ocupar').status_code == 404
+
+
+def test_estado_del_salon(cliente, crear_orden):
+    libre = _mesa(cliente, 2)
+    assert (libre['estado'], libre['orden_id'], libre['minutos'], libre['total']) == ('libre', None, None, '0.00')
+
+    assert cliente.post('/mesas/1/ocupar').status_code == 200
+    primera = crear_orden()['id']
+    segunda = crear_orden(productos=[(2, 1)])['id']
+    mesa = _mesa(cliente, 1)
+    assert mesa['estado'] == 'ocupada'
+    assert (mesa['orden_id'], mesa['ordenes'], mesa['mesero']) == (primera, [primera, segunda], 'Marta')
+    assert mesa['minutos'] == 0
+    assert Decimal(mesa['total']) == Decimal('28.80')
+
+    assert [m['id'] for m in cliente.get('/mesas/estado?estado=ocupada').json] == [1]
+    assert cliente.get('/mesas/estado?estado=rota').status_code == 400
+
+
+def test_salon_se_actualiza_sin_recargar(cliente, crear_orden, monkeypatch):
+    cliente.get('/mesas/estado')
+    recargas = []
+    recargar = Salon._recargar
+    monkeypatch.setattr(Salon, '_recargar',
+                        lambda self, actuales: recargas.append(actuales) or recargar(self, actuales))
+
+    assert cliente.post('/mesas/1/ocupar').status_code == 200
+    id = crear_orden()['id']
+    assert cliente.put('/mesas/2', json={'estado': 'reservada'}).status_code == 200
+    assert (_mesa(cliente, 1)['orden_id'], _mesa(cliente, 2)['estado']) == (id, 'reservada')
+    assert cliente.put(f'/ordenes/{id}', json={'estado': 'pagada'}).status_code == 200
+    assert _mesa(cliente, 1)['orden_id'] is None
+    assert recargas == []
+
+    # Renombrar un mesero puede tocar cualquier orden abierta: se recarga
+    crear_orden()
+    assert cliente.put('/meseros/1', json={'nombre': 'Marta Gómez'}).status_code == 200
+    assert _mesa(cliente, 1)['mesero'] == 'Marta Gómez'
+    assert len(recargas) == 1
@@ -0,0 +1,77 @@
+import pytest
+
+import comun
+from modelos import Cliente, db
+from tareas import Cola
+
+
+@pytest.fixture
+def cola(tmp_path):
+    return Cola(str(tmp_path / 'tareas.sqlite'), max_intentos=2, espera_base=0)
+
+
+def test_drenar_aplica_por_lotes_agrupados_por_tipo(cola):
+    lotes = []
+    cola.manejador('suma')(lambda lote: lotes.append(('suma', lote)))
+    cola.manejador('log')(lambda lote: lotes.append(('log', lote)))
+    for i in range(3):
+        cola.encolar('suma', {'n': i})
+    cola.encolar('log', {'texto': 'hola'})
+
+    assert cola.drenar() == 4
+    assert sorted(lotes) == [('log', [{'texto': 'hola'}]), ('suma', [{'n': 0}, {'n': 1}, {'n': 2}])]
+    assert cola.drenar() == 0
+    assert cola.estadisticas()['hecha'] == 4
+
+
+def test_idempotencia_no_vuelve_a_encolar(cola):
+    aplicadas = []
+    cola.manejador('suma')(aplicadas.extend)
+    assert cola.encolar('suma', {'n': 1}, idempotencia='orden:1')
+    assert not cola.encolar('suma', {'n': 1}, idempotencia='orden:1')
+    cola.drenar()
+    assert not cola.encolar('suma', {'n': 1}, idempotencia='orden:1')
+    assert aplicadas == [{'n': 1}]
+
+
+def test_tipo_desconocido(cola):
+    with pytest.raises(ValueError):
+        cola.encolar('nada', {})
+
+
+def test_una_tarea_mala_no_frena_el_lote(cola):
+    aplicadas = []
+
+    def manejador(lote):
+        if any(d['n'] < 0 for d in lote):
+            raise RuntimeError('negativo')
+        aplicadas.extend(lote)
+    cola.manejador('suma')(manejador)
+    for n in (1, -1, 2):
+        cola.encolar('suma', {'n': n})
+
+    cola.drenar()
+    assert aplicadas == [{'n': 1}, {'n': 2}]
+    # Con espera_base 0 la fallida se reintenta hasta max_intentos y se descarta
+    assert cola.estadisticas() == {'hilos': 0, 'hecha': 2, 'fallida': 1}
+
+
+def test_drenar_aplica_nro_ordenes_de_la_api(app, crear_orden):
+    crear_orden(cliente_id=2)
+    crear_orden(cliente_id=2)
+    with app.app_context():
+        assert db.session.get(Cliente, 2).nro_ordenes == 0
+        assert comun.cola.drenar() >= 2
+        db.session.expire_all()
+        assert db.session.get(Cliente, 2).nro_ordenes == 2
+
+
+def test_put_del_cliente_no_pisa_nro_ordenes(app, cliente, crear_orden):
+    crear_orden(cliente_id=2)
+    with app.app_context():
+        comun.cola.drenar()
+    # Un PUT con el valor leído antes del drenado no debe borrar el incremento
+    luis = {'nombre': 'Luis', 'cedula': '200', 'telefono': '3002', 'nro_ordenes': 0}
+    assert cliente.put('/clientes/2', json=luis).status_code == 200
+    assert cliente.post('/clientes/batch', json=[{'id': 2, **luis}]).status_code == 200
+    assert cliente.get('/clientes/2').json['nro_ordenes'] == 1